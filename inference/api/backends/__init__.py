@@ -0,0 +1,34 @@
+"""
+Inference backends: how the serving models are loaded and run.
+
+The registry and request path only use the BackendModel interface (batch
+predict, warmup, input spec), so the runtime is a deployment choice made with
+INFERENCE_BACKEND (see api/config.py). Backend modules are imported on first
+use, which keeps TensorFlow and ONNX Runtime out of service startup.
+"""
+import importlib
+from pathlib import Path
+
+from api.backends.base import MODEL_KINDS, BackendModel, InferenceBackend
+
+BACKENDS = {
+    "tensorflow": ("api.backends.tf_backend", "TensorFlowBackend"),
+    "onnxruntime": ("api.backends.onnx_backend", "OnnxRuntimeBackend"),
+}
+
+
+def onnx_path(checkpoint: Path) -> Path:
+    """Where scripts/export_onnx.py writes the export of a checkpoint:
+    best_classifier_finetuned.weights.h5 -> best_classifier_finetuned.onnx."""
+    checkpoint = Path(checkpoint)
+    if checkpoint.suffix == ".onnx":
+        return checkpoint
+    return checkpoint.with_name(checkpoint.name.split(".")[0] + ".onnx")
+
+
+def create_backend(name, buckets, image_size) -> InferenceBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{name}'. Expected one of: {', '.join(BACKENDS)}")
+    module_name, class_name = BACKENDS[name]
+    backend_class = getattr(importlib.import_module(module_name), class_name)
+    return backend_class(buckets, image_size)
@@ -0,0 +1,47 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+
+MODEL_KINDS = ("classifier", "localization", "fused")
+
+
+class BackendModel(ABC):
+    """A loaded model as the request path sees it.
+
+    predict takes a float32 (N, H, W, 3) batch with 0-255 pixel values and
+    returns an array of logits, or a list of arrays for multi-output models,
+    with N rows each.
+    """
+
+    backend = None
+    retraces = 0
+
+    @abstractmethod
+    def predict(self, batch: np.ndarray):
+        ...
+
+    def warmup(self):
+        pass
+
+    @abstractmethod
+    def input_spec(self):
+        """{"name", "shape", "dtype"} of the model input; unknown dims are None."""
+
+    def describe(self):
+        return {"backend": self.backend, "input_spec": self.input_spec()}
+
+
+class InferenceBackend(ABC):
+    """Loads checkpoints into BackendModels. One instance per registry; the
+    constructor does any process-wide setup the runtime needs."""
+
+    name = None
+
+    def __init__(self, buckets, image_size=(224, 224)):
+        self.buckets = tuple(sorted(set(buckets)))
+        self.image_size = image_size
+
+    @abstractmethod
+    def load(self, kind, checkpoint: Path, name=None) -> BackendModel:
+        ...
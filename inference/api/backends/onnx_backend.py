@@ -0,0 +1,78 @@
+import logging
+from pathlib import Path
+
+import numpy as np
+import onnxruntime as ort
+
+from api.backends import onnx_path
+from api.backends.base import BackendModel, InferenceBackend
+from api.config import INFERENCE_PRECISION, ONNX_THREADS
+
+logger = logging.getLogger(__name__)
+
+# tensor(float) -> float32, as reported by onnxruntime
+ONNX_DTYPES = {"tensor(float)": "float32", "tensor(float16)": "float16"}
+
+
+class OnnxRuntimeModel(BackendModel):
+    backend = "onnxruntime"
+
+    def __init__(self, path: Path, buckets, image_size, threads=0):
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        self.output_names = [o.name for o in self.session.get_outputs()]
+        self.buckets = buckets
+        self.image_size = image_size
+
+    def predict(self, batch):
+        # The exported graphs take any batch size, so no padding; chunks of
+        # the largest bucket keep peak memory the same as the TF backend.
+        outputs = []
+        max_bucket = self.buckets[-1]
+        for start in range(0, len(batch), max_bucket):
+            chunk = np.ascontiguousarray(batch[start:start + max_bucket], dtype=np.float32)
+            outputs.append(self.session.run(self.output_names, {self.input.name: chunk}))
+        merged = [np.concatenate(parts, axis=0) for parts in zip(*outputs)]
+        return merged[0] if len(merged) == 1 else merged
+
+    def warmup(self):
+        # The first runs at a new shape allocate buffers and pick kernels.
+        for bucket in self.buckets:
+            self.predict(np.zeros((bucket, *self.image_size, 3), dtype=np.float32))
+
+    def input_spec(self):
+        return {
+            "name": self.input.name,
+            "shape": [d if isinstance(d, int) else None for d in self.input.shape],
+            "dtype": ONNX_DTYPES.get(self.input.type, self.input.type),
+        }
+
+    def describe(self):
+        return {**super().describe(), "buckets": list(self.buckets), "onnx_path": str(self.path)}
+
+
+class OnnxRuntimeBackend(InferenceBackend):
+    """ONNX Runtime on CPU, running graphs exported from the Keras checkpoints
+    by scripts/export_onnx.py. Exports are float32, so INFERENCE_PRECISION is
+    not applied."""
+
+    name = "onnxruntime"
+
+    def __init__(self, buckets, image_size=(224, 224)):
+        super().__init__(buckets, image_size)
+        if INFERENCE_PRECISION != "float32":
+            logger.warning(f"INFERENCE_PRECISION={INFERENCE_PRECISION} is ignored by the onnxruntime backend")
+
+    def load(self, kind, checkpoint: Path, name=None):
+        path = onnx_path(checkpoint)
+        if not path.exists():
+            raise ValueError(f"ONNX export not found: {path}. Run scripts/export_onnx.py {kind}")
+        if path != Path(checkpoint) and path.stat().st_mtime < Path(checkpoint).stat().st_mtime:
+            raise ValueError(f"ONNX export {path} is older than {checkpoint}. Run scripts/export_onnx.py {kind} again")
+        model = OnnxRuntimeModel(path, self.buckets, self.image_size, threads=ONNX_THREADS)
+        logger.info(f"Loaded {kind} ONNX model: {path}")
+        return model
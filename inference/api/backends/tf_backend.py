@@ -0,0 +1,67 @@
+import logging
+from pathlib import Path
+
+import tensorflow as tf
+
+from api.backends.base import BackendModel, InferenceBackend
+from api.bucketing import BucketedPredictor
+from api.config import CLASSIFIER_BACKBONE, INFERENCE_PRECISION, LOCALIZATION_BACKBONE
+from api.models import load_classifier_model, load_fused_model, load_localization_model, set_inference_precision
+
+logger = logging.getLogger(__name__)
+
+
+class TensorFlowModel(BackendModel):
+    backend = "tensorflow"
+
+    def __init__(self, model, buckets, image_size, name=None):
+        self.model = model
+        self.predictor = BucketedPredictor(model, buckets, image_size, name=name)
+
+    def predict(self, batch):
+        return self.predictor.predict(batch)
+
+    def warmup(self):
+        self.predictor.warmup()
+
+    @property
+    def retraces(self):
+        return self.predictor.retraces
+
+    def input_spec(self):
+        model_input = self.model.inputs[0]
+        return {
+            "name": model_input.name,
+            "shape": list(model_input.shape),
+            "dtype": tf.as_dtype(model_input.dtype).name,
+        }
+
+    def describe(self):
+        return {**super().describe(), **self.predictor.describe()}
+
+
+class TensorFlowBackend(InferenceBackend):
+    """Keras models built from the .weights.h5 checkpoints, run through
+    pre-traced batch buckets (api/bucketing.py)."""
+
+    name = "tensorflow"
+
+    def __init__(self, buckets, image_size=(224, 224)):
+        super().__init__(buckets, image_size)
+        try:
+            set_inference_precision(INFERENCE_PRECISION)
+        except Exception as e:
+            logger.error(f"Failed to set inference precision: {e}")
+        self._loaders = {
+            "classifier": lambda path: load_classifier_model(path, image_size, strict=False, backbone=CLASSIFIER_BACKBONE),
+            "localization": lambda path: load_localization_model(path, image_size, strict=False, backbone=LOCALIZATION_BACKBONE),
+            "fused": lambda path: load_fused_model(path, image_size, strict=False),
+        }
+
+    def build(self, kind, checkpoint: Path):
+        """The Keras model for a checkpoint, as served."""
+        return self._loaders[kind](Path(checkpoint))
+
+    def load(self, kind, checkpoint: Path, name=None):
+        model = self.build(kind, checkpoint)
+        return TensorFlowModel(model, self.buckets, self.image_size, name=name or kind)
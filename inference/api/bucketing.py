@@ -0,0 +1,69 @@
+import logging
+
+import numpy as np
+import tensorflow as tf
+
+logger = logging.getLogger(__name__)
+
+
+class BucketedPredictor:
+    """Runs a Keras model on batches padded up to a fixed set of batch sizes.
+
+    Each bucket gets exactly one concrete graph. The trace counter is bumped
+    from Python inside the traced function, which only executes while
+    TensorFlow is tracing, so any trace after warmup is a retrace.
+    """
+
+    def __init__(self, model, buckets, image_size=(224, 224), name=None):
+        self.model = model
+        self.buckets = tuple(sorted(set(buckets)))
+        self.image_size = image_size
+        self.name = name or model.name
+        self.traces = 0
+        self.warmup_traces = None
+        self._forward = tf.function(self._call)
+
+    def _call(self, x):
+        self.traces += 1
+        if self.warmup_traces is not None:
+            logger.warning(f"{self.name}: retracing for input shape {x.shape} after warmup")
+        return self.model(x, training=False)
+
+    @property
+    def retraces(self):
+        if self.warmup_traces is None:
+            return 0
+        return self.traces - self.warmup_traces
+
+    def bucket_for(self, n):
+        for bucket in self.buckets:
+            if bucket >= n:
+                return bucket
+        return self.buckets[-1]
+
+    def warmup(self):
+        for bucket in self.buckets:
+            dummy = tf.zeros((bucket, *self.image_size, 3), dtype=tf.float32)
+            self._forward(dummy)
+        self.warmup_traces = self.traces
+
+    def predict(self, batch: np.ndarray):
+        outputs = []
+        max_bucket = self.buckets[-1]
+        for start in range(0, len(batch), max_bucket):
+            chunk = batch[start:start + max_bucket]
+            n = len(chunk)
+            bucket = self.bucket_for(n)
+            if bucket > n:
+                pad = np.zeros((bucket - n, *chunk.shape[1:]), dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, pad], axis=0)
+            out = self._forward(tf.convert_to_tensor(chunk, dtype=tf.float32))
+            outputs.append(tf.nest.map_structure(lambda t: t.numpy()[:n], out))
+        return tf.nest.map_structure(lambda *parts: np.concatenate(parts, axis=0), *outputs)
+
+    def describe(self):
+        return {
+            "buckets": list(self.buckets),
+            "traces": self.traces,
+            "retraces": self.retraces,
+        }
@@ -0,0 +1,86 @@
+"""
+Runtime settings for the inference service, read from the environment.
+
+This module must be imported before TensorFlow: some settings (oneDNN) are
+only honoured if they are present in the environment when TensorFlow loads.
+"""
+import os
+from pathlib import Path
+
+SUPPORTED_PRECISIONS = ("float32", "bfloat16")
+
+INFERENCE_PRECISION = os.getenv("INFERENCE_PRECISION", "float32").strip().lower()
+
+if INFERENCE_PRECISION not in SUPPORTED_PRECISIONS:
+    raise ValueError(
+        f"Unsupported INFERENCE_PRECISION '{INFERENCE_PRECISION}'. "
+        f"Expected one of: {', '.join(SUPPORTED_PRECISIONS)}"
+    )
+
+# bfloat16 kernels (AVX-512 BF16 / AMX) are only reached through oneDNN.
+if INFERENCE_PRECISION == "bfloat16":
+    os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1"
+
+INFERENCE_ROOT = Path(__file__).resolve().parent.parent
+MODELS_DIR = INFERENCE_ROOT / "core/models"
+
+CLASSIFIER_CKPT = Path(os.getenv(
+    "CLASSIFIER_CKPT",
+    MODELS_DIR / "ai_detection/best_classifier_finetuned.weights.h5",
+))
+LOCALIZATION_CKPT = Path(os.getenv(
+    "LOCALIZATION_CKPT",
+    MODELS_DIR / "tamper_localization/best_localization_phase2.weights.h5",
+))
+# Backbone each checkpoint was trained with: "efficientnetb0" for the main
+# models, or one of api.models.STUDENT_BACKBONES for distilled students.
+CLASSIFIER_BACKBONE = os.getenv("CLASSIFIER_BACKBONE", "efficientnetb0").strip().lower()
+LOCALIZATION_BACKBONE = os.getenv("LOCALIZATION_BACKBONE", "efficientnetb0").strip().lower()
+
+FUSED_CKPT = Path(os.getenv(
+    "FUSED_CKPT",
+    MODELS_DIR / "fused/best_fused_distilled.weights.h5",
+))
+
+# "separate" runs the classifier and localization models independently;
+# "fused" serves both outputs from the distilled shared-backbone model.
+SERVING_MODES = ("separate", "fused")
+SERVING_MODE = os.getenv("INFERENCE_SERVING_MODE", "separate").strip().lower()
+
+if SERVING_MODE not in SERVING_MODES:
+    raise ValueError(
+        f"Unsupported INFERENCE_SERVING_MODE '{SERVING_MODE}'. "
+        f"Expected one of: {', '.join(SERVING_MODES)}"
+    )
+
+# "tensorflow" runs the Keras checkpoints; "onnxruntime" runs their ONNX
+# exports (scripts/export_onnx.py) on CPU. See api/backends.
+INFERENCE_BACKENDS = ("tensorflow", "onnxruntime")
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "tensorflow").strip().lower()
+
+if INFERENCE_BACKEND not in INFERENCE_BACKENDS:
+    raise ValueError(
+        f"Unsupported INFERENCE_BACKEND '{INFERENCE_BACKEND}'. "
+        f"Expected one of: {', '.join(INFERENCE_BACKENDS)}"
+    )
+
+# onnxruntime intra-op threads; 0 lets onnxruntime pick one per physical core.
+ONNX_THREADS = int(os.getenv("INFERENCE_ONNX_THREADS", "0"))
+
+# Every batch is padded up to one of these sizes, and each one is traced
+# during warmup, so request batch sizes never trigger a new graph trace.
+BATCH_BUCKETS = tuple(sorted({
+    int(b) for b in os.getenv("INFERENCE_BATCH_BUCKETS", "1,2,4,8,16").split(",") if b.strip()
+}))
+MAX_BATCH_IMAGES = int(os.getenv("INFERENCE_MAX_BATCH_IMAGES", "32"))
+
+if not BATCH_BUCKETS or BATCH_BUCKETS[0] < 1:
+    raise ValueError(f"Invalid INFERENCE_BATCH_BUCKETS: {BATCH_BUCKETS}")
+
+# Decision thresholds and mask postprocessing applied in api/processing.py.
+# scripts/calibrate_thresholds.py picks values for a target false-positive rate.
+AI_GENERATED_THRESHOLD = float(os.getenv("INFERENCE_AI_THRESHOLD", "0.6"))
+MASK_THRESHOLD = float(os.getenv("INFERENCE_MASK_THRESHOLD", "0.5"))
+MIN_EDITED_AREA_RATIO = float(os.getenv("INFERENCE_MIN_EDITED_AREA_RATIO", "0.001"))
+MIN_MASK_PIXELS_ABSOLUTE = 10
+MORPH_CLOSING_SIZE = int(os.getenv("INFERENCE_MORPH_CLOSING_SIZE", "3"))
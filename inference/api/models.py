@@ -1,51 +1,96 @@
 import logging
 from pathlib import Path
 import tensorflow as tf
-from tensorflow.keras import layers, Model
-from tensorflow.keras.applications import EfficientNetB0
+from tensorflow.keras import layers, Model, mixed_precision
+from tensorflow.keras.applications import EfficientNetB0, MobileNetV2
 
 logger = logging.getLogger(__name__)
 
+PRECISION_POLICIES = {
+    "float32": "float32",
+    "bfloat16": "mixed_bfloat16",
+}
 
-def build_classifier_model(image_size=(224, 224)):
-    base = EfficientNetB0(
-        weights="imagenet",
-        include_top=False,
-        input_shape=(*image_size, 3),
-    )
-    base.trainable = True
-    
-    inputs = base.input
-    x = base.output
-    
-    x = layers.GlobalAveragePooling2D(name="global_pool")(x)
-    x = layers.Dropout(0.3, name="clf_dropout1")(x)
-    x = layers.Dense(256, activation="relu", name="clf_dense1")(x)
-    x = layers.Dropout(0.2, name="clf_dropout2")(x)
-    class_logit = layers.Dense(1, activation=None, dtype="float32", name="class_logit")(x)
-    
-    model = Model(inputs, class_logit, name="classifier_model")
-    
-    logger.info(f"Built classifier_model with {model.count_params():,} parameters")
-    return model
 
+def set_inference_precision(precision="float32"):
+    """Set the Keras dtype policy used by models built after this call.
+
+    Logit heads are pinned to float32 in the builders, so under bfloat16 only
+    the backbone and decoder compute in reduced precision.
+    """
+    if precision not in PRECISION_POLICIES:
+        raise ValueError(f"Unsupported precision: {precision}")
+
+    policy = PRECISION_POLICIES[precision]
+    mixed_precision.set_global_policy(policy)
+    logger.info(f"Inference dtype policy set to {policy}")
+    return policy
 
-def build_localization_model(image_size=(224, 224)):
+
+def _efficientnetb0(image_size):
     base = EfficientNetB0(
         weights="imagenet",
         include_top=False,
         input_shape=(*image_size, 3),
     )
-    base.trainable = True
-    
-    inputs = base.input
-    
-    skip_names = [
+    return base.input, base
+
+
+def _mobilenetv2(alpha):
+    # MobileNetV2 expects [-1, 1] inputs; rescale inside the model so every
+    # backbone takes the same 0-255 input the EfficientNet preprocessing produces.
+    def build(image_size):
+        inputs = layers.Input(shape=(*image_size, 3), name="input_image")
+        x = layers.Rescaling(1.0 / 127.5, offset=-1.0, name="mobilenet_rescale")(inputs)
+        base = MobileNetV2(
+            weights="imagenet",
+            include_top=False,
+            alpha=alpha,
+            input_tensor=x,
+        )
+        return inputs, base
+    return build
+
+
+# name -> (builder, decoder skip layer names at strides 2, 4, 8 and 16)
+BACKBONES = {
+    "efficientnetb0": (_efficientnetb0, [
         "block2a_expand_activation",
         "block3a_expand_activation",
         "block4a_expand_activation",
         "block6a_expand_activation",
-    ]
+    ]),
+    "mobilenetv2_100": (_mobilenetv2(1.0), [
+        "block_1_expand_relu",
+        "block_3_expand_relu",
+        "block_6_expand_relu",
+        "block_13_expand_relu",
+    ]),
+    "mobilenetv2_050": (_mobilenetv2(0.5), [
+        "block_1_expand_relu",
+        "block_3_expand_relu",
+        "block_6_expand_relu",
+        "block_13_expand_relu",
+    ]),
+    "mobilenetv2_035": (_mobilenetv2(0.35), [
+        "block_1_expand_relu",
+        "block_3_expand_relu",
+        "block_6_expand_relu",
+        "block_13_expand_relu",
+    ]),
+}
+
+DEFAULT_BACKBONE = "efficientnetb0"
+STUDENT_BACKBONES = tuple(name for name in BACKBONES if name != DEFAULT_BACKBONE)
+
+
+def _build_backbone(image_size, backbone=DEFAULT_BACKBONE):
+    if backbone not in BACKBONES:
+        raise ValueError(f"Unknown backbone '{backbone}'. Expected one of: {', '.join(BACKBONES)}")
+
+    build, skip_names = BACKBONES[backbone]
+    inputs, base = build(image_size)
+    base.trainable = True
     
     skips = []
     for name in skip_names:
@@ -58,9 +103,18 @@ def build_localization_model(image_size=(224, 224)):
         all_layers = base.layers
         candidates = [l.output for l in all_layers if hasattr(l, "output")]
         skips = candidates[-8:-4] if len(candidates) >= 8 else candidates[:4]
-    
-    bottleneck = base.output
-    
+    return inputs, base.output, skips
+
+
+def _classifier_head(x):
+    x = layers.GlobalAveragePooling2D(name="global_pool")(x)
+    x = layers.Dropout(0.3, name="clf_dropout1")(x)
+    x = layers.Dense(256, activation="relu", name="clf_dense1")(x)
+    x = layers.Dropout(0.2, name="clf_dropout2")(x)
+    return layers.Dense(1, activation=None, dtype="float32", name="class_logit")(x)
+
+
+def _unet_decoder(bottleneck, skips):
     def conv_block(x, filters, name_prefix):
         x = layers.Conv2D(filters, 3, padding="same", use_bias=False, name=f"{name_prefix}_conv1")(x)
         x = layers.BatchNormalization(name=f"{name_prefix}_bn1")(x)
@@ -91,7 +145,24 @@ def build_localization_model(image_size=(224, 224)):
     d = conv_block(d, 32, name_prefix="dec_block4")
     
     d = layers.UpSampling2D(size=(2, 2), name="dec_up_final")(d)
-    mask_logit = layers.Conv2D(1, 1, padding="same", dtype="float32", name="mask_logit")(d)
+    return layers.Conv2D(1, 1, padding="same", dtype="float32", name="mask_logit")(d)
+
+
+def build_classifier_model(image_size=(224, 224), backbone=DEFAULT_BACKBONE):
+    inputs, features, _ = _build_backbone(image_size, backbone)
+    
+    class_logit = _classifier_head(features)
+    
+    model = Model(inputs, class_logit, name="classifier_model")
+    
+    logger.info(f"Built classifier_model with {model.count_params():,} parameters")
+    return model
+
+
+def build_localization_model(image_size=(224, 224), backbone=DEFAULT_BACKBONE):
+    inputs, features, skips = _build_backbone(image_size, backbone)
+    
+    mask_logit = _unet_decoder(features, skips)
     
     model = Model(inputs, mask_logit, name="localization_model")
     
@@ -99,11 +170,26 @@ def build_localization_model(image_size=(224, 224)):
     return model
 
 
-def load_classifier_model(checkpoint_path: Path, image_size=(224, 224), strict=True):
+def build_fused_model(image_size=(224, 224)):
+    """One EfficientNetB0 encoder feeding both the classifier head and the
+    U-Net decoder. Layer names match the two task models, so it can be
+    initialised from their checkpoints by name before distillation."""
+    inputs, features, skips = _build_backbone(image_size)
+    
+    class_logit = _classifier_head(features)
+    mask_logit = _unet_decoder(features, skips)
+    
+    model = Model(inputs, [class_logit, mask_logit], name="fused_model")
+    
+    logger.info(f"Built fused_model with {model.count_params():,} parameters")
+    return model
+
+
+def load_classifier_model(checkpoint_path: Path, image_size=(224, 224), strict=True, backbone=DEFAULT_BACKBONE):
     if not checkpoint_path.exists():
         raise ValueError(f"Classifier checkpoint not found: {checkpoint_path}")
     
-    model = build_classifier_model(image_size)
+    model = build_classifier_model(image_size, backbone)
     
     try:
         if strict:
@@ -124,11 +210,11 @@ def load_classifier_model(checkpoint_path: Path, image_size=(224, 224), strict=T
     return model
 
 
-def load_localization_model(checkpoint_path: Path, image_size=(224, 224), strict=True):
+def load_localization_model(checkpoint_path: Path, image_size=(224, 224), strict=True, backbone=DEFAULT_BACKBONE):
     if not checkpoint_path.exists():
         raise ValueError(f"Localization checkpoint not found: {checkpoint_path}")
     
-    model = build_localization_model(image_size)
+    model = build_localization_model(image_size, backbone)
     
     try:
         if strict:
@@ -148,3 +234,24 @@ def load_localization_model(checkpoint_path: Path, image_size=(224, 224), strict
     
     return model
 
+
+def load_fused_model(checkpoint_path: Path, image_size=(224, 224), strict=True):
+    if not checkpoint_path.exists():
+        raise ValueError(f"Fused checkpoint not found: {checkpoint_path}")
+    
+    model = build_fused_model(image_size)
+    
+    try:
+        if strict:
+            model.load_weights(str(checkpoint_path))
+            logger.info(f"Loaded fused checkpoint: {checkpoint_path}")
+        else:
+            model.load_weights(str(checkpoint_path), by_name=True, skip_mismatch=True)
+            logger.warning(f"Loaded fused checkpoint with skip_mismatch: {checkpoint_path}")
+    except Exception as e:
+        if strict:
+            raise ValueError(f"Failed to load fused checkpoint (strict mode): {e}") from e
+        else:
+            logger.warning(f"Partial load with skip_mismatch: {e}")
+    
+    return model
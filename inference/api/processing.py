@@ -0,0 +1,134 @@
+"""
+Pre- and postprocessing shared by the HTTP routes (api/routes/analyze.py) and
+offline scoring (scripts/score_corpus.py), so both turn images into the same
+decisions.
+"""
+import io
+import base64
+import logging
+
+import numpy as np
+from PIL import Image
+
+from api.config import (
+    MASK_THRESHOLD,
+    MIN_EDITED_AREA_RATIO,
+    MIN_MASK_PIXELS_ABSOLUTE,
+    MORPH_CLOSING_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZE = (224, 224)
+
+
+def resize_pil(img: Image.Image) -> np.ndarray:
+    img = img.convert("RGB")
+    img = img.resize(IMAGE_SIZE, Image.BILINEAR)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def load_image(path) -> np.ndarray:
+    """Decode and resize an image file to uint8 (H, W, 3). Used from worker
+    processes, so it must not import TensorFlow."""
+    with Image.open(path) as img:
+        return resize_pil(img)
+
+
+def normalize(pixels: np.ndarray) -> np.ndarray:
+    # EfficientNet's preprocess_input is the identity on 0-255 inputs (the
+    # model rescales internally), and every backbone takes 0-255 floats.
+    return pixels.astype(np.float32)
+
+
+def preprocess_pil(img: Image.Image):
+    return normalize(resize_pil(img))
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def class_probabilities(class_logits, count):
+    return sigmoid(np.asarray(class_logits).reshape(count, -1)[:, 0])
+
+
+def postprocess_mask(mask_logit: np.ndarray, original_size: tuple) -> tuple:
+    from scipy import ndimage
+
+    mask_prob = sigmoid(np.asarray(mask_logit, dtype=np.float32))
+
+    if mask_prob.ndim == 3:
+        mask_prob = mask_prob.squeeze()
+
+    mask_bin = (mask_prob > MASK_THRESHOLD).astype(np.uint8)
+
+    if np.any(mask_bin):
+        structure = np.ones((MORPH_CLOSING_SIZE, MORPH_CLOSING_SIZE), dtype=np.uint8)
+        mask_bin = ndimage.binary_closing(mask_bin, structure=structure).astype(np.uint8)
+
+    n_pixels = int(np.sum(mask_bin))
+    total_pixels = original_size[0] * original_size[1]
+    edited_area_ratio = n_pixels / total_pixels if total_pixels > 0 else 0.0
+
+    is_edited = (
+        edited_area_ratio >= MIN_EDITED_AREA_RATIO and
+        n_pixels >= MIN_MASK_PIXELS_ABSOLUTE
+    )
+
+    return is_edited, mask_bin, edited_area_ratio, n_pixels
+
+
+def warmup_postprocessing():
+    """Import SciPy and run the mask closing once, so the first request with
+    a mask does not pay for it. Called on the registry's loader thread."""
+    mask_logit = np.full(IMAGE_SIZE, -10.0, dtype=np.float32)
+    mask_logit[:8, :8] = 10.0
+    postprocess_mask(mask_logit, IMAGE_SIZE)
+
+
+def mask_to_base64_png(mask_arr: np.ndarray) -> str:
+    if mask_arr.ndim == 3 and mask_arr.shape[-1] == 1:
+        mask_arr = mask_arr[..., 0]
+
+    mask_img = mask_arr.astype(np.uint8) * 255
+    pil = Image.fromarray(mask_img, mode="L")
+    buf = io.BytesIO()
+    pil.save(buf, format="PNG")
+    b64 = base64.b64encode(buf.getvalue()).decode("ascii")
+    return f"data:image/png;base64,{b64}"
+
+
+def run_models(models, batch: np.ndarray):
+    """
+    Run the active models from a registry snapshot on a preprocessed batch.
+
+    Returns (class_logits, mask_logits, model_versions); mask_logits is None
+    when no localization model is loaded.
+    """
+    fused = models.get("fused")
+
+    if fused is not None:
+        class_logits, mask_logits = fused.predictor.predict(batch)
+        classifier = localization = fused
+    else:
+        classifier = models.get("classifier")
+        localization = models.get("localization")
+
+        if classifier is None:
+            logger.error("Classifier model not loaded. Classification skipped.")
+            raise RuntimeError("Classifier model not available")
+
+        class_logits = classifier.predictor.predict(batch)
+
+        if localization is None:
+            logger.warning("Localization model not loaded. Tampering detection skipped.")
+            mask_logits = None
+        else:
+            mask_logits = localization.predictor.predict(batch)
+
+    model_versions = {
+        "classifier": classifier.version,
+        "localization": localization.version if localization is not None else None,
+    }
+    return class_logits, mask_logits, model_versions
@@ -0,0 +1,221 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from api.backends import MODEL_KINDS, create_backend
+from api.config import (
+    BATCH_BUCKETS,
+    CLASSIFIER_CKPT,
+    FUSED_CKPT,
+    INFERENCE_BACKEND,
+    LOCALIZATION_CKPT,
+    SERVING_MODE,
+)
+from api.processing import warmup_postprocessing
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZE = (224, 224)
+
+
+class ModelVersion:
+    def __init__(self, kind, version, checkpoint: Path, predictor):
+        self.kind = kind
+        self.version = version
+        self.checkpoint = checkpoint
+        self.predictor = predictor
+        self.loaded_at = datetime.now(timezone.utc)
+        self.warmup_seconds = None
+
+    def describe(self):
+        return {
+            "version": self.version,
+            "checkpoint": str(self.checkpoint),
+            "loaded_at": self.loaded_at.isoformat(),
+            "warmup_seconds": self.warmup_seconds,
+            **self.predictor.describe(),
+        }
+
+
+class ModelRegistry:
+    """Holds the active model version per kind and swaps in new ones.
+
+    New versions are built and warmed up off the request path, then published
+    by replacing the active mapping in a single assignment. Requests take a
+    snapshot of that mapping once, so anything already in flight keeps using
+    the version it started with until it finishes.
+    """
+
+    def __init__(self, backend=INFERENCE_BACKEND, image_size=IMAGE_SIZE, buckets=BATCH_BUCKETS):
+        self.backend_name = backend
+        self._backend = None
+        self.image_size = image_size
+        self.buckets = tuple(buckets)
+        self._active = {}
+        self._pending = {}
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._backend_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader")
+        self._startup = None
+
+    @property
+    def kinds(self):
+        return MODEL_KINDS
+
+    @property
+    def backend(self):
+        # Created on first load, so the runtime (TensorFlow or onnxruntime)
+        # is only imported on the loader thread.
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = create_backend(self.backend_name, self.buckets, self.image_size)
+            return self._backend
+
+    def snapshot(self):
+        return self._active
+
+    def get(self, kind):
+        version = self._active.get(kind)
+        return version.predictor if version is not None else None
+
+    def versions(self):
+        active = self._active
+        return {kind: active[kind].version for kind in active}
+
+    def _resolve_version(self, kind, checkpoint: Path, version=None):
+        if kind not in self.kinds:
+            raise ValueError(f"Unknown model kind: {kind}")
+        if not checkpoint.exists():
+            raise ValueError(f"{kind} checkpoint not found: {checkpoint}")
+        if version is None:
+            mtime = datetime.fromtimestamp(checkpoint.stat().st_mtime, tz=timezone.utc)
+            version = f"{checkpoint.stem}@{mtime.strftime('%Y%m%d%H%M%S')}"
+        return version
+
+    def load(self, kind, checkpoint: Path, version=None):
+        checkpoint = Path(checkpoint)
+        version = self._resolve_version(kind, checkpoint, version)
+        with self._lock:
+            self._pending[kind] = version
+        return self._load(kind, checkpoint, version)
+
+    def load_async(self, kind, checkpoint: Path, version=None):
+        checkpoint = Path(checkpoint)
+        version = self._resolve_version(kind, checkpoint, version)
+        with self._lock:
+            if kind in self._pending:
+                raise RuntimeError(f"A {kind} model is already loading: {self._pending[kind]}")
+            self._pending[kind] = version
+        return version, self._executor.submit(self._load, kind, checkpoint, version)
+
+    def start(self, checkpoints):
+        """Load the startup checkpoints one after another on the loader thread
+        and return immediately. A missing localization checkpoint only
+        disables tampering detection."""
+        def run():
+            for kind, checkpoint in checkpoints.items():
+                if not checkpoint.exists():
+                    if kind == "localization":
+                        logger.warning(f"Localization checkpoint not found: {checkpoint}")
+                    else:
+                        logger.error(f"{kind.capitalize()} checkpoint not found: {checkpoint}")
+                        with self._lock:
+                            self._errors[kind] = f"checkpoint not found: {checkpoint}"
+                    continue
+                try:
+                    self.load(kind, checkpoint)
+                except Exception:
+                    pass  # logged and recorded in self._errors by _load
+
+        self._startup = self._executor.submit(run)
+        return self._startup
+
+    def ready(self):
+        """True once startup loading has finished with a classifier active."""
+        startup = self._startup
+        if startup is None or not startup.done():
+            return False
+        active = self._active
+        return "classifier" in active or "fused" in active
+
+    def _load(self, kind, checkpoint: Path, version):
+        try:
+            predictor = self.backend.load(kind, checkpoint, name=f"{kind}:{version}")
+            entry = ModelVersion(kind, version, checkpoint, predictor)
+            entry.warmup_seconds = self._warmup(entry)
+
+            with self._lock:
+                previous = self._active.get(kind)
+                active = dict(self._active)
+                active[kind] = entry
+                self._active = active
+                self._errors.pop(kind, None)
+
+            if previous is not None:
+                logger.info(f"Swapped {kind} model {previous.version} -> {version}")
+            else:
+                logger.info(f"Activated {kind} model {version}")
+            return entry
+        except Exception as e:
+            with self._lock:
+                self._errors[kind] = f"{version}: {e}"
+            logger.error(f"Failed to load {kind} model {version}: {e}")
+            raise
+        finally:
+            with self._lock:
+                if self._pending.get(kind) == version:
+                    del self._pending[kind]
+
+    def _warmup(self, entry: ModelVersion):
+        start = time.perf_counter()
+        entry.predictor.warmup()
+        if entry.kind in ("localization", "fused"):
+            # Mask postprocessing imports SciPy lazily; do it here so the
+            # service is warm once it reports ready.
+            warmup_postprocessing()
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"{entry.kind} model {entry.version} warmed up on batch buckets "
+            f"{list(self.buckets)} in {elapsed:.2f}s"
+        )
+        return elapsed
+
+    def retraces(self):
+        return sum(entry.predictor.retraces for entry in self._active.values())
+
+    def status(self):
+        active = self._active
+        with self._lock:
+            pending = dict(self._pending)
+            errors = dict(self._errors)
+        return {
+            "models": {kind: entry.describe() for kind, entry in active.items()},
+            "pending": pending,
+            "errors": errors,
+            "backend": self.backend_name,
+            "batch_buckets": list(self.buckets),
+            "retraces": self.retraces(),
+            "ready": self.ready(),
+        }
+
+
+registry = ModelRegistry()
+
+if SERVING_MODE == "fused":
+    DEFAULT_CHECKPOINTS = {
+        "fused": FUSED_CKPT,
+    }
+else:
+    DEFAULT_CHECKPOINTS = {
+        "classifier": CLASSIFIER_CKPT,
+        "localization": LOCALIZATION_CKPT,
+    }
+
+
+def start_default_models():
+    """Called once at service startup; see main.py."""
+    return registry.start(DEFAULT_CHECKPOINTS)
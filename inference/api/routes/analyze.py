@@ -1,171 +1,89 @@
 import io
-import base64
 import logging
-from pathlib import Path
+from typing import List
+
+from api.config import AI_GENERATED_THRESHOLD, MAX_BATCH_IMAGES
 
 import numpy as np
 import requests
-import tensorflow as tf
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from PIL import Image
-from scipy import ndimage
 
-from api.schemas import AnalyzeRequest, AnalyzeResponse
-from api.models import load_classifier_model, load_localization_model
+from api.schemas import AnalyzeRequest, AnalyzeResponse, BatchAnalyzeResponse
+from api.processing import (
+    IMAGE_SIZE,
+    class_probabilities,
+    mask_to_base64_png,
+    postprocess_mask,
+    preprocess_pil,
+    run_models,
+)
+from api.registry import registry
 
 logger = logging.getLogger(__name__)
 
-BASE_DIR = Path(__file__).resolve().parent
-IMAGE_SIZE = (224, 224)
-INFERENCE_ROOT = BASE_DIR.parent.parent
-
-CLASSIFIER_CKPT = INFERENCE_ROOT / "core/models/ai_detection/best_classifier_finetuned.weights.h5"
-LOCALIZATION_CKPT = INFERENCE_ROOT / "core/models/tamper_localization/best_localization_phase2.weights.h5"
-
-AI_GENERATED_THRESHOLD = 0.6
-MASK_THRESHOLD = 0.5
-MIN_EDITED_AREA_RATIO = 0.001
-MIN_MASK_PIXELS_ABSOLUTE = 10
-MORPH_CLOSING_SIZE = 3
-
 router = APIRouter()
 
-CLASSIFIER_MODEL = None
-LOCALIZATION_MODEL = None
 
-try:
-    if CLASSIFIER_CKPT.exists():
-        CLASSIFIER_MODEL = load_classifier_model(CLASSIFIER_CKPT, IMAGE_SIZE, strict=False)
-    else:
-        logger.error(f"Classifier checkpoint not found: {CLASSIFIER_CKPT}")
-    
-    if LOCALIZATION_CKPT.exists():
-        LOCALIZATION_MODEL = load_localization_model(LOCALIZATION_CKPT, IMAGE_SIZE, strict=False)
-    else:
-        logger.warning(f"Localization checkpoint not found: {LOCALIZATION_CKPT}")
-    
-    _dummy = tf.zeros((1, *IMAGE_SIZE, 3), dtype=tf.float32)
-    
-    if CLASSIFIER_MODEL is not None:
-        try:
-            CLASSIFIER_MODEL.predict(_dummy, verbose=0)
-            logger.info("Classifier model warmup successful")
-        except Exception as e:
-            logger.error(f"Classifier model warmup failed: {e}")
+def require_ready():
+    if not registry.ready():
+        raise HTTPException(status_code=503, detail="Models are not loaded yet; see /readyz")
 
-    if LOCALIZATION_MODEL is not None:
-        try:
-            LOCALIZATION_MODEL.predict(_dummy, verbose=0)
-            logger.info("Localization model warmup successful")
-        except Exception as e:
-            logger.error(f"Localization model warmup failed: {e}")
 
-except Exception as e:
-    logger.error(f"Failed to load models: {e}")
-
-
-def preprocess_pil(img: Image.Image):
-    img = img.convert("RGB")
-    img = img.resize(IMAGE_SIZE, Image.BILINEAR)
-    arr = np.asarray(img).astype(np.float32) / 255.0   
-    arr = tf.keras.applications.efficientnet.preprocess_input(arr * 255.0)
-    return arr
-
-
-def postprocess_mask(mask_logit: np.ndarray, original_size: tuple) -> tuple:
-    mask_prob = tf.sigmoid(mask_logit).numpy()
-    
-    if mask_prob.ndim == 3:
-        mask_prob = mask_prob.squeeze()
-    
-    mask_bin = (mask_prob > MASK_THRESHOLD).astype(np.uint8)
-    
-    if np.any(mask_bin):
-        structure = np.ones((MORPH_CLOSING_SIZE, MORPH_CLOSING_SIZE), dtype=np.uint8)
-        mask_bin = ndimage.binary_closing(mask_bin, structure=structure).astype(np.uint8)
-    
-    n_pixels = int(np.sum(mask_bin))
-    total_pixels = original_size[0] * original_size[1]
-    edited_area_ratio = n_pixels / total_pixels if total_pixels > 0 else 0.0
-    
-    is_edited = (
-        edited_area_ratio >= MIN_EDITED_AREA_RATIO and
-        n_pixels >= MIN_MASK_PIXELS_ABSOLUTE
-    )
-    
-    return is_edited, mask_bin, edited_area_ratio, n_pixels
+async def process_images(imgs: list):
+    batch = np.stack([preprocess_pil(img) for img in imgs])
 
+    class_logits, mask_logits, model_versions = run_models(registry.snapshot(), batch)
+    class_probs = class_probabilities(class_logits, len(imgs))
 
-def mask_to_base64_png(mask_arr: np.ndarray) -> str:
-    if mask_arr.ndim == 3 and mask_arr.shape[-1] == 1:
-        mask_arr = mask_arr[..., 0]
-    
-    mask_img = mask_arr.astype(np.uint8) * 255
-    pil = Image.fromarray(mask_img, mode="L")
-    buf = io.BytesIO()
-    pil.save(buf, format="PNG")
-    b64 = base64.b64encode(buf.getvalue()).decode("ascii")
-    return f"data:image/png;base64,{b64}"
-
-
-async def process_image(img: Image.Image):
-    original_size = img.size
-    arr = preprocess_pil(img)
-    batch = np.expand_dims(arr, axis=0)
-
-    classification_result = None
-    if CLASSIFIER_MODEL is None:
-        logger.error("Classifier model not loaded. Classification skipped.")
-        raise RuntimeError("Classifier model not available")
-    else:
-        class_logit_np = CLASSIFIER_MODEL.predict(batch, verbose=0)
-        class_logit = float(class_logit_np.flatten()[0])
-        class_prob = 1.0 / (1.0 + np.exp(-class_logit))
-        is_ai_generated = bool(class_prob > AI_GENERATED_THRESHOLD)
-        
+    results = []
+    for i in range(len(imgs)):
+        class_prob = float(class_probs[i])
         classification_result = {
-            "is_ai_generated": is_ai_generated,
+            "is_ai_generated": bool(class_prob > AI_GENERATED_THRESHOLD),
             "is_uncertain": False,
-            "confidence": float(class_prob),
-        }
-    
-    tampering_result = None
-    if LOCALIZATION_MODEL is None:
-        logger.warning("Localization model not loaded. Tampering detection skipped.")
-        tampering_result = {
-            "detected": False,
-            "mask_base64": None,
-            "edited_area_ratio": 0.0,
-            "edited_pixels": 0,
-        }
-    else:
-        mask_logit_np = LOCALIZATION_MODEL.predict(batch, verbose=0)
-        mask_logit = mask_logit_np.squeeze()
-        
-        is_edited, mask_bin, edited_area_ratio, n_pixels = postprocess_mask(
-            mask_logit, 
-            (IMAGE_SIZE[0], IMAGE_SIZE[1])
-        )
-        
-        mask_base64 = mask_to_base64_png(mask_bin) if is_edited else None
-        
-        tampering_result = {
-            "detected": is_edited,
-            "mask_base64": mask_base64,
-            "edited_area_ratio": float(edited_area_ratio),
-            "edited_pixels": n_pixels,
+            "confidence": class_prob,
         }
 
-    response = {
-        "predictions": classification_result,
-        "tampering": tampering_result,
-    }
+        if mask_logits is None:
+            tampering_result = {
+                "detected": False,
+                "mask_base64": None,
+                "edited_area_ratio": 0.0,
+                "edited_pixels": 0,
+            }
+        else:
+            is_edited, mask_bin, edited_area_ratio, n_pixels = postprocess_mask(
+                mask_logits[i].squeeze(),
+                (IMAGE_SIZE[0], IMAGE_SIZE[1])
+            )
+
+            mask_base64 = mask_to_base64_png(mask_bin) if is_edited else None
+
+            tampering_result = {
+                "detected": is_edited,
+                "mask_base64": mask_base64,
+                "edited_area_ratio": float(edited_area_ratio),
+                "edited_pixels": n_pixels,
+            }
+
+        results.append({
+            "predictions": classification_result,
+            "tampering": tampering_result,
+            "model_versions": model_versions,
+        })
+
+    return results
+
 
-    return response
+async def process_image(img: Image.Image):
+    results = await process_images([img])
+    return results[0]
 
 
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze(request: AnalyzeRequest):
+    require_ready()
     try:
         response = requests.get(str(request.image_url), timeout=30)
         response.raise_for_status()
@@ -190,6 +108,7 @@ async def analyze(request: AnalyzeRequest):
 
 @router.post("/predict", response_model=AnalyzeResponse)
 async def predict(file: UploadFile = File(...)):
+    require_ready()
     if file.content_type and file.content_type.split("/")[0] != "image":
         raise HTTPException(status_code=400, detail="File is not an image")
     
@@ -202,3 +121,24 @@ async def predict(file: UploadFile = File(...)):
 
     result = await process_image(img)
     return AnalyzeResponse(**result)
+
+
+@router.post("/predict/batch", response_model=BatchAnalyzeResponse)
+async def predict_batch(files: List[UploadFile] = File(...)):
+    require_ready()
+    if len(files) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images per batch")
+
+    imgs = []
+    for file in files:
+        if file.content_type and file.content_type.split("/")[0] != "image":
+            raise HTTPException(status_code=400, detail=f"File is not an image: {file.filename}")
+
+        contents = await file.read()
+        try:
+            imgs.append(Image.open(io.BytesIO(contents)))
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Failed to open image {file.filename}: {e}")
+
+    results = await process_images(imgs)
+    return BatchAnalyzeResponse(results=[AnalyzeResponse(**r) for r in results])
@@ -0,0 +1,42 @@
+import logging
+from pathlib import Path
+
+from fastapi import APIRouter, HTTPException
+
+from api.config import INFERENCE_ROOT, MODELS_DIR
+from api.schemas import ModelsStatusResponse, ReloadRequest, ReloadResponse
+from api.registry import registry
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+def resolve_checkpoint(checkpoint_path: str) -> Path:
+    path = Path(checkpoint_path)
+    if not path.is_absolute():
+        path = INFERENCE_ROOT / path
+    path = path.resolve()
+
+    if not path.is_relative_to(MODELS_DIR.resolve()):
+        raise HTTPException(status_code=400, detail=f"Checkpoint must be under {MODELS_DIR}")
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=f"Checkpoint not found: {checkpoint_path}")
+    return path
+
+
+@router.get("/models/status", response_model=ModelsStatusResponse)
+def models_status():
+    return ModelsStatusResponse(**registry.status())
+
+
+@router.post("/models/reload", response_model=ReloadResponse, status_code=202)
+def reload_model(request: ReloadRequest):
+    checkpoint = resolve_checkpoint(request.checkpoint_path)
+    try:
+        version, _ = registry.load_async(request.kind, checkpoint, request.version)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.info(f"Queued {request.kind} reload from {checkpoint}")
+
+    return ReloadResponse(kind=request.kind, version=version, status="loading")
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, HttpUrl, Field
 
 
@@ -31,9 +31,15 @@ class Tampering(BaseModel):
     )
 
 
+class ModelVersions(BaseModel):
+    classifier: Optional[str] = None
+    localization: Optional[str] = None
+
+
 class AnalyzeResponse(BaseModel):
     predictions: AIPrediction
     tampering: Tampering
+    model_versions: Optional[ModelVersions] = None
 
     class Config:
         json_schema_extra = {
@@ -48,6 +54,57 @@ class AnalyzeResponse(BaseModel):
                     "mask_base64": None,
                     "edited_area_ratio": 0.0,
                     "edited_pixels": 0
+                },
+                "model_versions": {
+                    "classifier": "best_classifier_finetuned@20251201120000",
+                    "localization": "best_localization_phase2@20251201120000"
                 }
             }
         }
+
+
+class BatchAnalyzeResponse(BaseModel):
+    results: List[AnalyzeResponse]
+
+
+class ModelVersionInfo(BaseModel):
+    version: str
+    checkpoint: str
+    loaded_at: str
+    warmup_seconds: Optional[float] = None
+    backend: Optional[str] = None
+    input_spec: Dict[str, Any] = Field(default_factory=dict)
+    buckets: List[int] = Field(default_factory=list)
+    traces: int = 0
+    retraces: int = Field(0, description="Graph traces after warmup; should stay 0")
+
+
+class ModelsStatusResponse(BaseModel):
+    models: Dict[str, ModelVersionInfo]
+    pending: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Versions currently loading or warming up, by model kind"
+    )
+    errors: Dict[str, str] = Field(
+        default_factory=dict,
+        description="Last load failure per model kind"
+    )
+    backend: Optional[str] = None
+    batch_buckets: List[int] = Field(default_factory=list)
+    retraces: int = Field(0, description="Post-warmup retraces across active models")
+    ready: bool = Field(False, description="Startup loading has finished and a classifier is active")
+
+
+class ReloadRequest(BaseModel):
+    kind: Literal["classifier", "localization", "fused"]
+    checkpoint_path: str = Field(
+        ...,
+        description="Checkpoint path, relative to the inference root or absolute, under core/models"
+    )
+    version: Optional[str] = None
+
+
+class ReloadResponse(BaseModel):
+    kind: str
+    version: Optional[str] = None
+    status: str
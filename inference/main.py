@@ -1,8 +1,21 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api.routes import analyze
+from fastapi.responses import JSONResponse
+from api.routes import analyze, models
+from api.registry import registry, start_default_models
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Models load and warm up on the registry's loader thread, so the server
+    # answers /healthz while TensorFlow is still starting.
+    start_default_models()
+    yield
+
 
-app = FastAPI(title="ProofOfArt Inference Service")
+app = FastAPI(title="ProofOfArt Inference Service", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,7 +26,33 @@ app.add_middleware(
 )
 
 app.include_router(analyze.router, prefix="/api/v1")
+app.include_router(models.router, prefix="/api/v1")
 
 @app.get("/")
 def health_check():
-    return {"status": "ok", "service": "inference"}
\ No newline at end of file
+    return {"status": "ok", "service": "inference"}
+
+
+@app.get("/healthz")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readiness():
+    status = registry.status()
+    if status["ready"]:
+        state = "ready"
+    elif any(kind in status["errors"] for kind in ("classifier", "fused")):
+        state = "failed"
+    else:
+        state = "loading"
+    body = {
+        "status": state,
+        "models": {kind: info["version"] for kind, info in status["models"].items()},
+        "pending": status["pending"],
+        "errors": status["errors"],
+    }
+    if not status["ready"]:
+        return JSONResponse(status_code=503, content=body)
+    return body
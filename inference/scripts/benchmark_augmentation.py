@@ -0,0 +1,91 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from utils.augment import augment_batch, augment_image_and_mask
+from utils.datasets import tamper_dataset, tamper_entries
+from utils.manifests import TAMPER_MANIFEST, read_tamper_manifest
+from utils.shard_store import open_store
+
+IMAGE_SIZE = (224, 224)
+BATCH_SIZE = 16
+
+
+def synthetic_dataset(num_images):
+    rng = np.random.default_rng(42)
+    images = rng.random((num_images, *IMAGE_SIZE, 3), dtype=np.float32)
+    masks = (rng.random((num_images, *IMAGE_SIZE, 1)) > 0.9).astype(np.float32)
+    return tf.data.Dataset.from_tensor_slices((images, masks)).cache()
+
+
+def manifest_dataset(num_images):
+    entries = tamper_entries(read_tamper_manifest())[:num_images]
+    store = open_store("tamper", TAMPER_MANIFEST, IMAGE_SIZE)
+    ds = tamper_dataset(entries, IMAGE_SIZE, store=store)
+    return ds.map(lambda img, labels: (img, labels[1])).cache()
+
+
+def per_example_pipeline(ds):
+    return (
+        ds.map(augment_image_and_mask, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(BATCH_SIZE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+
+def batched_pipeline(ds):
+    return (
+        ds.batch(BATCH_SIZE)
+        .map(augment_batch, num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+
+def measure(ds, epochs):
+    # The first pass fills the cache and is not timed.
+    for _ in ds:
+        pass
+    images = 0
+    start = time.perf_counter()
+    for _ in range(epochs):
+        for batch_images, _ in ds:
+            images += int(batch_images.shape[0])
+    return images / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-example and batched mask augmentation throughput")
+    parser.add_argument("--source", choices=["synthetic", "manifest"], default="synthetic")
+    parser.add_argument("--num-images", type=int, default=1024)
+    parser.add_argument("--epochs", type=int, default=3)
+    parser.add_argument("--report", type=str, default=None, help="Optional path for a JSON copy of the results")
+    args = parser.parse_args()
+
+    if args.source == "synthetic":
+        base = synthetic_dataset(args.num_images)
+    else:
+        base = manifest_dataset(args.num_images)
+
+    results = {}
+    for name, build in [("per_example", per_example_pipeline), ("batched", batched_pipeline)]:
+        results[name] = measure(build(base), args.epochs)
+        print(f"{name:12s}: {results[name]:10.1f} images/s")
+    results["speedup"] = results["batched"] / results["per_example"]
+    print(f"Speedup: {results['speedup']:.2f}x")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"source": args.source, "batch_size": BATCH_SIZE, **results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
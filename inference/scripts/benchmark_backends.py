@@ -0,0 +1,184 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import json
+import time
+
+import numpy as np
+
+from api.backends import create_backend
+from api.config import AI_GENERATED_THRESHOLD, INFERENCE_BACKENDS, INFERENCE_PRECISION, MASK_THRESHOLD
+from api.processing import IMAGE_SIZE, load_image, normalize, sigmoid
+from api.registry import DEFAULT_CHECKPOINTS
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+IMAGE_DIR = INFERENCE_ROOT / "dataset/images"
+REPORT_PATH = INFERENCE_ROOT / "core/models/backend_report.json"
+REFERENCE_BACKEND = "tensorflow"
+
+
+def load_images(image_dir: Path, limit: int):
+    paths = sorted(
+        p for p in image_dir.rglob("*")
+        if p.suffix.lower() in [".jpg", ".jpeg", ".png"]
+    )
+    if len(paths) == 0:
+        raise ValueError(f"No images found under {image_dir}")
+
+    rng = np.random.default_rng(42)
+    if len(paths) > limit:
+        paths = [paths[i] for i in rng.choice(len(paths), size=limit, replace=False)]
+    return normalize(np.stack([load_image(p) for p in paths]))
+
+
+def named_outputs(kind, outputs):
+    if kind == "fused":
+        return {"class_logits": outputs[0], "mask_logits": outputs[1]}
+    return {"class_logits" if kind == "classifier" else "mask_logits": outputs}
+
+
+def measure_latency(model, images, batch_size, iterations):
+    batch = images[:batch_size]
+    model.predict(batch)
+    times = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        model.predict(batch)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1000.0
+    return {
+        "p50_ms": float(np.percentile(times, 50)),
+        "p95_ms": float(np.percentile(times, 95)),
+        "images_per_s": float(batch_size * iterations / (times.sum() / 1000.0)),
+    }
+
+
+def dice_per_image(mask_a, mask_b, eps=1e-6):
+    a = mask_a.reshape(len(mask_a), -1).astype(np.float32)
+    b = mask_b.reshape(len(mask_b), -1).astype(np.float32)
+    inter = 2.0 * np.sum(a * b, axis=1)
+    union = np.sum(a, axis=1) + np.sum(b, axis=1)
+    return np.where(union > 0, inter / (union + eps), 1.0)
+
+
+def compare(reference, candidate):
+    parity = {}
+    if "class_logits" in reference:
+        ref = sigmoid(reference["class_logits"].reshape(-1))
+        cand = sigmoid(candidate["class_logits"].reshape(-1))
+        delta = np.abs(ref - cand)
+        parity.update({
+            "class_logit_max_abs_delta": float(np.abs(reference["class_logits"] - candidate["class_logits"]).max()),
+            "confidence_max_abs_delta": float(delta.max()),
+            "decision_agreement": float(np.mean((ref > AI_GENERATED_THRESHOLD) == (cand > AI_GENERATED_THRESHOLD))),
+        })
+    if "mask_logits" in reference:
+        dice = dice_per_image(sigmoid(reference["mask_logits"]) > MASK_THRESHOLD,
+                              sigmoid(candidate["mask_logits"]) > MASK_THRESHOLD)
+        parity.update({
+            "mask_logit_max_abs_delta": float(np.abs(reference["mask_logits"] - candidate["mask_logits"]).max()),
+            "mask_dice_mean": float(dice.mean()),
+            "mask_dice_min": float(dice.min()),
+        })
+    return parity
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check numerical parity and compare latency of the inference backends")
+    parser.add_argument("--backends", nargs="+", default=list(INFERENCE_BACKENDS), help=f"Any of {', '.join(INFERENCE_BACKENDS)}")
+    parser.add_argument("--image-dir", type=Path, default=IMAGE_DIR)
+    parser.add_argument("--num-images", type=int, default=128)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--max-confidence-delta", type=float, default=1e-3)
+    parser.add_argument("--min-mask-dice", type=float, default=0.99)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    args = parser.parse_args()
+
+    if REFERENCE_BACKEND not in args.backends:
+        sys.exit(f"Parity is measured against {REFERENCE_BACKEND}; include it in --backends")
+
+    images = load_images(args.image_dir, args.num_images)
+    print(f"Loaded {len(images)} images from {args.image_dir}")
+
+    outputs = {}
+    latency = {}
+    for name in args.backends:
+        print("=" * 60)
+        print(f"Backend: {name}")
+        print("=" * 60)
+        backend = create_backend(name, args.batch_sizes, IMAGE_SIZE)
+        outputs[name] = {}
+        latency[name] = {}
+        for kind, checkpoint in DEFAULT_CHECKPOINTS.items():
+            if not checkpoint.exists():
+                print(f"Skipping {kind}: checkpoint not found ({checkpoint})")
+                continue
+            model = backend.load(kind, checkpoint)
+            model.warmup()
+            outputs[name].update(named_outputs(kind, model.predict(images)))
+            latency[name][kind] = {}
+            for batch_size in args.batch_sizes:
+                if batch_size > len(images):
+                    continue
+                stats = measure_latency(model, images, batch_size, args.iterations)
+                latency[name][kind][str(batch_size)] = stats
+                print(f"{kind:12s} batch={batch_size:3d} | p50 {stats['p50_ms']:8.1f} ms | "
+                      f"p95 {stats['p95_ms']:8.1f} ms | {stats['images_per_s']:8.1f} img/s")
+
+    results = {
+        "num_images": int(len(images)),
+        "tensorflow_precision": INFERENCE_PRECISION,
+        "latency": latency,
+        "parity": {},
+    }
+    passed = True
+    for name in args.backends:
+        if name == REFERENCE_BACKEND:
+            continue
+        parity = compare(outputs[REFERENCE_BACKEND], outputs[name])
+        ok = (
+            parity.get("confidence_max_abs_delta", 0.0) <= args.max_confidence_delta and
+            parity.get("mask_dice_mean", 1.0) >= args.min_mask_dice
+        )
+        parity["passed"] = bool(ok)
+        passed = passed and ok
+        results["parity"][name] = parity
+
+        print("=" * 60)
+        print(f"PARITY ({name} vs {REFERENCE_BACKEND})")
+        print("=" * 60)
+        if "confidence_max_abs_delta" in parity:
+            print(f"Class logit |delta| max: {parity['class_logit_max_abs_delta']:.2e}")
+            print(f"Confidence |delta| max: {parity['confidence_max_abs_delta']:.2e} (limit {args.max_confidence_delta})")
+            print(f"Decision agreement @ {AI_GENERATED_THRESHOLD}: {parity['decision_agreement']:.4f}")
+        if "mask_dice_mean" in parity:
+            print(f"Mask logit |delta| max: {parity['mask_logit_max_abs_delta']:.2e}")
+            print(f"Mask Dice mean: {parity['mask_dice_mean']:.4f} (limit {args.min_mask_dice}) | min: {parity['mask_dice_min']:.4f}")
+
+        print("=" * 60)
+        print(f"SPEEDUP ({name} / {REFERENCE_BACKEND}, images/s)")
+        print("=" * 60)
+        for kind, per_batch in latency[REFERENCE_BACKEND].items():
+            for batch_size, ref in per_batch.items():
+                other = latency[name][kind][batch_size]
+                print(f"{kind:12s} batch={int(batch_size):3d} | x{other['images_per_s'] / ref['images_per_s']:.2f}")
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nReport saved to: {args.report}")
+
+    if not passed:
+        print("Parity check FAILED")
+        sys.exit(1)
+    print("Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '1'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import json
+import time
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from api.config import AI_GENERATED_THRESHOLD, CLASSIFIER_CKPT, LOCALIZATION_CKPT, MASK_THRESHOLD
+from api.models import load_classifier_model, load_localization_model, set_inference_precision
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+
+IMAGE_SIZE = (224, 224)
+IMAGE_DIR = INFERENCE_ROOT / "dataset/images"
+REPORT_PATH = INFERENCE_ROOT / "core/models/precision_report.json"
+
+
+def load_images(image_dir: Path, limit: int):
+    paths = sorted(
+        p for p in image_dir.rglob("*")
+        if p.suffix.lower() in [".jpg", ".jpeg", ".png"]
+    )
+    if len(paths) == 0:
+        raise ValueError(f"No images found under {image_dir}")
+
+    rng = np.random.default_rng(42)
+    if len(paths) > limit:
+        paths = [paths[i] for i in rng.choice(len(paths), size=limit, replace=False)]
+
+    images = []
+    for path in paths:
+        img = Image.open(path).convert("RGB").resize(IMAGE_SIZE, Image.BILINEAR)
+        images.append(np.asarray(img).astype(np.float32))
+    batch = np.stack(images)
+    return tf.keras.applications.efficientnet.preprocess_input(batch)
+
+
+def build_pair(precision):
+    set_inference_precision(precision)
+    classifier = load_classifier_model(CLASSIFIER_CKPT, IMAGE_SIZE, strict=False)
+    localization = load_localization_model(LOCALIZATION_CKPT, IMAGE_SIZE, strict=False)
+    return classifier, localization
+
+
+def run_model(model, images, batch_size):
+    infer = tf.function(lambda x: model(x, training=False))
+    outputs = []
+    for start in range(0, len(images), batch_size):
+        outputs.append(infer(images[start:start + batch_size]).numpy())
+    return np.concatenate(outputs, axis=0)
+
+
+def measure_throughput(model, images, batch_size, iterations):
+    infer = tf.function(lambda x: model(x, training=False))
+    batch = tf.constant(images[:batch_size])
+    infer(batch).numpy()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        infer(batch).numpy()
+    elapsed = time.perf_counter() - start
+    return (batch_size * iterations) / elapsed
+
+
+def dice_per_image(mask_a, mask_b, eps=1e-6):
+    a = mask_a.reshape(len(mask_a), -1).astype(np.float32)
+    b = mask_b.reshape(len(mask_b), -1).astype(np.float32)
+    inter = 2.0 * np.sum(a * b, axis=1)
+    union = np.sum(a, axis=1) + np.sum(b, axis=1)
+    return np.where(union > 0, inter / (union + eps), 1.0)
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare float32 and bfloat16 (oneDNN) CPU inference")
+    parser.add_argument("--image-dir", type=Path, default=IMAGE_DIR)
+    parser.add_argument("--num-images", type=int, default=256)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--max-confidence-delta", type=float, default=0.02)
+    parser.add_argument("--min-mask-dice", type=float, default=0.95)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir, args.num_images)
+    print(f"Loaded {len(images)} images from {args.image_dir}")
+
+    results = {}
+    outputs = {}
+    for precision in ["float32", "bfloat16"]:
+        print("=" * 60)
+        print(f"Precision: {precision}")
+        print("=" * 60)
+        classifier, localization = build_pair(precision)
+
+        class_logits = run_model(classifier, images, batch_size=32).reshape(-1)
+        mask_logits = run_model(localization, images, batch_size=32)
+        outputs[precision] = (sigmoid(class_logits), sigmoid(mask_logits) > MASK_THRESHOLD)
+
+        throughput = {}
+        for batch_size in args.batch_sizes:
+            if batch_size > len(images):
+                continue
+            clf_ips = measure_throughput(classifier, images, batch_size, args.iterations)
+            loc_ips = measure_throughput(localization, images, batch_size, args.iterations)
+            throughput[str(batch_size)] = {"classifier_ips": clf_ips, "localization_ips": loc_ips}
+            print(f"batch={batch_size:3d} | classifier {clf_ips:8.1f} img/s | localization {loc_ips:8.1f} img/s")
+        results[precision] = {"throughput": throughput}
+
+    set_inference_precision("float32")
+
+    conf_fp32, mask_fp32 = outputs["float32"]
+    conf_bf16, mask_bf16 = outputs["bfloat16"]
+    conf_delta = np.abs(conf_fp32 - conf_bf16)
+    decision_agreement = np.mean((conf_fp32 > AI_GENERATED_THRESHOLD) == (conf_bf16 > AI_GENERATED_THRESHOLD))
+    dice = dice_per_image(mask_fp32, mask_bf16)
+
+    parity = {
+        "num_images": int(len(images)),
+        "confidence_max_abs_delta": float(conf_delta.max()),
+        "confidence_mean_abs_delta": float(conf_delta.mean()),
+        "decision_agreement": float(decision_agreement),
+        "mask_dice_mean": float(dice.mean()),
+        "mask_dice_min": float(dice.min()),
+    }
+    passed = (
+        parity["confidence_max_abs_delta"] <= args.max_confidence_delta and
+        parity["mask_dice_mean"] >= args.min_mask_dice
+    )
+    parity["passed"] = bool(passed)
+    results["parity"] = parity
+
+    print("=" * 60)
+    print("PARITY (bfloat16 vs float32)")
+    print("=" * 60)
+    print(f"Confidence |delta| max: {parity['confidence_max_abs_delta']:.4f} (limit {args.max_confidence_delta})")
+    print(f"Confidence |delta| mean: {parity['confidence_mean_abs_delta']:.4f}")
+    print(f"Decision agreement @ {AI_GENERATED_THRESHOLD}: {parity['decision_agreement']:.4f}")
+    print(f"Mask Dice mean: {parity['mask_dice_mean']:.4f} (limit {args.min_mask_dice}) | min: {parity['mask_dice_min']:.4f}")
+
+    print("=" * 60)
+    print("SPEEDUP (bfloat16 / float32)")
+    print("=" * 60)
+    for batch_size, fp32 in results["float32"]["throughput"].items():
+        bf16 = results["bfloat16"]["throughput"][batch_size]
+        print(f"batch={int(batch_size):3d} | classifier x{bf16['classifier_ips'] / fp32['classifier_ips']:.2f} | "
+              f"localization x{bf16['localization_ips'] / fp32['localization_ips']:.2f}")
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nReport saved to: {args.report}")
+
+    if not passed:
+        print("Parity check FAILED")
+        sys.exit(1)
+    print("Parity check passed")
+
+
+if __name__ == "__main__":
+    main()
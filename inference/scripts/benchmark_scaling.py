@@ -0,0 +1,127 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import importlib.util
+import json
+import tempfile
+import time
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+REPORT_PATH = INFERENCE_ROOT / "core/models/scaling_report.json"
+
+IMAGE_SIZE = (224, 224)
+
+
+def load_multihead_module():
+    spec = importlib.util.spec_from_file_location("train_multihead_mask", SCRIPT_DIR / "train_multihead_mask.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_worker(args):
+    from utils.distributed import get_strategy, is_chief, num_workers, shard_by_data
+
+    # Join the worker cluster before anything else touches TF.
+    strategy = get_strategy()
+    multihead = load_multihead_module()
+
+    import tensorflow as tf
+
+    global_batch = args.batch_size * strategy.num_replicas_in_sync
+
+    images = tf.random.uniform((global_batch, *IMAGE_SIZE, 3), 0.0, 255.0)
+    y_class = tf.cast(tf.random.uniform((global_batch, 1)) > 0.5, tf.float32)
+    y_mask = tf.cast(tf.random.uniform((global_batch, *IMAGE_SIZE, 1)) > 0.9, tf.float32)
+    ds = tf.data.Dataset.from_tensors((images, (y_class, y_mask))).repeat()
+    ds = strategy.experimental_distribute_dataset(shard_by_data(ds))
+
+    with strategy.scope():
+        model = multihead.build_multihead(load_classifier_ckpt=False)
+    trainer = multihead.MultiHeadTrainer(model, strategy=strategy)
+
+    iterator = iter(ds)
+    for _ in range(args.warmup):
+        imgs, (yc, ym) = next(iterator)
+        float(trainer.train_step(imgs, yc, ym)[0])
+
+    start = time.perf_counter()
+    for _ in range(args.steps):
+        imgs, (yc, ym) = next(iterator)
+        float(trainer.train_step(imgs, yc, ym)[0])
+    elapsed = time.perf_counter() - start
+
+    if is_chief():
+        result = {
+            "workers": num_workers(),
+            "global_batch": global_batch,
+            "steps": args.steps,
+            "seconds": elapsed,
+            "images_per_s": args.steps * global_batch / elapsed,
+        }
+        with open(args.result, "w") as f:
+            json.dump(result, f)
+
+
+def run_sweep(args):
+    from utils.distributed import launch_local_workers
+
+    results = []
+    for workers in args.workers:
+        print("=" * 60)
+        print(f"{workers} worker(s)")
+        print("=" * 60)
+        with tempfile.TemporaryDirectory() as tmp:
+            result_path = Path(tmp) / "result.json"
+            launch_local_workers([
+                str(Path(__file__).resolve()), "--worker",
+                "--batch-size", str(args.batch_size),
+                "--steps", str(args.steps),
+                "--warmup", str(args.warmup),
+                "--result", str(result_path),
+            ], workers)
+            with open(result_path) as f:
+                results.append(json.load(f))
+
+    baseline = results[0]["images_per_s"] / results[0]["workers"]
+    print("\n" + "=" * 60)
+    print("Scaling (multihead train step, synthetic data, per-worker batch "
+          f"{args.batch_size})")
+    print("=" * 60)
+    for result in results:
+        result["speedup"] = result["images_per_s"] / baseline
+        result["efficiency"] = result["speedup"] / result["workers"]
+        print(f"{result['workers']:2d} workers: {result['images_per_s']:8.2f} images/s | "
+              f"speedup {result['speedup']:.2f}x | efficiency {result['efficiency'] * 100:.0f}%")
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump({"batch_size_per_worker": args.batch_size, "results": results}, f, indent=2)
+    print(f"\nReport saved to: {args.report}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure multi-worker scaling of the multihead training step on CPU")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-size", type=int, default=4, help="Per-worker batch size")
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+    else:
+        run_sweep(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import time
+
+from utils.datasets import tamper_store_items
+from utils.manifests import DATASET_MANIFEST, TAMPER_MANIFEST, read_dataset_manifest, read_tamper_manifest
+from utils.shard_store import DEFAULT_SHARD_SIZE, KINDS, STORE_DIR, build_store
+
+IMAGE_SIZE = (224, 224)
+
+
+def store_items(kind):
+    if kind == "classification":
+        return DATASET_MANIFEST, [(r["path"], '') for r in read_dataset_manifest()]
+    return TAMPER_MANIFEST, tamper_store_items(read_tamper_manifest())
+
+
+def dir_size(path: Path):
+    return sum(p.stat().st_size for p in path.iterdir() if p.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode and resize the manifest images once into a sharded uint8 store")
+    parser.add_argument("--kind", choices=[*KINDS, "all"], default="all")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--store-dir", type=Path, default=STORE_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if a store with this version exists")
+    args = parser.parse_args()
+
+    kinds = KINDS if args.kind == "all" else [args.kind]
+    for kind in kinds:
+        manifest, items = store_items(kind)
+        print("=" * 60)
+        print(f"Building {kind} store from {manifest} ({len(items)} images)")
+        print("=" * 60)
+        start = time.perf_counter()
+        path = build_store(
+            kind, items, manifest, IMAGE_SIZE,
+            shard_size=args.shard_size, store_dir=args.store_dir, force=args.force,
+        )
+        elapsed = time.perf_counter() - start
+        size_mb = dir_size(path) / (1024 * 1024)
+        print(f"{kind} store: {path} ({size_mb:.1f} MB, {elapsed:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
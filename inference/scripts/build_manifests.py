@@ -0,0 +1,356 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import csv
+import hashlib
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+from utils.manifests import (
+    CLASS_NAMES,
+    CLASSIFICATION_ROOT,
+    DATASET_MANIFEST,
+    INFERENCE_ROOT,
+    MANIFEST_DIR,
+    TAMPER_MANIFEST,
+    TAMPER_ROOT,
+    classification_rerooted,
+    normalize_manifest_path,
+    reroot_classification,
+    tamper_row_paths,
+)
+
+# Matches *.cache in .gitignore
+CACHE_PATH = MANIFEST_DIR / "file_index.cache"
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png'}
+CHUNK_SIZE = 1 << 20
+# --prune refuses to drop more than this fraction of a manifest's rows; that
+# many missing files means the images are not where the scan looked.
+MAX_PRUNE_FRACTION = 0.5
+
+
+def scan(directory: Path):
+    """relative path -> (mtime_ns, size) for every image under directory."""
+    files = {}
+    if not directory.exists():
+        return files
+    stack = [str(directory)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                    st = entry.stat()
+                    rel = os.path.relpath(entry.path, INFERENCE_ROOT).replace("\\", "/")
+                    files[rel] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def inspect_file(path):
+    """Hash a file and fully decode it. Runs in the worker processes."""
+    digest = hashlib.sha256()
+    buffer = io.BytesIO()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                buffer.write(chunk)
+        buffer.seek(0)
+        with Image.open(buffer) as img:
+            img.load()
+            width, height = img.size
+        return {"sha256": digest.hexdigest(), "width": width, "height": height, "error": None}
+    except Exception as e:
+        return {"sha256": digest.hexdigest(), "width": None, "height": None, "error": str(e)}
+
+
+def load_cache():
+    if not CACHE_PATH.exists():
+        return {}
+    try:
+        with open(CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        print(f"Warning: ignoring unreadable cache {CACHE_PATH}")
+        return {}
+
+
+def save_cache(cache):
+    tmp = CACHE_PATH.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp, CACHE_PATH)
+
+
+def refresh(files, cache, workers):
+    """Inspect only files whose (mtime, size) differ from the cache. Returns the
+    new cache, covering exactly the files on disk, and the number inspected."""
+    fresh = {}
+    stale = []
+    for rel, (mtime_ns, size) in files.items():
+        entry = cache.get(rel)
+        if entry is not None and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+            fresh[rel] = entry
+        else:
+            stale.append(rel)
+
+    if stale:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            paths = [str(INFERENCE_ROOT / rel) for rel in stale]
+            for rel, info in zip(stale, executor.map(inspect_file, paths, chunksize=64)):
+                mtime_ns, size = files[rel]
+                fresh[rel] = {"mtime_ns": mtime_ns, "size": size, **info}
+    return fresh, len(stale)
+
+
+def write_csv(path: Path, header, rows, dict_rows):
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", newline='', encoding="utf-8") as f:
+        if dict_rows:
+            writer = csv.DictWriter(f, fieldnames=header)
+            writer.writeheader()
+        else:
+            writer = csv.writer(f)
+            writer.writerow(header)
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def _set(row, key, value):
+    value = "" if value is None else str(value)
+    if row.get(key) != value:
+        row[key] = value
+        return True
+    return False
+
+
+def allow_prune(name, missing, total):
+    if total and missing / total > MAX_PRUNE_FRACTION:
+        print(f"Warning: {missing} of {total} rows of {name} point at missing files; not pruning. "
+              f"Check that the images are where the manifest says.")
+        return False
+    return True
+
+
+def read_dataset_rows():
+    with open(DATASET_MANIFEST, newline='', encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return reader.fieldnames, list(reader)
+
+
+def classification_image_root(rows):
+    """Directory the classification images are scanned under: the tree the
+    manifest records (dataset/images) or CLASSIFICATION_ROOT, decided the
+    same way read_dataset_manifest() does."""
+    records = [{"path": normalize_manifest_path(row["file_path"])} for row in rows]
+    return CLASSIFICATION_ROOT if classification_rerooted(records) else "dataset/images"
+
+
+def update_dataset_manifest(files, index, prune, header, rows, image_root):
+    rerooted = image_root == CLASSIFICATION_ROOT
+    resolved = []
+    # New rows get the source name the manifest already uses for their
+    # directory (e.g. coco for coco_real) and the manifest's path layout.
+    sources = {}
+    for row in rows:
+        rel = normalize_manifest_path(row["file_path"])
+        if rerooted:
+            rel = reroot_classification(rel)
+        resolved.append(rel)
+        if rel.startswith(image_root + "/"):
+            parts = Path(rel).relative_to(image_root).parts
+            if len(parts) > 2:
+                sources.setdefault(parts[:2], row.get("source") or parts[1])
+
+    report = {"missing": [], "corrupt": [], "updated": 0, "added": 0, "removed": 0}
+    missing = sum(rel not in files for rel in resolved)
+    prune = prune and allow_prune("dataset_manifest.csv", missing, len(rows))
+    referenced = set()
+    kept = []
+    for row, rel in zip(rows, resolved):
+        if rel not in files:
+            report["missing"].append(row["file_path"])
+            if prune:
+                report["removed"] += 1
+                continue
+            kept.append(row)
+            continue
+
+        referenced.add(rel)
+        info = index[rel]
+        if info["error"]:
+            report["corrupt"].append(rel)
+        else:
+            changed = _set(row, "sha256", info["sha256"])
+            changed |= _set(row, "width", info["width"])
+            changed |= _set(row, "height", info["height"])
+            report["updated"] += int(changed)
+        kept.append(row)
+
+    for rel in sorted(set(files) - referenced):
+        info = index[rel]
+        if info["error"]:
+            report["corrupt"].append(rel)
+            continue
+        parts = Path(rel).relative_to(image_root).parts
+        kept.append({
+            "file_path": "dataset/images/" + "/".join(parts),
+            "label": parts[0],
+            "source": sources.get(parts[:2], parts[1]) if len(parts) > 2 else "",
+            "url": "",
+            "width": info["width"],
+            "height": info["height"],
+            "sha256": info["sha256"],
+        })
+        report["added"] += 1
+
+    return header, kept, report
+
+
+def update_tamper_manifest(files, index, prune):
+    with open(TAMPER_MANIFEST, newline='', encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    col = {name: i for i, name in enumerate(header)}
+
+    def by_stem(kind):
+        prefix = f"{TAMPER_ROOT}/{kind}/"
+        stems = {}
+        for rel in files:
+            if rel.startswith(prefix):
+                sub, _, name = rel[len(prefix):].rpartition("/")
+                stems[(sub, os.path.splitext(name)[0])] = rel
+        return stems
+
+    originals, edited, masks = by_stem("originals"), by_stem("edited"), by_stem("masks")
+
+    report = {"missing": [], "corrupt": [], "unmatched": [], "orphaned_masks": [],
+              "updated": 0, "added": 0, "removed": 0}
+    missing_rows = sum(len(row) >= 4 and any(p not in files for p in tamper_row_paths(row)) for row in rows)
+    prune = prune and allow_prune("tamper_manifest.csv", missing_rows, len(rows))
+    referenced = set()
+    kept = []
+    for row in rows:
+        if len(row) < 4:
+            kept.append(row)
+            continue
+        paths = tamper_row_paths(row)
+        missing = [p for p in paths if p not in files]
+        if missing:
+            report["missing"].extend(missing)
+            if prune:
+                report["removed"] += 1
+                continue
+            kept.append(row)
+            continue
+
+        referenced.add(paths[1])
+        info = index[paths[1]]
+        # Rows in the short six-column layout have no width/height columns,
+        # so only full rows are refreshed.
+        if not info["error"] and len(row) == len(header):
+            before = list(row)
+            row[col["sha256"]] = info["sha256"]
+            row[col["width"]] = str(info["width"])
+            row[col["height"]] = str(info["height"])
+            report["updated"] += int(row != before)
+        kept.append(row)
+
+    for key, edited_rel in sorted(edited.items()):
+        original_rel, mask_rel = originals.get(key), masks.get(key)
+        if original_rel is None or mask_rel is None:
+            report["unmatched"].append(edited_rel)
+            continue
+        if edited_rel in referenced:
+            continue
+        info = index[edited_rel]
+        if info["error"]:
+            continue
+        new_row = [""] * len(header)
+        new_row[col["original_path"]] = original_rel
+        new_row[col["edited_path"]] = edited_rel
+        new_row[col["mask_path"]] = mask_rel
+        new_row[col["source"]] = key[0]
+        new_row[col["sha256"]] = info["sha256"]
+        new_row[col["width"]] = str(info["width"])
+        new_row[col["height"]] = str(info["height"])
+        kept.append(new_row)
+        report["added"] += 1
+
+    report["unmatched"].extend(rel for key, rel in sorted(originals.items()) if key not in edited)
+    report["orphaned_masks"] = [rel for key, rel in sorted(masks.items()) if key not in edited]
+    report["corrupt"] = sorted(rel for rel in files if index[rel]["error"])
+    return header, kept, report
+
+
+def print_report(name, report, limit):
+    print("\n" + "=" * 60)
+    print(name)
+    print("=" * 60)
+    print(f"Rows updated: {report['updated']}, added: {report['added']}, removed: {report['removed']}")
+    for key in ["missing", "corrupt", "unmatched", "orphaned_masks"]:
+        if key not in report:
+            continue
+        items = report[key]
+        print(f"{key.replace('_', ' ').capitalize()}: {len(items)}")
+        for item in items[:limit]:
+            print(f"  {item}")
+        if len(items) > limit:
+            print(f"  ... {len(items) - limit} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify the dataset images and bring the manifests up to date")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--check", action="store_true", help="Report only; exit 1 if anything is missing, corrupt or out of date")
+    parser.add_argument("--prune", action="store_true", help="Drop manifest rows whose files no longer exist")
+    parser.add_argument("--show", type=int, default=10, help="How many paths to list per problem")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    dataset_header, dataset_rows = read_dataset_rows()
+    image_root = classification_image_root(dataset_rows)
+    classification_files = {}
+    for label in CLASS_NAMES:
+        classification_files.update(scan(INFERENCE_ROOT / image_root / label))
+    tamper_files = scan(INFERENCE_ROOT / TAMPER_ROOT)
+    scanned = time.perf_counter()
+
+    cache = load_cache()
+    index, inspected = refresh({**classification_files, **tamper_files}, cache, args.workers)
+    save_cache(index)
+    print(f"Scanned {len(index)} files in {scanned - start:.2f}s; "
+          f"hashed and decoded {inspected} new or changed files in {time.perf_counter() - scanned:.2f}s")
+
+    dataset = update_dataset_manifest(classification_files, index, args.prune, dataset_header, dataset_rows, image_root)
+    tamper = update_tamper_manifest(tamper_files, index, args.prune)
+
+    problems = 0
+    for name, path, (header, rows, report), dict_rows in [
+        ("dataset_manifest.csv", DATASET_MANIFEST, dataset, True),
+        ("tamper_manifest.csv", TAMPER_MANIFEST, tamper, False),
+    ]:
+        print_report(name, report, args.show)
+        changed = report["updated"] + report["added"] + report["removed"]
+        problems += changed + sum(len(report[k]) for k in ["missing", "corrupt", "unmatched", "orphaned_masks"] if k in report)
+        if changed and not args.check:
+            write_csv(path, header, rows, dict_rows)
+            print(f"Wrote {path}")
+
+    print(f"\nDone in {time.perf_counter() - start:.2f}s")
+    if args.check and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
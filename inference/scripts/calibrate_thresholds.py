@@ -0,0 +1,418 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import csv
+import hashlib
+import json
+import random
+import shutil
+
+import numpy as np
+from scipy import ndimage
+
+from api.config import (
+    AI_GENERATED_THRESHOLD,
+    CLASSIFIER_BACKBONE,
+    CLASSIFIER_CKPT,
+    FUSED_CKPT,
+    LOCALIZATION_BACKBONE,
+    LOCALIZATION_CKPT,
+    MASK_THRESHOLD,
+    MIN_EDITED_AREA_RATIO,
+    MIN_MASK_PIXELS_ABSOLUTE,
+    MORPH_CLOSING_SIZE,
+    SERVING_MODE,
+    SERVING_MODES,
+)
+from utils.manifests import CLASS_NAMES, DATASET_MANIFEST, TAMPER_MANIFEST, read_dataset_manifest, read_tamper_manifest
+from utils.shard_store import STORE_DIR
+from utils.splits import CLASSIFICATION_SPLIT, split_records
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+LOGIT_DIR = STORE_DIR / "calibration"
+REPORT_DIR = INFERENCE_ROOT / "core/models/calibration"
+LOGIT_FORMAT = 1
+
+IMAGE_SIZE = (224, 224)
+BATCH_SIZE = 16
+# Chunk of mask images thresholded and closed at once during the sweep
+SWEEP_CHUNK = 256
+
+# Same splits the models were trained with: the persistent classification
+# split, and train_multihead_mask.py's seeded shuffle of the tamper triples.
+CLASSIFICATION_VAL_SPLIT = (0.8, 0.1)
+TAMPER_SPLIT = (0.7, 0.15)
+TAMPER_SPLIT_SEED = 42
+
+# The classifier is trained on binary labels, so its logit scores CLASS_NAMES[1].
+POSITIVE_LABEL = 1
+
+DEFAULT_MASK_THRESHOLDS = "0.3,0.35,0.4,0.45,0.5,0.55,0.6,0.65,0.7,0.75,0.8"
+DEFAULT_CLOSING_SIZES = "1,3,5,7"
+
+
+def validation_records():
+    records = read_dataset_manifest(DATASET_MANIFEST)
+    _, class_val, _ = split_records(CLASSIFICATION_SPLIT, records, *CLASSIFICATION_VAL_SPLIT)
+
+    from utils.datasets import tamper_entries
+    triples = read_tamper_manifest(TAMPER_MANIFEST)
+    random.seed(TAMPER_SPLIT_SEED)
+    random.shuffle(triples)
+    entries = tamper_entries(triples)
+    n_train = int(len(entries) * TAMPER_SPLIT[0])
+    n_val = int(len(entries) * TAMPER_SPLIT[1])
+    return class_val, entries[n_train:n_train + n_val]
+
+
+def logit_store_version(mode, class_val, tamper_val):
+    digest = hashlib.sha256()
+    checkpoints = [FUSED_CKPT] if mode == "fused" else [CLASSIFIER_CKPT, LOCALIZATION_CKPT]
+    for checkpoint in checkpoints:
+        if not checkpoint.exists():
+            raise ValueError(f"Checkpoint not found: {checkpoint}")
+    params = {
+        "format": LOGIT_FORMAT,
+        "mode": mode,
+        "image_size": list(IMAGE_SIZE),
+        "backbones": [CLASSIFIER_BACKBONE, LOCALIZATION_BACKBONE] if mode == "separate" else [],
+        "checkpoints": [[str(c), c.stat().st_size, c.stat().st_mtime_ns] for c in checkpoints],
+    }
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for r in class_val:
+        digest.update(f"{r['path']}\t{r['label']}\t{r.get('sha256', '')}\n".encode())
+    for image, mask, label in tamper_val:
+        digest.update(f"{image}\t{mask or ''}\t{label}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def build_logit_store(path, mode, class_val, tamper_val):
+    """Run the models once over both validation splits and save raw logits:
+    classifier logits as float32, mask logits as float16 and ground-truth
+    masks bit-packed."""
+    import tensorflow as tf
+    from api.models import load_classifier_model, load_fused_model, load_localization_model
+    from utils.datasets import classification_dataset, tamper_dataset
+    from utils.shard_store import open_store
+
+    if mode == "fused":
+        fused = load_fused_model(FUSED_CKPT, IMAGE_SIZE)
+        classify = tf.function(lambda x: fused(x, training=False)[0])
+        localize = tf.function(lambda x: fused(x, training=False)[1])
+    else:
+        classifier = load_classifier_model(CLASSIFIER_CKPT, IMAGE_SIZE, backbone=CLASSIFIER_BACKBONE)
+        localization = load_localization_model(LOCALIZATION_CKPT, IMAGE_SIZE, backbone=LOCALIZATION_BACKBONE)
+        classify = tf.function(lambda x: classifier(x, training=False))
+        localize = tf.function(lambda x: localization(x, training=False))
+
+    partial = path.with_name(path.name + ".partial")
+    if partial.exists():
+        shutil.rmtree(partial)
+    partial.mkdir(parents=True)
+
+    class_store = open_store("classification", DATASET_MANIFEST, IMAGE_SIZE)
+    class_ds = classification_dataset(class_val, IMAGE_SIZE, store=class_store).batch(BATCH_SIZE)
+    class_logits, class_labels = [], []
+    for images, labels in class_ds:
+        images = tf.keras.applications.efficientnet.preprocess_input(images)
+        class_logits.append(classify(images).numpy().reshape(-1))
+        class_labels.append(labels.numpy().reshape(-1))
+    np.save(partial / "class_logits.npy", np.concatenate(class_logits).astype(np.float32))
+    np.save(partial / "class_labels.npy", np.concatenate(class_labels).astype(np.uint8))
+    print(f"Classifier logits: {len(class_val)} images")
+
+    tamper_store = open_store("tamper", TAMPER_MANIFEST, IMAGE_SIZE)
+    tamper_ds = tamper_dataset(tamper_val, IMAGE_SIZE, store=tamper_store).batch(BATCH_SIZE)
+    mask_logits = np.lib.format.open_memmap(
+        partial / "mask_logits.npy", mode="w+", dtype=np.float16, shape=(len(tamper_val), *IMAGE_SIZE),
+    )
+    mask_truth = np.zeros((len(tamper_val), IMAGE_SIZE[0] * IMAGE_SIZE[1] // 8), dtype=np.uint8)
+    tamper_labels = np.zeros(len(tamper_val), dtype=np.uint8)
+    offset = 0
+    for images, (labels, masks) in tamper_ds:
+        images = tf.keras.applications.efficientnet.preprocess_input(images * 255.0)
+        n = int(images.shape[0])
+        mask_logits[offset:offset + n] = localize(images).numpy()[..., 0].astype(np.float16)
+        mask_truth[offset:offset + n] = np.packbits(masks.numpy().reshape(n, -1) > 0.5, axis=1)
+        tamper_labels[offset:offset + n] = labels.numpy().reshape(-1)
+        offset += n
+    mask_logits.flush()
+    del mask_logits
+    np.save(partial / "mask_truth.npy", mask_truth)
+    np.save(partial / "tamper_labels.npy", tamper_labels)
+    print(f"Mask logits: {len(tamper_val)} images")
+
+    with open(partial / "index.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "format": LOGIT_FORMAT,
+            "mode": mode,
+            "image_size": list(IMAGE_SIZE),
+            "classification_val": len(class_val),
+            "tamper_val": len(tamper_val),
+        }, f, indent=2)
+    if path.exists():
+        shutil.rmtree(path)
+    partial.rename(path)
+
+
+def binary_curves(scores, labels):
+    """ROC and PR points for "positive when score >= threshold", one point per
+    distinct score, from a single sort. Points run from the highest threshold
+    down, so fpr and tpr are non-decreasing."""
+    order = np.argsort(-scores, kind="mergesort")
+    scores = scores[order]
+    labels = labels[order].astype(np.int64)
+    last = np.r_[np.flatnonzero(np.diff(scores)), scores.size - 1]
+    tp = np.cumsum(labels)[last]
+    fp = last + 1 - tp
+    positives = max(int(labels.sum()), 1)
+    negatives = max(int(labels.size - labels.sum()), 1)
+    return {
+        "threshold": scores[last],
+        "fpr": fp / negatives,
+        "tpr": tp / positives,
+        "precision": tp / (tp + fp),
+    }
+
+
+def curve_summary(curve):
+    fpr = np.r_[0.0, curve["fpr"]]
+    tpr = np.r_[0.0, curve["tpr"]]
+    return {
+        "roc_auc": float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)),
+        "average_precision": float(np.sum(np.diff(tpr) * curve["precision"])),
+    }
+
+
+def operating_point(curve, target_fpr):
+    """Index of the highest-recall point with fpr <= target_fpr, or None."""
+    admissible = np.flatnonzero(curve["fpr"] <= target_fpr)
+    return int(admissible[-1]) if admissible.size else None
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def calibrate_classifier(logits, labels, target_fprs):
+    labels = labels == POSITIVE_LABEL
+    curve = binary_curves(logits, labels)
+    # analyze.py flags prob > threshold, so report the midpoint to the next
+    # lower logit: strictly above it is exactly "logit >= this point's logit".
+    lower = np.r_[curve["threshold"][1:], curve["threshold"][-1] - 1.0]
+    curve["threshold"] = sigmoid((curve["threshold"] + lower) / 2)
+
+    current = logits > np.log(AI_GENERATED_THRESHOLD / (1.0 - AI_GENERATED_THRESHOLD))
+    points = {}
+    for target in target_fprs:
+        i = operating_point(curve, target)
+        points[str(target)] = None if i is None else {
+            "threshold": float(curve["threshold"][i]),
+            "fpr": float(curve["fpr"][i]),
+            "tpr": float(curve["tpr"][i]),
+            "precision": float(curve["precision"][i]),
+        }
+    return curve, {
+        "positive_class": CLASS_NAMES[POSITIVE_LABEL],
+        "images": int(labels.size),
+        **curve_summary(curve),
+        "current": {
+            "threshold": AI_GENERATED_THRESHOLD,
+            "fpr": float(np.mean(current[~labels])) if (~labels).any() else 0.0,
+            "tpr": float(np.mean(current[labels])) if labels.any() else 0.0,
+        },
+        "operating_points": points,
+    }
+
+
+def mask_pixel_counts(mask_logits, mask_truth, mask_thresholds, closing_sizes):
+    """
+    Apply every (mask threshold, closing size) pair to all masks, as
+    api/processing.postprocess_mask does, a chunk of images at a time.
+
+    Returns predicted pixels per image, shape (T, K, N), and pixel tp/fp/fn
+    totals per pair, shape (T, K).
+    """
+    n = len(mask_logits)
+    pixels = np.zeros((len(mask_thresholds), len(closing_sizes), n), dtype=np.int64)
+    tp = np.zeros(pixels.shape[:2], dtype=np.int64)
+    fp = np.zeros_like(tp)
+    fn = np.zeros_like(tp)
+    # prob > t  <=>  logit > log(t / (1 - t)), so the sigmoid is never computed.
+    logit_thresholds = np.log(mask_thresholds / (1.0 - mask_thresholds))
+    for start in range(0, n, SWEEP_CHUNK):
+        logits = np.asarray(mask_logits[start:start + SWEEP_CHUNK], dtype=np.float32)
+        truth = np.unpackbits(mask_truth[start:start + SWEEP_CHUNK], axis=1)[:, :IMAGE_SIZE[0] * IMAGE_SIZE[1]]
+        truth = truth.reshape(logits.shape).astype(bool)
+        for t, logit_threshold in enumerate(logit_thresholds):
+            binary = logits > logit_threshold
+            for k, size in enumerate(closing_sizes):
+                # A (1, k, k) structure closes each image in the stack on its own.
+                closed = binary if size <= 1 else ndimage.binary_closing(
+                    binary, structure=np.ones((1, size, size), dtype=bool)
+                )
+                pixels[t, k, start:start + len(logits)] = closed.sum(axis=(1, 2))
+                tp[t, k] += np.count_nonzero(closed & truth)
+                fp[t, k] += np.count_nonzero(closed & ~truth)
+                fn[t, k] += np.count_nonzero(~closed & truth)
+    return pixels, tp, fp, fn
+
+
+def calibrate_tamper(mask_logits, mask_truth, labels, mask_thresholds, closing_sizes, target_fprs):
+    labels = labels.astype(bool)
+    total_pixels = IMAGE_SIZE[0] * IMAGE_SIZE[1]
+    pixels, tp, fp, fn = mask_pixel_counts(mask_logits, mask_truth, mask_thresholds, closing_sizes)
+
+    combos = []
+    curves = []
+    for t, mask_threshold in enumerate(mask_thresholds):
+        for k, size in enumerate(closing_sizes):
+            # An image is flagged when its pixel count reaches
+            # max(MIN_EDITED_AREA_RATIO * total, MIN_MASK_PIXELS_ABSOLUTE), so
+            # sweeping the area ratio is a sweep over the pixel count.
+            scores = np.where(pixels[t, k] >= MIN_MASK_PIXELS_ABSOLUTE, pixels[t, k], 0)
+            curve = binary_curves(scores, labels)
+            combos.append({
+                "mask_threshold": float(mask_threshold),
+                "morph_closing_size": int(size),
+                "pixel_dice": float(2 * tp[t, k] / max(2 * tp[t, k] + fp[t, k] + fn[t, k], 1)),
+                **curve_summary(curve),
+            })
+            # Below MIN_MASK_PIXELS_ABSOLUTE no area ratio flags an image.
+            reachable = curve["threshold"] >= MIN_MASK_PIXELS_ABSOLUTE
+            curve = {name: values[reachable] for name, values in curve.items()}
+            curve["threshold"] = curve["threshold"] / total_pixels
+            curves.append(curve)
+
+    points = {}
+    for target in target_fprs:
+        best = None
+        for combo, curve in zip(combos, curves):
+            i = operating_point(curve, target)
+            if i is None:
+                continue
+            key = (curve["tpr"][i], curve["precision"][i], combo["pixel_dice"])
+            if best is None or key > best[0]:
+                best = (key, {
+                    "mask_threshold": combo["mask_threshold"],
+                    "morph_closing_size": combo["morph_closing_size"],
+                    "min_edited_area_ratio": float(curve["threshold"][i]),
+                    "fpr": float(curve["fpr"][i]),
+                    "tpr": float(curve["tpr"][i]),
+                    "precision": float(curve["precision"][i]),
+                    "pixel_dice": combo["pixel_dice"],
+                })
+        points[str(target)] = None if best is None else best[1]
+
+    current = None
+    if MASK_THRESHOLD in mask_thresholds and MORPH_CLOSING_SIZE in closing_sizes:
+        t = list(mask_thresholds).index(MASK_THRESHOLD)
+        k = list(closing_sizes).index(MORPH_CLOSING_SIZE)
+        flagged = (pixels[t, k] >= MIN_EDITED_AREA_RATIO * total_pixels) & (pixels[t, k] >= MIN_MASK_PIXELS_ABSOLUTE)
+        current = {
+            "mask_threshold": MASK_THRESHOLD,
+            "morph_closing_size": MORPH_CLOSING_SIZE,
+            "min_edited_area_ratio": MIN_EDITED_AREA_RATIO,
+            "fpr": float(np.mean(flagged[~labels])) if (~labels).any() else 0.0,
+            "tpr": float(np.mean(flagged[labels])) if labels.any() else 0.0,
+        }
+    return combos, curves, {
+        "images": int(labels.size),
+        "current": current,
+        "operating_points": points,
+        "grid": combos,
+    }
+
+
+def write_curves(path, header, rows):
+    with open(path, "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the serving thresholds in api/config.py from validation logits")
+    parser.add_argument("--mode", choices=SERVING_MODES, default=SERVING_MODE)
+    parser.add_argument("--target-fpr", type=float, nargs="+", default=[0.01, 0.05])
+    parser.add_argument("--mask-thresholds", default=DEFAULT_MASK_THRESHOLDS, help="Comma-separated mask probabilities to try")
+    parser.add_argument("--closing-sizes", default=DEFAULT_CLOSING_SIZES, help="Comma-separated closing kernel sizes (1 = no closing)")
+    parser.add_argument("--rebuild", action="store_true", help="Rerun the models even if logits for this version exist")
+    args = parser.parse_args()
+
+    mask_thresholds = np.array([float(v) for v in args.mask_thresholds.split(",")])
+    closing_sizes = [int(v) for v in args.closing_sizes.split(",")]
+
+    class_val, tamper_val = validation_records()
+    version = logit_store_version(args.mode, class_val, tamper_val)
+    store = LOGIT_DIR / version
+    if args.rebuild or not (store / "index.json").exists():
+        print(f"Running models over the validation splits ({args.mode})...")
+        build_logit_store(store, args.mode, class_val, tamper_val)
+    else:
+        print(f"Using cached logits {store.name}")
+
+    class_curve, classifier = calibrate_classifier(
+        np.load(store / "class_logits.npy"), np.load(store / "class_labels.npy"), args.target_fpr,
+    )
+    combos, tamper_curves, tamper = calibrate_tamper(
+        np.load(store / "mask_logits.npy", mmap_mode="r"), np.load(store / "mask_truth.npy"),
+        np.load(store / "tamper_labels.npy"), mask_thresholds, closing_sizes, args.target_fpr,
+    )
+
+    report_dir = REPORT_DIR / version
+    report_dir.mkdir(parents=True, exist_ok=True)
+    with open(report_dir / "report.json", "w") as f:
+        json.dump({"version": version, "mode": args.mode, "classifier": classifier, "tamper": tamper}, f, indent=2)
+    write_curves(
+        report_dir / "classifier_curve.csv",
+        ["threshold", "fpr", "tpr", "precision"],
+        zip(*(class_curve[name] for name in ["threshold", "fpr", "tpr", "precision"])),
+    )
+    write_curves(
+        report_dir / "tamper_curves.csv",
+        ["mask_threshold", "morph_closing_size", "min_edited_area_ratio", "fpr", "tpr", "precision"],
+        [
+            [combo["mask_threshold"], combo["morph_closing_size"], *row]
+            for combo, curve in zip(combos, tamper_curves)
+            for row in zip(*(curve[name] for name in ["threshold", "fpr", "tpr", "precision"]))
+        ],
+    )
+
+    print("\n" + "=" * 60)
+    print(f"Classifier ({classifier['images']} images, positive = {classifier['positive_class']})")
+    print("=" * 60)
+    print(f"ROC AUC {classifier['roc_auc']:.4f}, average precision {classifier['average_precision']:.4f}")
+    current = classifier["current"]
+    print(f"Current threshold {current['threshold']}: fpr {current['fpr']:.4f}, tpr {current['tpr']:.4f}")
+    for target, point in classifier["operating_points"].items():
+        if point is None:
+            print(f"fpr <= {target}: not reachable")
+            continue
+        print(f"fpr <= {target}: INFERENCE_AI_THRESHOLD={point['threshold']:.4f} "
+              f"(fpr {point['fpr']:.4f}, tpr {point['tpr']:.4f}, precision {point['precision']:.4f})")
+
+    print("\n" + "=" * 60)
+    print(f"Tamper detection ({tamper['images']} images, {len(combos)} postprocessing settings)")
+    print("=" * 60)
+    current = tamper["current"]
+    if current is not None:
+        print(f"Current settings: fpr {current['fpr']:.4f}, tpr {current['tpr']:.4f}")
+    for target, point in tamper["operating_points"].items():
+        if point is None:
+            print(f"fpr <= {target}: not reachable")
+            continue
+        print(f"fpr <= {target}: INFERENCE_MASK_THRESHOLD={point['mask_threshold']} "
+              f"INFERENCE_MORPH_CLOSING_SIZE={point['morph_closing_size']} "
+              f"INFERENCE_MIN_EDITED_AREA_RATIO={point['min_edited_area_ratio']:.6f} "
+              f"(fpr {point['fpr']:.4f}, tpr {point['tpr']:.4f}, pixel dice {point['pixel_dice']:.4f})")
+    print(f"\nReport and curves saved to: {report_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import json
+
+
+def load_history(path):
+    with open(path) as f:
+        history = json.load(f)
+    if not history.get('elapsed_s'):
+        raise ValueError(f"{path} has no elapsed_s; it was written before wall-clock tracking was added")
+    return history
+
+
+def time_to_reach(history, target):
+    """(epoch, seconds) when val_dice_coef first reaches target, or None."""
+    for epoch, (dice, elapsed) in enumerate(zip(history['val_dice_coef'], history['elapsed_s'])):
+        if dice >= target:
+            return epoch, elapsed
+    return None
+
+
+def describe(history):
+    sizes = sorted(set(history.get('train_resolution', [])))
+    return "progressive " + "/".join(str(s) for s in sizes) if len(sizes) > 1 else "fixed resolution"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare wall-clock time to reach a val dice between multihead training runs")
+    parser.add_argument("baseline", type=Path, help="History JSON from train_multihead_mask.py (logs/history_phaseN_*.json)")
+    parser.add_argument("runs", type=Path, nargs="+", help="History JSONs to compare against the baseline")
+    parser.add_argument("--target", type=float, default=None, help="Val dice to reach (default: the baseline's best)")
+    args = parser.parse_args()
+
+    baseline = load_history(args.baseline)
+    target = args.target if args.target is not None else max(baseline['val_dice_coef'])
+    base_hit = time_to_reach(baseline, target)
+
+    print("=" * 60)
+    print(f"Time to reach val_dice >= {target:.4f}")
+    print("=" * 60)
+    for path, history in [(args.baseline, baseline)] + [(p, load_history(p)) for p in args.runs]:
+        hit = time_to_reach(history, target)
+        label = f"{path.name} ({describe(history)})"
+        if hit is None:
+            print(f"{label}: not reached (best {max(history['val_dice_coef']):.4f})")
+            continue
+        epoch, elapsed = hit
+        line = f"{label}: epoch {epoch + 1}, {elapsed / 60:.1f} min"
+        if base_hit is not None and history is not baseline:
+            line += f" ({100.0 * (1.0 - elapsed / base_hit[1]):+.0f}% wall-clock cut vs baseline)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
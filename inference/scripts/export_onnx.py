@@ -0,0 +1,58 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+
+from api.backends import MODEL_KINDS, onnx_path
+from api.config import CLASSIFIER_CKPT, FUSED_CKPT, LOCALIZATION_CKPT
+from api.registry import DEFAULT_CHECKPOINTS, IMAGE_SIZE
+
+CHECKPOINTS = {
+    "classifier": CLASSIFIER_CKPT,
+    "localization": LOCALIZATION_CKPT,
+    "fused": FUSED_CKPT,
+}
+OPSET = 17
+
+
+def export(kind, checkpoint: Path, output: Path, opset=OPSET):
+    import tensorflow as tf
+    import tf2onnx
+    from api.backends.tf_backend import TensorFlowBackend
+
+    backend = TensorFlowBackend(buckets=(1,), image_size=IMAGE_SIZE)
+    # Build in float32 whatever INFERENCE_PRECISION says: ONNX Runtime runs
+    # the export on CPU in float32.
+    tf.keras.mixed_precision.set_global_policy("float32")
+    model = backend.build(kind, checkpoint)
+    spec = [tf.TensorSpec((None, *IMAGE_SIZE, 3), tf.float32, name="input_image")]
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(output))
+    print(f"Exported {kind} {checkpoint.name} -> {output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export serving checkpoints to ONNX for INFERENCE_BACKEND=onnxruntime")
+    parser.add_argument("kinds", nargs="*", help=f"Any of {', '.join(MODEL_KINDS)}. Default: the models the current serving mode loads")
+    parser.add_argument("--checkpoint", type=Path, default=None, help="Export this checkpoint instead (one kind only)")
+    parser.add_argument("--opset", type=int, default=OPSET)
+    args = parser.parse_args()
+
+    kinds = args.kinds or list(DEFAULT_CHECKPOINTS)
+    unknown = [kind for kind in kinds if kind not in MODEL_KINDS]
+    if unknown:
+        sys.exit(f"Unknown model kind: {', '.join(unknown)}")
+    if args.checkpoint is not None and len(kinds) != 1:
+        sys.exit("--checkpoint needs exactly one kind")
+
+    for kind in kinds:
+        checkpoint = args.checkpoint or CHECKPOINTS[kind]
+        if not checkpoint.exists():
+            sys.exit(f"{kind} checkpoint not found: {checkpoint}")
+        export(kind, checkpoint, onnx_path(checkpoint), args.opset)
+
+
+if __name__ == "__main__":
+    main()
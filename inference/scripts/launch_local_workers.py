@@ -0,0 +1,27 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+
+from utils.distributed import launch_local_workers
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a training script as several CPU workers on this machine",
+        usage="%(prog)s [--workers N] script.py [script args...]",
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("script")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    print(f"Launching {args.workers} local workers: {args.script} {' '.join(args.script_args)}")
+    launch_local_workers([args.script, *args.script_args], args.workers)
+    print("All workers finished.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import importlib.util
+import json
+import time
+from itertools import islice
+
+import tensorflow as tf
+from tensorflow.keras import Sequential, layers
+from tensorflow.keras.applications.efficientnet import preprocess_input
+
+from utils.augment import augment_batch
+from utils.datasets import classification_dataset, load_image_tf, load_mask_tf, tamper_entries
+from utils.manifests import DATASET_MANIFEST, TAMPER_MANIFEST, read_dataset_manifest, read_tamper_manifest
+from utils.shard_store import open_store
+from utils.splits import CLASSIFICATION_SPLIT, split_records
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+REPORT_PATH = INFERENCE_ROOT / "core/models/input_profile.json"
+
+IMAGE_SIZE = (224, 224)
+# Batch sizes used by train_classification_phase2.py and train_multihead_mask.py
+CLASSIFICATION_BATCH_SIZE = 16
+TAMPER_BATCH_SIZE = 4
+CURRENT_SHUFFLE_BUFFER = 10000
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def load_multihead_module():
+    # train_multihead_mask.py only logs and trains under __main__, so importing
+    # it gives the real load_datasets() without starting a run.
+    spec = importlib.util.spec_from_file_location("train_multihead_mask", SCRIPT_DIR / "train_multihead_mask.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def count_images(element):
+    first = tf.nest.flatten(element)[0]
+    return int(first.shape[0]) if first.shape.rank == 4 else 1
+
+
+def measure(ds, max_elements):
+    """Images/s and process CPU utilization while iterating ds without a model."""
+    iterator = iter(ds)
+    next(iterator)
+    images = 0
+    cpu_start = os.times()
+    start = time.perf_counter()
+    for element in islice(iterator, max_elements):
+        images += count_images(element)
+    wall = time.perf_counter() - start
+    cpu_end = os.times()
+    cpu = (cpu_end.user - cpu_start.user) + (cpu_end.system - cpu_start.system)
+    return {
+        "images_per_s": images / wall if wall > 0 else 0.0,
+        "cpu_utilization": cpu / (wall * (os.cpu_count() or 1)) if wall > 0 else 0.0,
+        "images": images,
+    }
+
+
+def decode_stages(image_paths, parallel):
+    paths = tf.data.Dataset.from_tensor_slices(image_paths)
+
+    def _decode(path):
+        return tf.image.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+
+    return {
+        "read": paths.map(tf.io.read_file, num_parallel_calls=parallel),
+        "decode": paths.map(_decode, num_parallel_calls=parallel),
+        "resize": paths.map(lambda p: load_image_tf(p, IMAGE_SIZE), num_parallel_calls=parallel),
+    }
+
+
+def cached_images(image_paths, num_images):
+    ds = tf.data.Dataset.from_tensor_slices(image_paths[:num_images])
+    ds = ds.map(lambda p: load_image_tf(p, IMAGE_SIZE), num_parallel_calls=AUTOTUNE).cache()
+    for _ in ds:
+        pass
+    return ds
+
+
+def profile_classification(args):
+    records = read_dataset_manifest(DATASET_MANIFEST)
+    train_records, _, _ = split_records(CLASSIFICATION_SPLIT, records, 0.8, 0.1)
+    sample = train_records[:args.num_images]
+    image_paths = [str(INFERENCE_ROOT / r["path"]) for r in sample]
+
+    stages = {}
+    for name, ds in decode_stages(image_paths, AUTOTUNE).items():
+        stages[name] = measure(ds, args.num_images)
+
+    store = open_store("classification", DATASET_MANIFEST, IMAGE_SIZE)
+    if store is not None:
+        stages["store_read"] = measure(store.dataset(image_paths), args.num_images)
+
+    # Same augmentation and ordering as train_classification_phase2.py
+    data_augmentation = Sequential([
+        layers.RandomFlip("horizontal"),
+        layers.RandomRotation(0.05),
+        layers.RandomBrightness(0.1),
+        layers.RandomContrast(0.1),
+        layers.RandomZoom(0.1)
+    ])
+    resized = cached_images(image_paths, args.num_images)
+    augmented = resized.map(lambda img: preprocess_input(data_augmentation(img * 255.0)), num_parallel_calls=AUTOTUNE)
+    stages["augment"] = measure(augmented, args.num_images)
+
+    train_ds = (
+        classification_dataset(sample, IMAGE_SIZE, store=store)
+        .shuffle(CURRENT_SHUFFLE_BUFFER)
+        .map(lambda img, label: (preprocess_input(data_augmentation(img)), label), num_parallel_calls=AUTOTUNE)
+        .batch(CLASSIFICATION_BATCH_SIZE)
+        .prefetch(AUTOTUNE)
+    )
+    stages["batch"] = measure(train_ds, args.num_images // CLASSIFICATION_BATCH_SIZE)
+    return stages, image_paths, len(train_records)
+
+
+def profile_tamper(args):
+    triples = read_tamper_manifest(TAMPER_MANIFEST)
+    all_entries = tamper_entries(triples)
+    entries = all_entries[:args.num_images]
+    image_paths = [e[0] for e in entries]
+    mask_paths = [e[1] for e in entries if e[1]]
+
+    stages = {}
+    for name, ds in decode_stages(image_paths, AUTOTUNE).items():
+        stages[name] = measure(ds, args.num_images)
+    masks = tf.data.Dataset.from_tensor_slices(mask_paths).map(
+        lambda p: load_mask_tf(p, IMAGE_SIZE), num_parallel_calls=AUTOTUNE
+    )
+    stages["mask_maxpool"] = measure(masks, len(mask_paths))
+
+    store = open_store("tamper", TAMPER_MANIFEST, IMAGE_SIZE)
+    if store is not None:
+        stages["store_read"] = measure(store.dataset(image_paths), args.num_images)
+
+    resized = cached_images(image_paths, args.num_images)
+    pairs = resized.map(lambda img: (img, tf.zeros((*IMAGE_SIZE, 1)))).batch(TAMPER_BATCH_SIZE)
+    augmented = pairs.map(augment_batch, num_parallel_calls=AUTOTUNE)
+    stages["augment"] = measure(augmented, args.num_images // TAMPER_BATCH_SIZE)
+
+    multihead = load_multihead_module()
+    make_train_ds, _, _ = multihead.load_datasets()
+    stages["batch"] = measure(make_train_ds(), args.num_images // TAMPER_BATCH_SIZE)
+    return stages, image_paths, len(all_entries)
+
+
+def parallelism_sweep(image_paths, num_images):
+    cpus = os.cpu_count() or 1
+    settings = sorted({1, 2, 4, cpus})
+    results = {}
+    for parallel in settings:
+        ds = tf.data.Dataset.from_tensor_slices(image_paths).map(
+            lambda p: load_image_tf(p, IMAGE_SIZE), num_parallel_calls=parallel
+        )
+        results[str(parallel)] = measure(ds, num_images)["images_per_s"]
+    ds = tf.data.Dataset.from_tensor_slices(image_paths).map(
+        lambda p: load_image_tf(p, IMAGE_SIZE), num_parallel_calls=AUTOTUNE
+    )
+    results["AUTOTUNE"] = measure(ds, num_images)["images_per_s"]
+    return results
+
+
+def recommend(stages, sweep, batch_size, step_ms, dataset_size, shuffle_memory_mb):
+    input_ms = 1000.0 * batch_size / max(stages["batch"]["images_per_s"], 1e-9)
+    best_parallel = max(sweep, key=sweep.get)
+
+    # Shuffling happens after decode, so every buffered element is a float32 image.
+    bytes_per_image = IMAGE_SIZE[0] * IMAGE_SIZE[1] * 3 * 4
+    shuffle_buffer = min(dataset_size, int(shuffle_memory_mb * 1024 * 1024 // bytes_per_image))
+
+    rec = {
+        "input_ms_per_batch": input_ms,
+        "num_parallel_calls": best_parallel,
+        "shuffle_buffer": shuffle_buffer,
+        "shuffle_buffer_current_mb": CURRENT_SHUFFLE_BUFFER * bytes_per_image / (1024 * 1024),
+    }
+    if step_ms is not None:
+        wait_ms = max(0.0, input_ms - step_ms)
+        rec["step_ms"] = step_ms
+        rec["wait_ms_per_step"] = wait_ms
+        rec["wait_fraction"] = wait_ms / input_ms if input_ms > 0 else 0.0
+        rec["bound"] = "input" if input_ms > step_ms else "compute"
+        # Enough batches in flight to cover the slower side once.
+        rec["prefetch"] = max(2, int(-(-input_ms // max(step_ms, 1e-9))))
+    else:
+        rec["prefetch"] = "AUTOTUNE"
+    return rec
+
+
+def print_report(task, stages, sweep, rec):
+    print("\n" + "=" * 60)
+    print(f"{task}: per-stage throughput (no model)")
+    print("=" * 60)
+    for name, result in stages.items():
+        print(f"{name:14s} {result['images_per_s']:10.1f} images/s   CPU {result['cpu_utilization'] * 100:5.1f}%")
+    print("\nnum_parallel_calls sweep (read + decode + resize):")
+    for setting, rate in sweep.items():
+        print(f"  {setting:>9s}: {rate:10.1f} images/s")
+    print("\nRecommendations:")
+    print(f"  input time per batch: {rec['input_ms_per_batch']:.1f} ms")
+    if "step_ms" in rec:
+        print(f"  model step: {rec['step_ms']:.1f} ms -> {rec['bound']}-bound, "
+              f"waiting {rec['wait_ms_per_step']:.1f} ms per step ({rec['wait_fraction'] * 100:.0f}% of input time)")
+    else:
+        print("  pass --step-ms with a measured training step time to estimate time spent waiting on data")
+    print(f"  num_parallel_calls: {rec['num_parallel_calls']}")
+    print(f"  prefetch: {rec['prefetch']}")
+    print(f"  shuffle buffer: {rec['shuffle_buffer']} "
+          f"(current {CURRENT_SHUFFLE_BUFFER} buffers ~{rec['shuffle_buffer_current_mb']:.0f} MB of decoded images)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the training input pipelines without a model")
+    parser.add_argument("task", choices=["classification", "tamper", "all"], nargs="?", default="all")
+    parser.add_argument("--num-images", type=int, default=512)
+    parser.add_argument("--step-ms", type=float, default=None, help="Measured model step time per batch, in ms")
+    parser.add_argument("--shuffle-memory-mb", type=float, default=1024)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    args = parser.parse_args()
+
+    tasks = ["classification", "tamper"] if args.task == "all" else [args.task]
+    report = {}
+    for task in tasks:
+        if task == "classification":
+            stages, image_paths, dataset_size = profile_classification(args)
+            batch_size = CLASSIFICATION_BATCH_SIZE
+        else:
+            stages, image_paths, dataset_size = profile_tamper(args)
+            batch_size = TAMPER_BATCH_SIZE
+        sweep = parallelism_sweep(image_paths, args.num_images)
+        rec = recommend(stages, sweep, batch_size, args.step_ms, dataset_size, args.shuffle_memory_mb)
+        print_report(task, stages, sweep, rec)
+        report[task] = {"stages": stages, "parallelism": sweep, "recommendations": rec}
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
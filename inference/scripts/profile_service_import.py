@@ -0,0 +1,90 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import json
+import subprocess
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+REPORT_PATH = INFERENCE_ROOT / "core/models/import_profile.json"
+
+ENTRY_POINT = "main"
+# Loaded in the background once the server is up (see api/registry.py); the
+# entry point importing any of them means startup blocks on it again.
+DEFERRED_MODULES = ("tensorflow", "keras", "onnxruntime", "scipy")
+# Import time of the entry point, in a fresh interpreter, above which the
+# check fails. TensorFlow alone takes several seconds to import.
+DEFAULT_BUDGET_MS = 3000
+
+
+def profile_import(module):
+    """Import module in a fresh interpreter under -X importtime and return
+    [(name, depth, self_us, cumulative_us)] in import order."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=INFERENCE_ROOT, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile import time of the inference service entry point")
+    parser.add_argument("--module", default=ENTRY_POINT)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--report", type=Path, default=REPORT_PATH)
+    args = parser.parse_args()
+
+    entries = profile_import(args.module)
+    total_ms = sum(cumulative for _, depth, _, cumulative in entries if depth == 0) / 1000.0
+    top_level = sorted(((name, cumulative) for name, depth, _, cumulative in entries if depth == 0),
+                       key=lambda e: e[1], reverse=True)
+    imported = {name for name, _, _, _ in entries}
+    deferred = sorted(name for name in DEFERRED_MODULES if name in imported)
+
+    print("=" * 60)
+    print(f"import {args.module}: {total_ms:.0f} ms (budget {args.budget_ms:.0f} ms)")
+    print("=" * 60)
+    for name, cumulative in top_level[:args.top]:
+        print(f"{cumulative / 1000.0:8.1f} ms  {name}")
+
+    problems = []
+    if deferred:
+        problems.append(f"imported at startup but should load in the background: {', '.join(deferred)}")
+    if total_ms > args.budget_ms:
+        problems.append(f"import took {total_ms:.0f} ms, over the {args.budget_ms:.0f} ms budget")
+
+    args.report.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.report, "w") as f:
+        json.dump({
+            "module": args.module,
+            "total_ms": total_ms,
+            "budget_ms": args.budget_ms,
+            "deferred_modules_imported": deferred,
+            "top_level_ms": {name: cumulative / 1000.0 for name, cumulative in top_level},
+        }, f, indent=2)
+    print(f"\nReport saved to: {args.report}")
+
+    if problems:
+        for problem in problems:
+            print(f"FAIL: {problem}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import time
+
+from utils.plot_handler import read_events, render_report
+
+WATCH_INTERVAL = 15.0
+
+
+def parent_alive(pid):
+    if pid is None:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def run_finished(events_path, since):
+    """True once the latest run, started at or after `since`, has ended. Runs
+    appended to the same file earlier in the day do not count."""
+    runs = read_events(events_path) if events_path.exists() else []
+    if not runs or runs[-1][0].get("time", 0.0) < since:
+        return False
+    return runs[-1][-1].get("event") == "run_end"
+
+
+def watch(events_path, output, interval, parent_pid, all_runs, since):
+    """Re-render whenever the events file grows. Stops after the final render,
+    once the run has ended or the training process is gone."""
+    last_size = -1
+    while True:
+        done = run_finished(events_path, since) or not parent_alive(parent_pid)
+        size = events_path.stat().st_size if events_path.exists() else 0
+        if size != last_size or done:
+            render_report(events_path, output, live=not done, all_runs=all_runs)
+            last_size = size
+        if done:
+            return
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a training events file (*.events.jsonl) as a self-contained HTML report")
+    parser.add_argument("events", type=Path)
+    parser.add_argument("--output", type=Path, default=None, help="Default: next to the events file, as .report.html")
+    parser.add_argument("--watch", action="store_true", help="Keep re-rendering until the run ends")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL)
+    parser.add_argument("--parent-pid", type=int, default=None, help="Stop watching when this process exits")
+    parser.add_argument("--all-runs", action="store_true", help="Include earlier runs appended to the same file")
+    parser.add_argument("--since", type=float, default=0.0, help="With --watch: the run to follow started at or after this Unix time")
+    args = parser.parse_args()
+
+    output = args.output or args.events.with_name(args.events.name.replace(".events.jsonl", "") + ".report.html")
+    if args.watch:
+        watch(args.events, output, args.interval, args.parent_pid, args.all_runs, args.since)
+    else:
+        render_report(args.events, output, all_runs=args.all_runs)
+        print(f"Report saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()
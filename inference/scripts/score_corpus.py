@@ -0,0 +1,221 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import csv
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from api.config import AI_GENERATED_THRESHOLD, INFERENCE_BACKEND, INFERENCE_BACKENDS
+from api.processing import IMAGE_SIZE, class_probabilities, load_image, mask_to_base64_png, normalize, postprocess_mask, run_models
+from utils.manifests import INFERENCE_ROOT, read_dataset_manifest, read_tamper_manifest
+
+SCORES_DIR = INFERENCE_ROOT / "core/models/scores"
+BATCH_SIZE = 64
+# Rows per output part; an interrupted run loses at most this many scores.
+PART_ROWS = 2048
+
+COLUMNS = [
+    ("path", "string"),
+    ("error", "string"),
+    ("confidence", "float32"),
+    ("is_ai_generated", "bool_"),
+    ("tampering_detected", "bool_"),
+    ("edited_area_ratio", "float32"),
+    ("edited_pixels", "int32"),
+    ("classifier_version", "string"),
+    ("localization_version", "string"),
+]
+MASK_COLUMN = ("mask_png", "string")
+
+
+def pyarrow_modules():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        return None
+    return pyarrow, pyarrow.parquet
+
+
+def input_paths(manifest, path_column):
+    """Image paths to score, in manifest order and without repeats."""
+    if manifest == "dataset":
+        paths = [r["path"] for r in read_dataset_manifest(dedupe=False)]
+    elif manifest == "tamper":
+        paths = [p for t in read_tamper_manifest(dedupe=False) for p in (t["original"], t["edited"])]
+    else:
+        with open(manifest, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            if path_column not in (reader.fieldnames or []):
+                raise ValueError(f"{manifest} has no '{path_column}' column")
+            paths = [row[path_column].strip() for row in reader if row[path_column].strip()]
+    return list(dict.fromkeys(paths))
+
+
+class PartWriter:
+    """Writes results as numbered part files in one directory. Each part is
+    written to a temporary name and renamed, so a part on disk is complete."""
+
+    def __init__(self, directory: Path, fmt, masks):
+        self.directory = Path(directory)
+        self.fmt = fmt
+        self.columns = COLUMNS + ([MASK_COLUMN] if masks else [])
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def parts(self):
+        return sorted(self.directory.glob(f"part-*.{self.fmt}"))
+
+    def scored(self):
+        done = set()
+        for part in self.parts():
+            if self.fmt == "parquet":
+                _, pq = pyarrow_modules()
+                done.update(pq.read_table(part, columns=["path"]).column("path").to_pylist())
+            else:
+                with open(part, newline='', encoding='utf-8') as f:
+                    done.update(row["path"] for row in csv.DictReader(f))
+        return done
+
+    def write(self, rows):
+        path = self.directory / f"part-{len(self.parts()):05d}.{self.fmt}"
+        tmp = path.with_suffix(".tmp")
+        names = [name for name, _ in self.columns]
+        if self.fmt == "parquet":
+            pa, pq = pyarrow_modules()
+            schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in self.columns])
+            pq.write_table(pa.Table.from_pylist(rows, schema=schema), tmp)
+        else:
+            with open(tmp, "w", newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=names, extrasaction="ignore")
+                writer.writeheader()
+                writer.writerows(rows)
+        os.replace(tmp, path)
+        return path
+
+
+def decode(path):
+    """Runs in the worker processes."""
+    try:
+        return load_image(path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def score_batch(models, paths, decoded, masks):
+    rows = [{"path": path, "error": error} for path, (_, error) in zip(paths, decoded)]
+    ok = [i for i, (pixels, _) in enumerate(decoded) if pixels is not None]
+    if not ok:
+        return rows
+
+    batch = normalize(np.stack([decoded[i][0] for i in ok]))
+    class_logits, mask_logits, model_versions = run_models(models, batch)
+    class_probs = class_probabilities(class_logits, len(ok))
+
+    for j, i in enumerate(ok):
+        row = rows[i]
+        row.update({
+            "confidence": float(class_probs[j]),
+            "is_ai_generated": bool(class_probs[j] > AI_GENERATED_THRESHOLD),
+            "classifier_version": model_versions["classifier"],
+            "localization_version": model_versions["localization"],
+        })
+        if mask_logits is None:
+            continue
+        is_edited, mask_bin, edited_area_ratio, n_pixels = postprocess_mask(mask_logits[j].squeeze(), IMAGE_SIZE)
+        row.update({
+            "tampering_detected": bool(is_edited),
+            "edited_area_ratio": float(edited_area_ratio),
+            "edited_pixels": n_pixels,
+        })
+        if masks and is_edited:
+            row["mask_png"] = mask_to_base64_png(mask_bin)
+    return rows
+
+
+def load_models(backend, batch_size):
+    from api.registry import DEFAULT_CHECKPOINTS, ModelRegistry
+
+    # One bucket at the scoring batch size: every batch runs on the same graph.
+    registry = ModelRegistry(backend, buckets=(batch_size,))
+    for kind, checkpoint in DEFAULT_CHECKPOINTS.items():
+        if not checkpoint.exists():
+            if kind == "localization":
+                print(f"Warning: localization checkpoint not found ({checkpoint}); tampering is not scored")
+                continue
+            raise ValueError(f"{kind} checkpoint not found: {checkpoint}")
+        registry.load(kind, checkpoint)
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every image in a manifest with the serving models")
+    parser.add_argument("manifest", help="'dataset', 'tamper', or a CSV file (e.g. a gallery export)")
+    parser.add_argument("--path-column", default="file_path", help="Image path column of a CSV manifest")
+    parser.add_argument("--root", type=Path, default=INFERENCE_ROOT, help="Relative image paths are resolved against this")
+    parser.add_argument("--output", type=Path, default=None, help="Default: core/models/scores/<manifest name>")
+    parser.add_argument("--format", choices=["parquet", "csv"], default=None, help="Default: parquet if pyarrow is installed")
+    parser.add_argument("--masks", action="store_true", help="Also store detected masks as base64 PNG")
+    parser.add_argument("--backend", choices=INFERENCE_BACKENDS, default=INFERENCE_BACKEND)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Image decoding processes")
+    parser.add_argument("--part-rows", type=int, default=PART_ROWS)
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = "parquet" if pyarrow_modules() is not None else "csv"
+        if fmt == "csv":
+            print("pyarrow is not installed; writing CSV parts")
+    elif fmt == "parquet" and pyarrow_modules() is None:
+        sys.exit("--format parquet needs pyarrow (pip install pyarrow)")
+
+    name = args.manifest if args.manifest in ("dataset", "tamper") else Path(args.manifest).stem
+    writer = PartWriter(args.output or SCORES_DIR / name, fmt, args.masks)
+
+    paths = input_paths(args.manifest, args.path_column)
+    scored = writer.scored()
+    todo = [p for p in paths if p not in scored]
+    print(f"{len(paths)} images in {args.manifest}; {len(paths) - len(todo)} already scored, {len(todo)} to go")
+    if not todo:
+        return
+
+    registry = load_models(args.backend, args.batch_size)
+    batches = [todo[i:i + args.batch_size] for i in range(0, len(todo), args.batch_size)]
+    chunksize = max(1, args.batch_size // args.workers)
+
+    rows = []
+    done = 0
+    start = time.perf_counter()
+    # Spawned rather than forked: the parent has already initialised TensorFlow.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+        def submit(batch):
+            return executor.map(decode, [str(args.root / p) for p in batch], chunksize=chunksize)
+
+        pending = submit(batches[0])
+        for i, batch in enumerate(batches):
+            decoded = list(pending)
+            # The workers decode the next batch while this one is on the models.
+            if i + 1 < len(batches):
+                pending = submit(batches[i + 1])
+            rows.extend(score_batch(registry.snapshot(), batch, decoded, args.masks))
+            done += len(batch)
+
+            if len(rows) >= args.part_rows or i + 1 == len(batches):
+                part = writer.write(rows)
+                rows = []
+                elapsed = time.perf_counter() - start
+                print(f"{done}/{len(todo)} scored ({done / elapsed:.1f} images/s) -> {part.name}")
+
+    print(f"Results saved to: {writer.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import csv
+import itertools
+import json
+import math
+import subprocess
+import time
+from datetime import datetime
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+TRAIN_SCRIPT = SCRIPT_DIR / "train_multihead_mask.py"
+SWEEP_DIR = INFERENCE_ROOT / "core/models/sweeps"
+IMAGE_SIZE = (224, 224)
+# The constant that sets each phase's epoch budget in train_multihead_mask.py
+EPOCHS_CONSTANT = {"1": "FREEZE_EPOCHS", "2": "EPOCHS_UNFREEZE"}
+POLL_SECONDS = 5
+
+
+def parse_grid(specs):
+    """["LR_FREEZE=1e-4,3e-4", "POS_WEIGHT=4,8"] -> {"LR_FREEZE": ["1e-4", "3e-4"], ...}"""
+    grid = {}
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if not values:
+            raise ValueError(f"Expected NAME=v1,v2,... but got {spec!r}")
+        grid[name] = values.split(",")
+    return grid
+
+
+def core_slots(cores_per_trial):
+    """Disjoint groups of cores this process may use, one per concurrent trial."""
+    if hasattr(os, "sched_getaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+    else:
+        available = list(range(os.cpu_count() or 1))
+    return [available[i:i + cores_per_trial] for i in range(0, len(available) - cores_per_trial + 1, cores_per_trial)]
+
+
+def launch_trial(trial, epochs, cores, phase, train_args):
+    result_path = trial["dir"] / "result.json"
+    if result_path.exists():
+        result_path.unlink()
+    overrides = [f"{name}={value}" for name, value in trial["params"].items()]
+    cmd = [
+        sys.executable, str(TRAIN_SCRIPT), phase,
+        "--resume", "--output-dir", str(trial["dir"]), "--result", str(result_path), "--no-live-report",
+        "--set", *overrides, f"{EPOCHS_CONSTANT[phase]}={epochs}",
+        *train_args,
+    ]
+    env = dict(os.environ)
+    env.pop("TF_CONFIG", None)
+    env.update({
+        "CUDA_VISIBLE_DEVICES": "",
+        "TF_NUM_INTRAOP_THREADS": str(len(cores)),
+        "TF_NUM_INTEROP_THREADS": "2",
+        "OMP_NUM_THREADS": str(len(cores)),
+    })
+    pin = (lambda: os.sched_setaffinity(0, cores)) if hasattr(os, "sched_setaffinity") else None
+    log = open(trial["dir"] / "train.log", "a")
+    process = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT, preexec_fn=pin)
+    log.close()
+    return process
+
+
+def run_rung(trials, epochs, slots, phase, train_args):
+    """Train every trial up to `epochs` total epochs, at most len(slots) at a time.
+    Trials resume from their own checkpoints, so each rung only pays for the
+    epochs it adds."""
+    queue = list(trials)
+    running = {}
+    free = list(range(len(slots)))
+    while queue or running:
+        while queue and free:
+            slot = free.pop(0)
+            trial = queue.pop(0)
+            print(f"  trial {trial['id']:03d} -> {epochs} epochs on cores {slots[slot]}: {trial['params']}")
+            running[slot] = (trial, launch_trial(trial, epochs, slots[slot], phase, train_args))
+        time.sleep(POLL_SECONDS)
+        for slot, (trial, process) in list(running.items()):
+            code = process.poll()
+            if code is None:
+                continue
+            del running[slot]
+            free.append(slot)
+            result_path = trial["dir"] / "result.json"
+            if code != 0 or not result_path.exists():
+                trial["status"] = f"failed (exit {code}, see {trial['dir'] / 'train.log'})"
+                trial["best_val_dice"] = None
+                print(f"  trial {trial['id']:03d} failed with exit code {code}")
+                continue
+            with open(result_path) as f:
+                result = json.load(f)
+            trial.update({
+                "epochs": result["epochs"],
+                "best_val_dice": result["best_val_dice"],
+                "elapsed_s": result["elapsed_s"],
+            })
+            print(f"  trial {trial['id']:03d} done: best val_dice {trial['best_val_dice']:.4f} "
+                  f"after {trial['epochs']} epochs")
+
+
+def halving_rungs(min_epochs, max_epochs, eta):
+    rungs = []
+    epochs = min_epochs
+    while epochs < max_epochs:
+        rungs.append(epochs)
+        epochs *= eta
+    rungs.append(max_epochs)
+    return rungs
+
+
+def write_results(sweep_dir, trials, param_names):
+    ranked = sorted(trials, key=lambda t: -1.0 if t["best_val_dice"] is None else t["best_val_dice"], reverse=True)
+    header = ["trial", *param_names, "epochs", "best_val_dice", "minutes", "status"]
+    rows = []
+    for t in ranked:
+        rows.append([
+            f"{t['id']:03d}", *[t["params"][name] for name in param_names], t["epochs"],
+            "" if t["best_val_dice"] is None else f"{t['best_val_dice']:.4f}",
+            f"{t['elapsed_s'] / 60:.1f}", t["status"],
+        ])
+
+    widths = [max(len(str(x)) for x in column) for column in zip(header, *rows)]
+    print("\n" + "=" * 60)
+    print("Sweep results")
+    print("=" * 60)
+    for row in [header, *rows]:
+        print("  ".join(str(x).ljust(w) for x, w in zip(row, widths)).rstrip())
+
+    with open(sweep_dir / "results.csv", "w", newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    with open(sweep_dir / "results.json", "w") as f:
+        json.dump([{**t, "dir": str(t["dir"])} for t in ranked], f, indent=2)
+    print(f"\nResults saved to: {sweep_dir / 'results.csv'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Grid sweep over train_multihead_mask.py constants with successive halving",
+        usage="%(prog)s --grid NAME=v1,v2 [NAME=...] [options] [-- extra train args]",
+    )
+    parser.add_argument("--grid", nargs="+", required=True, metavar="NAME=v1,v2", help="Values to try for each tunable constant")
+    parser.add_argument("--phase", choices=["1", "2"], default="1")
+    parser.add_argument("--cores-per-trial", type=int, default=4)
+    parser.add_argument("--min-epochs", type=int, default=2, help="Epoch budget of the first rung")
+    parser.add_argument("--max-epochs", type=int, default=12, help="Epoch budget of the last rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta of trials at each rung")
+    parser.add_argument("--name", default=datetime.now().strftime('%Y%m%d-%H%M%S'))
+    parser.add_argument("--allow-decode", action="store_true", help="Run even if the tamper store has not been built")
+    parser.add_argument("train_args", nargs=argparse.REMAINDER, help="Passed to every trial, after --")
+    args = parser.parse_args()
+    train_args = args.train_args[1:] if args.train_args[:1] == ["--"] else args.train_args
+
+    # Every trial memory-maps the same store, so the OS page cache holds one copy.
+    from utils.manifests import TAMPER_MANIFEST
+    from utils.shard_store import open_store
+    if open_store("tamper", TAMPER_MANIFEST, IMAGE_SIZE) is None and not args.allow_decode:
+        sys.exit("Build the store first (scripts/build_dataset_store.py --kind tamper) "
+                 "so trials do not each decode the dataset, or pass --allow-decode.")
+
+    grid = parse_grid(args.grid)
+    param_names = list(grid)
+    slots = core_slots(args.cores_per_trial)
+    if not slots:
+        sys.exit(f"Fewer than {args.cores_per_trial} cores available")
+
+    sweep_dir = SWEEP_DIR / args.name
+    trials = []
+    for trial_id, values in enumerate(itertools.product(*grid.values())):
+        trial_dir = sweep_dir / f"trial_{trial_id:03d}"
+        trial_dir.mkdir(parents=True, exist_ok=True)
+        trials.append({
+            "id": trial_id, "params": dict(zip(param_names, values)), "dir": trial_dir,
+            "epochs": 0, "best_val_dice": None, "elapsed_s": 0.0, "status": "finished",
+        })
+    with open(sweep_dir / "sweep.json", "w") as f:
+        json.dump({"grid": grid, "phase": args.phase, "train_args": train_args,
+                   "min_epochs": args.min_epochs, "max_epochs": args.max_epochs, "eta": args.eta}, f, indent=2)
+
+    rungs = halving_rungs(args.min_epochs, args.max_epochs, args.eta)
+    print(f"{len(trials)} trials, {len(slots)} at a time on {args.cores_per_trial} cores each; rungs (epochs): {rungs}")
+
+    survivors = trials
+    for rung, epochs in enumerate(rungs):
+        print("\n" + "=" * 60)
+        print(f"Rung {rung + 1}/{len(rungs)}: {len(survivors)} trials to {epochs} epochs")
+        print("=" * 60)
+        run_rung(survivors, epochs, slots, args.phase, train_args)
+        if rung == len(rungs) - 1:
+            break
+        ranked = sorted((t for t in survivors if t["best_val_dice"] is not None),
+                        key=lambda t: t["best_val_dice"], reverse=True)
+        keep = max(1, math.ceil(len(survivors) / args.eta))
+        for t in ranked[keep:]:
+            t["status"] = f"stopped after rung {rung + 1}"
+        survivors = ranked[:keep]
+        if not survivors:
+            break
+
+    write_results(sweep_dir, trials, param_names)
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,10 @@ from tensorflow.keras.applications.efficientnet import preprocess_input
 from tensorflow.keras.metrics import AUC
 import json
 from utils.logger import file_logging
+from utils.manifests import read_dataset_manifest
+from utils.datasets import classification_dataset
+from utils.splits import CLASSIFICATION_SPLIT, split_records
+from utils.shard_store import open_store
 from datetime import datetime
 
 
@@ -17,26 +21,14 @@ TEST_LOG_FILENAME = f"testing_log_{TIMESTAMP}.txt"
 with file_logging(log_filename=TEST_LOG_FILENAME):
     IMAGE_SIZE = (224, 224)
     BATCH_SIZE = 16
-    DATASET_DIR = "dataset/images/classification"
+    DATASET_MANIFEST = "dataset/manifests/dataset_manifest.csv"
+    SOURCES = None
     MODEL_SAVE_DIR = Path("core/models/ai_detection")
-    CACHE_DIR = MODEL_SAVE_DIR / "cache"
-
-    CLASS_NAMES = ['ai_generated', 'real']
-
-    val_test_ds = tf.keras.utils.image_dataset_from_directory(
-        DATASET_DIR,
-        validation_split=0.2,
-        subset="validation",
-        seed=42,
-        image_size=IMAGE_SIZE,
-        batch_size=None,
-        label_mode="binary",
-        class_names=CLASS_NAMES
-    )
 
-    val_test_cardinality = tf.data.experimental.cardinality(val_test_ds).numpy()
-    test_size = int(val_test_cardinality * 0.5)
-    test_ds = val_test_ds.take(test_size)
+    records = read_dataset_manifest(DATASET_MANIFEST, sources=SOURCES)
+    _, _, test_records = split_records(CLASSIFICATION_SPLIT, records, 0.8, 0.1)
+    store = open_store("classification", DATASET_MANIFEST, IMAGE_SIZE)
+    test_ds = classification_dataset(test_records, IMAGE_SIZE, store=store)
 
 
     def preprocess_val_test(image, label):
@@ -44,8 +36,7 @@ with file_logging(log_filename=TEST_LOG_FILENAME):
         return image, label
 
     test_ds = (
-        test_ds.cache(str(CACHE_DIR / "test_p2_cache"))
-        .map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
+        test_ds.map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
         .batch(BATCH_SIZE)
         .prefetch(tf.data.AUTOTUNE)
     )
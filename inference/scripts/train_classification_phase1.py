@@ -1,5 +1,6 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import argparse
 import json
 from pathlib import Path
 import tensorflow as tf
@@ -7,16 +8,36 @@ from tensorflow.keras import layers, Sequential, Model, callbacks, optimizers, m
 from tensorflow.keras.applications import EfficientNetB0
 from tensorflow.keras.applications.efficientnet import preprocess_input
 from tensorflow.keras.metrics import AUC
-import matplotlib.pyplot as plt
 import numpy as np
-from utils.plot_handler import plot_history
-from utils.logger import file_logging
+from utils.logger import epoch_event_callback, file_logging
+from utils.manifests import read_dataset_manifest
+from utils.datasets import classification_dataset
+from utils.splits import CLASSIFICATION_SPLIT, split_records
+from utils.shard_store import open_store
+from utils.distributed import get_strategy, is_chief, num_workers, shard_by_data, worker_path
+from utils.feature_cache import build_feature_cache, feature_cache_version, open_feature_cache
+from datetime import datetime
+
+parser = argparse.ArgumentParser(description="Phase 1: train the classifier head on a frozen EfficientNetB0")
+parser.add_argument("--cached-features", action="store_true",
+                    help="Run the frozen backbone once per image (and augmentation variant) and train the head from cached features")
+args = parser.parse_args()
+if args.cached_features and num_workers() > 1:
+    raise SystemExit("--cached-features trains only the head and runs on a single worker; unset TF_CONFIG")
+
+# Only the chief writes to the shared log; other workers keep their own copy (see worker_path).
+LOG_PATH = worker_path(Path("core/models/ai_detection/logs") / f"training_log_{datetime.now().strftime('%Y%m%d')}.txt")
+
+with file_logging(log_dir=LOG_PATH.parent, log_filename=LOG_PATH.name, subdirectory="", live_report=is_chief()):
+    # Joins the worker cluster when TF_CONFIG is set; must precede other TF ops.
+    strategy = get_strategy()
 
-with file_logging():
     TRAIN_SPLIT_PERCENT = 0.6
     VAL_TEST_SPLIT = 0.2
     IMAGE_SIZE = (224, 224)
     BATCH_SIZE = 16
+    # BATCH_SIZE is per replica; with several workers each takes its share of the global batch.
+    GLOBAL_BATCH_SIZE = BATCH_SIZE * strategy.num_replicas_in_sync
     EPOCHS = 50
     EPOCHS_WARMUP = 15
     EPOCHS_FINETUNE = 30
@@ -24,8 +45,13 @@ with file_logging():
     WEIGHT_DECAY = 0.01
     WARMUP_STEPS = 1000
     DROPOUT_RATE = 0.2
+    # Train images are cached as the plain image plus FEATURE_VARIANTS - 1 augmented copies.
+    FEATURE_VARIANTS = 8
+    FEATURE_BATCH_SIZE = 64
 
-    DATASET_DIR = "dataset/images/classification"
+    DATASET_MANIFEST = "dataset/manifests/dataset_manifest.csv"
+    # None uses every source in the manifest; otherwise e.g. ["coco", "SD"]
+    SOURCES = None
     MODEL_SAVE_DIR = Path("core/models/ai_detection")
     MODEL_SAVE_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -40,36 +66,17 @@ with file_logging():
     print("Loading and preparing datasets...")
     print("=" * 60)
 
-    CLASS_NAMES = ['ai_generated', 'real']
-
-    train_ds = tf.keras.utils.image_dataset_from_directory(
-        DATASET_DIR,
-        validation_split=VAL_TEST_SPLIT,
-        subset="training",
-        seed=42,
-        image_size=IMAGE_SIZE,
-        batch_size=None,
-       # batch_size=BATCH_SIZE,
-        label_mode="binary",
-        class_names=CLASS_NAMES 
-    )
+    records = read_dataset_manifest(DATASET_MANIFEST, sources=SOURCES)
+    print(f"Loaded {len(records)} images from {DATASET_MANIFEST}")
 
-    val_test_ds = tf.keras.utils.image_dataset_from_directory(
-        DATASET_DIR,
-        validation_split=VAL_TEST_SPLIT,
-        subset="validation",
-        seed=42,
-        image_size=IMAGE_SIZE,
-        batch_size=BATCH_SIZE,
-        label_mode="binary",
-        class_names=CLASS_NAMES 
+    train_records, val_records, test_records = split_records(
+        CLASSIFICATION_SPLIT, records, 1.0 - VAL_TEST_SPLIT, VAL_TEST_SPLIT / 2
     )
 
-    val_test_cardinality = tf.data.experimental.cardinality(val_test_ds).numpy()
-    test_batches = int(val_test_cardinality * 0.5)
-
-    test_ds = val_test_ds.take(test_batches)
-    val_ds = val_test_ds.skip(test_batches)
+    store = open_store("classification", DATASET_MANIFEST, IMAGE_SIZE)
+    train_ds = classification_dataset(train_records, IMAGE_SIZE, store=store)
+    val_ds = classification_dataset(val_records, IMAGE_SIZE, store=store).batch(GLOBAL_BATCH_SIZE)
+    test_ds = classification_dataset(test_records, IMAGE_SIZE, store=store).batch(GLOBAL_BATCH_SIZE)
 
     normalization_layer = layers.Rescaling(1.0 / 255.0)
 
@@ -91,85 +98,96 @@ with file_logging():
         image = preprocess_input(image)
         return image, label
 
-    CACHE_DIR = MODEL_SAVE_DIR / "cache"
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
-
-    train_ds = (
-        train_ds.cache(str(CACHE_DIR / "train_cache")) 
-        .shuffle(10000)
-        .batch(BATCH_SIZE)
+    train_ds = shard_by_data(
+        train_ds.shuffle(10000)
+        .batch(GLOBAL_BATCH_SIZE)
         .map(preprocess_train, num_parallel_calls=tf.data.AUTOTUNE)
         .prefetch(tf.data.AUTOTUNE)
     )
 
-    val_ds = (
-        val_ds.cache(str(CACHE_DIR / "val_cache"))
-        .map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
+    val_ds = shard_by_data(
+        val_ds.map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
         .prefetch(tf.data.AUTOTUNE)
     )
 
     test_ds = (
-        test_ds.cache(str(CACHE_DIR / "test_cache"))
-        .map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
+        test_ds.map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
         .prefetch(tf.data.AUTOTUNE)
     )
 
 
-    print("\n" + "=" * 60)
-    print("LABEL VERIFICATION")
-    print("=" * 60)
+    if not args.cached_features:
+        print("\n" + "=" * 60)
+        print("LABEL VERIFICATION")
+        print("=" * 60)
 
-    for images, labels in train_ds.take(1):
-        print(f"First 10 labels: {labels.numpy()[:10]}")
-        print(f"Label dtype: {labels.dtype}")
-        print(f"Label range: [{labels.numpy().min()}, {labels.numpy().max()}]")
-        print(f"Unique labels: {np.unique(labels.numpy())}")
-        
-    all_labels = []
-    for _, labels in train_ds.unbatch().batch(1000).take(10):
-        all_labels.extend(labels.numpy())
-    print(f"Class distribution: 0={sum(1 for l in all_labels if l==0)}, 1={sum(1 for l in all_labels if l==1)}")
-    print("=" * 60)
+        for images, labels in train_ds.take(1):
+            print(f"First 10 labels: {labels.numpy()[:10]}")
+            print(f"Label dtype: {labels.dtype}")
+            print(f"Label range: [{labels.numpy().min()}, {labels.numpy().max()}]")
+            print(f"Unique labels: {np.unique(labels.numpy())}")
 
-    print(f"Training batches: {len(train_ds)}")
-    print(f"Validation batches: {len(val_ds)}")
-    print(f"Test batches: {len(test_ds)}")
+        all_labels = []
+        for _, labels in train_ds.unbatch().batch(1000).take(10):
+            all_labels.extend(labels.numpy())
+        print(f"Class distribution: 0={sum(1 for l in all_labels if l==0)}, 1={sum(1 for l in all_labels if l==1)}")
+        print("=" * 60)
+
+        print(f"Training batches: {len(train_ds)}")
+        print(f"Validation batches: {len(val_ds)}")
+        print(f"Test batches: {len(test_ds)}")
 
     print("\n" + "=" * 60)
     print("Building model architecture...")
     print("=" * 60)
 
-    base_model = EfficientNetB0(
-        weights="imagenet",
-        include_top=False,
-        input_shape=(*IMAGE_SIZE, 3),
-    )
-
-    base_model.trainable = False
-
-    inputs = layers.Input(shape=(*IMAGE_SIZE, 3))
-    x = base_model(inputs, training=False)
-    x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dropout(0.3)(x)
-    x = layers.Dense(256, activation="relu")(x)
-    x = layers.Dropout(0.2)(x)
-    outputs = layers.Dense(1, dtype="float32")(x)
-
-    model = Model(inputs, outputs)
-
-    print(f"Model parameters: {model.count_params():,}")
-    print(f"Trainable parameters: {sum([tf.size(w).numpy() for w in model.trainable_weights]):,}")
+    with strategy.scope():
+        base_model = EfficientNetB0(
+            weights="imagenet",
+            include_top=False,
+            input_shape=(*IMAGE_SIZE, 3),
+        )
 
-    optimizer = optimizers.AdamW(
-        learning_rate=INITIAL_LR,
-        weight_decay=WEIGHT_DECAY
-    )
+        base_model.trainable = False
+
+        inputs = layers.Input(shape=(*IMAGE_SIZE, 3))
+        x = base_model(inputs, training=False)
+        features = layers.GlobalAveragePooling2D()(x)
+        # Kept as a list so the cached-features mode can train the same layers.
+        head_layers = [
+            layers.Dropout(0.3),
+            layers.Dense(256, activation="relu"),
+            layers.Dropout(0.2),
+            layers.Dense(1, dtype="float32"),
+        ]
+        x = features
+        for layer in head_layers:
+            x = layer(x)
+        outputs = x
+
+        model = Model(inputs, outputs)
+
+        # The head on its own, sharing weights with model.
+        head_inputs = layers.Input(shape=(features.shape[-1],))
+        x = head_inputs
+        for layer in head_layers:
+            x = layer(x)
+        head = Model(head_inputs, x)
+        fit_model = head if args.cached_features else model
+
+        print(f"Model parameters: {model.count_params():,}")
+        print(f"Trainable parameters: {sum([tf.size(w).numpy() for w in model.trainable_weights]):,}")
+
+        optimizer = optimizers.AdamW(
+            learning_rate=INITIAL_LR,
+            weight_decay=WEIGHT_DECAY
+        )
 
-    model.compile(
-        optimizer=optimizer,
-        loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
-        metrics=['accuracy', AUC(curve='ROC', name='auc')]
-    )
+        fit_model.compile(
+            optimizer=optimizer,
+            loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
+            metrics=['accuracy', AUC(curve='ROC', name='auc')]
+        )
 
     print("\n" + "=" * 60)
     print("Setting up training callbacks...")
@@ -177,9 +195,43 @@ with file_logging():
 
     model.summary()
 
+    if args.cached_features:
+        print("\n" + "=" * 60)
+        print("Caching backbone features...")
+        print("=" * 60)
+
+        feature_splits = {"train": train_records, "val": val_records}
+        version = feature_cache_version(feature_splits, "EfficientNetB0-imagenet", IMAGE_SIZE, FEATURE_VARIANTS)
+        feature_cache = open_feature_cache(version)
+        if feature_cache is None:
+            def make_feature_dataset(split, variant):
+                ds = classification_dataset(feature_splits[split], IMAGE_SIZE, store=store).batch(FEATURE_BATCH_SIZE)
+                if variant > 0:
+                    ds = ds.map(lambda image, label: (data_augmentation(image), label), num_parallel_calls=tf.data.AUTOTUNE)
+                return ds.map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+            feature_cache = build_feature_cache(
+                version,
+                Model(inputs, features),
+                {"train": (len(train_records), FEATURE_VARIANTS), "val": (len(val_records), 1)},
+                make_feature_dataset,
+            )
+        fit_train_ds = feature_cache.dataset("train", GLOBAL_BATCH_SIZE, training=True)
+        fit_val_ds = feature_cache.dataset("val", GLOBAL_BATCH_SIZE)
+    else:
+        fit_train_ds, fit_val_ds = train_ds, val_ds
+
+    class FullModelCheckpoint(callbacks.ModelCheckpoint):
+        """Saves the full model's weights while fit() trains the head alone,
+        so phase 2 loads the same file either way."""
+        def set_model(self, _):
+            super().set_model(model)
+
+    checkpoint_callback = FullModelCheckpoint if args.cached_features else callbacks.ModelCheckpoint
+
     callbacks_list = [
-        callbacks.ModelCheckpoint(
-            filepath=str(MODEL_SAVE_DIR / "best_model.weights.h5"),
+        checkpoint_callback(
+            filepath=str(worker_path(MODEL_SAVE_DIR / "best_model.weights.h5")),
             monitor="val_auc",
             mode="max",
             save_best_only=True,
@@ -199,23 +251,30 @@ with file_logging():
             patience=3,
             min_lr=1e-7,
             verbose=1
-        )
+        ),
+        epoch_event_callback(fit_model)
     ]
 
     print("\n" + "=" * 60)
     print("Starting training...")
     print("=" * 60)
 
-    history = model.fit(
-        train_ds,
-        validation_data=val_ds,
+    history = fit_model.fit(
+        fit_train_ds,
+        validation_data=fit_val_ds,
         callbacks=callbacks_list,
         epochs=EPOCHS_WARMUP,
         verbose=1
     )
 
-    print("\n" + "=" * 60)
-    print("Plotting training history...")
-    print("=" * 60)
+    if args.cached_features:
+        # The cached val features are variant 0, i.e. exactly what the full
+        # model sees; this confirms the head transfers onto the backbone.
+        model.compile(
+            loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
+            metrics=['accuracy', AUC(curve='ROC', name='auc')]
+        )
+        val_metrics = model.evaluate(val_ds, return_dict=True, verbose=0)
+        print(f"Full model on validation images: loss={val_metrics['loss']:.4f} | "
+              f"accuracy={val_metrics['accuracy']:.4f} | auc={val_metrics['auc']:.4f}")
 
-    plot_history(history)
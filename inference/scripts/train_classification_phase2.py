@@ -8,27 +8,37 @@ from tensorflow.keras import layers, Sequential, Model, callbacks, optimizers, m
 from tensorflow.keras.applications import EfficientNetB0
 from tensorflow.keras.applications.efficientnet import preprocess_input
 from tensorflow.keras.metrics import AUC
-import matplotlib.pyplot as plt
 import numpy as np
-from utils.plot_handler import plot_history
-from utils.logger import file_logging
+from utils.logger import epoch_event_callback, file_logging
+from utils.manifests import read_dataset_manifest
+from utils.datasets import classification_dataset
+from utils.splits import CLASSIFICATION_SPLIT, split_records
+from utils.shard_store import open_store
+from utils.distributed import get_strategy, is_chief, shard_by_data, worker_path
 from datetime import datetime
 
 TIMESTAMP = datetime.now().strftime('%Y%m%d_%H%M%S')
 TRAINING_LOG_FILENAME = f"training_log_phase2_{TIMESTAMP}.txt"
+# Only the chief writes to the shared log; other workers keep their own copy (see worker_path).
+LOG_PATH = worker_path(Path("core/models/ai_detection/logs") / TRAINING_LOG_FILENAME)
+
+with file_logging(log_dir=LOG_PATH.parent, log_filename=LOG_PATH.name, subdirectory="", live_report=is_chief()):
+    # Joins the worker cluster when TF_CONFIG is set; must precede other TF ops.
+    strategy = get_strategy()
 
-with file_logging(log_filename=TRAINING_LOG_FILENAME):
     IMAGE_SIZE = (224, 224)
     BATCH_SIZE = 16
+    # BATCH_SIZE is per replica; with several workers each takes its share of the global batch.
+    GLOBAL_BATCH_SIZE = BATCH_SIZE * strategy.num_replicas_in_sync
     EPOCHS_FINETUNE = 30
     FINETUNE_LR = 1e-5  
     WEIGHT_DECAY = 1e-6
 
-    DATASET_DIR = "dataset/images/classification"
+    DATASET_MANIFEST = "dataset/manifests/dataset_manifest.csv"
+    # None uses every source in the manifest; otherwise e.g. ["coco", "SD"]
+    SOURCES = None
     MODEL_SAVE_DIR = Path("core/models/ai_detection")
-    CACHE_DIR = MODEL_SAVE_DIR / "cache"
     MODEL_SAVE_DIR.mkdir(parents=True, exist_ok=True)
-    CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
     gpus = tf.config.list_physical_devices('GPU')
     if gpus:
@@ -39,34 +49,15 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
     print("🚀 Starting Phase 2 — Fine-tuning pretrained backbone")
     print("=" * 60)
 
-    CLASS_NAMES = ['ai_generated', 'real']
-
-    train_ds = tf.keras.utils.image_dataset_from_directory(
-        DATASET_DIR,
-        validation_split=0.2,
-        subset="training",
-        seed=42,
-        image_size=IMAGE_SIZE,
-        batch_size=None,
-        label_mode="binary",
-        class_names=CLASS_NAMES
-    )
+    records = read_dataset_manifest(DATASET_MANIFEST, sources=SOURCES)
+    print(f"Loaded {len(records)} images from {DATASET_MANIFEST}")
 
-    val_test_ds = tf.keras.utils.image_dataset_from_directory(
-        DATASET_DIR,
-        validation_split=0.2,
-        subset="validation",
-        seed=42,
-        image_size=IMAGE_SIZE,
-        batch_size=None,
-        label_mode="binary",
-        class_names=CLASS_NAMES
-    )
+    train_records, val_records, test_records = split_records(CLASSIFICATION_SPLIT, records, 0.8, 0.1)
 
-    val_test_cardinality = tf.data.experimental.cardinality(val_test_ds).numpy()
-    test_size = int(val_test_cardinality * 0.5)
-    test_ds = val_test_ds.take(test_size)
-    val_ds = val_test_ds.skip(test_size)
+    store = open_store("classification", DATASET_MANIFEST, IMAGE_SIZE)
+    train_ds = classification_dataset(train_records, IMAGE_SIZE, store=store)
+    val_ds = classification_dataset(val_records, IMAGE_SIZE, store=store)
+    test_ds = classification_dataset(test_records, IMAGE_SIZE, store=store)
 
     data_augmentation = Sequential([
         layers.RandomFlip("horizontal"),
@@ -85,25 +76,22 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
         image = preprocess_input(image)
         return image, label
 
-    train_ds = (
-        train_ds.cache(str(CACHE_DIR / "train_p2_cache"))
-        .shuffle(10000)
+    train_ds = shard_by_data(
+        train_ds.shuffle(10000)
         .map(preprocess_train, num_parallel_calls=tf.data.AUTOTUNE)
-        .batch(BATCH_SIZE)
+        .batch(GLOBAL_BATCH_SIZE)
         .prefetch(tf.data.AUTOTUNE)
     )
 
-    val_ds = (
-        val_ds.cache(str(CACHE_DIR / "val_p2_cache"))
-        .map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
-        .batch(BATCH_SIZE)
+    val_ds = shard_by_data(
+        val_ds.map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(GLOBAL_BATCH_SIZE)
         .prefetch(tf.data.AUTOTUNE)
     )
 
     test_ds = (
-        test_ds.cache(str(CACHE_DIR / "test_p2_cache"))
-        .map(preprocess_val_test,num_parallel_calls=tf.data.AUTOTUNE)
-        .batch(BATCH_SIZE)
+        test_ds.map(preprocess_val_test, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(GLOBAL_BATCH_SIZE)
         .prefetch(tf.data.AUTOTUNE)
     )
 
@@ -115,64 +103,65 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
     print("Loading Phase 1 model and unfreezing layers...")
     print("=" * 60)
 
-    base_model = EfficientNetB0(
-        weights="imagenet",
-        include_top=False,
-        input_shape=(*IMAGE_SIZE, 3)
-    )
+    with strategy.scope():
+        base_model = EfficientNetB0(
+            weights="imagenet",
+            include_top=False,
+            input_shape=(*IMAGE_SIZE, 3)
+        )
 
-    UNFREEZE_FROM_LAYER = len(base_model.layers) - 140
+        UNFREEZE_FROM_LAYER = len(base_model.layers) - 140
 
-    inputs = layers.Input(shape=(*IMAGE_SIZE, 3))
-    x = base_model(inputs, training=False)
-    x = layers.GlobalAveragePooling2D()(x)
-    x = layers.Dropout(0.3)(x)
-    x = layers.Dense(256, activation="relu")(x)
-    x = layers.Dropout(0.2)(x)
-    outputs = layers.Dense(1, dtype="float32")(x)
+        inputs = layers.Input(shape=(*IMAGE_SIZE, 3))
+        x = base_model(inputs, training=False)
+        x = layers.GlobalAveragePooling2D()(x)
+        x = layers.Dropout(0.3)(x)
+        x = layers.Dense(256, activation="relu")(x)
+        x = layers.Dropout(0.2)(x)
+        outputs = layers.Dense(1, dtype="float32")(x)
 
-    model = Model(inputs, outputs)
+        model = Model(inputs, outputs)
 
-    phase1_weights = MODEL_SAVE_DIR / "best_model.weights.h5"
+        phase1_weights = MODEL_SAVE_DIR / "best_model.weights.h5"
 
-    if phase1_weights.exists():
-        print(f"Loading Phase 1 weights from: {phase1_weights}")
-        model.load_weights(str(phase1_weights))
-    else:
-        print("WARNING: No Phase 1 weights found! Starting from scratch.")
-        print("Make sure you run Phase 1 training first!")
+        if phase1_weights.exists():
+            print(f"Loading Phase 1 weights from: {phase1_weights}")
+            model.load_weights(str(phase1_weights))
+        else:
+            print("WARNING: No Phase 1 weights found! Starting from scratch.")
+            print("Make sure you run Phase 1 training first!")
 
-    base_model.trainable = True
+        base_model.trainable = True
 
-    frozen_count = 0
-    trainable_count = 0
+        frozen_count = 0
+        trainable_count = 0
 
-    for i, layer in enumerate(base_model.layers):
-        if i < UNFREEZE_FROM_LAYER:
-            layer.trainable = False
-            frozen_count += 1
-        else:
-            layer.trainable = True
-            trainable_count += 1
+        for i, layer in enumerate(base_model.layers):
+            if i < UNFREEZE_FROM_LAYER:
+                layer.trainable = False
+                frozen_count += 1
+            else:
+                layer.trainable = True
+                trainable_count += 1
 
-    print(f"\nEfficientNetB0 has {len(base_model.layers)} layers")
-    print(f"Frozen layers: {frozen_count}")
-    print(f"Trainable layers: {trainable_count}")
-    print(f"Total trainable parameters: {sum([tf.size(w).numpy() for w in model.trainable_weights]):,}")
-    print(f"\nUnfreezing from layer index: {UNFREEZE_FROM_LAYER}")
-    print(f"Layer name at index {UNFREEZE_FROM_LAYER}: {base_model.layers[UNFREEZE_FROM_LAYER].name}")
+        print(f"\nEfficientNetB0 has {len(base_model.layers)} layers")
+        print(f"Frozen layers: {frozen_count}")
+        print(f"Trainable layers: {trainable_count}")
+        print(f"Total trainable parameters: {sum([tf.size(w).numpy() for w in model.trainable_weights]):,}")
+        print(f"\nUnfreezing from layer index: {UNFREEZE_FROM_LAYER}")
+        print(f"Layer name at index {UNFREEZE_FROM_LAYER}: {base_model.layers[UNFREEZE_FROM_LAYER].name}")
 
 
-    optimizer = optimizers.AdamW(
-        learning_rate=FINETUNE_LR,
-        weight_decay=WEIGHT_DECAY
-    )
+        optimizer = optimizers.AdamW(
+            learning_rate=FINETUNE_LR,
+            weight_decay=WEIGHT_DECAY
+        )
     
-    model.compile(
-        optimizer=optimizer,
-        loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
-        metrics=['accuracy', AUC(curve='ROC', name='auc')]
-    )
+        model.compile(
+            optimizer=optimizer,
+            loss=tf.keras.losses.BinaryCrossentropy(from_logits=True),
+            metrics=['accuracy', AUC(curve='ROC', name='auc')]
+        )
 
     print("\n" + "=" * 60)
     print("Setting up fine-tuning callbacks...")
@@ -180,7 +169,7 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
 
     callbacks_list = [
         callbacks.ModelCheckpoint(
-            filepath=str(MODEL_SAVE_DIR / "best_model_finetuned.weights.h5"),
+            filepath=str(worker_path(MODEL_SAVE_DIR / "best_model_finetuned.weights.h5")),
             monitor="val_auc",
             mode="max",
             save_best_only=True,
@@ -202,9 +191,10 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
             verbose=1
         ),
         callbacks.CSVLogger(
-            str(MODEL_SAVE_DIR / "training_log_phase2.csv"),
+            str(worker_path(MODEL_SAVE_DIR / "training_log_phase2.csv")),
             append=True,
-        )
+        ),
+        epoch_event_callback(model)
     ]
 
     print("\n" + "=" * 60)
@@ -232,14 +222,9 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
     print(f"Test AUC: {test_results[2]:.4f}")
 
     final_model_path = MODEL_SAVE_DIR / "final_model_phase2.weights.h5"
-    model.save_weights(str(final_model_path))
+    model.save_weights(str(worker_path(final_model_path)))
     print(f"\nFinal model saved to: {final_model_path}")
 
-    print("\n" + "=" * 60)
-    print("Plotting training history...")
-    print("=" * 60)
-
-    plot_history(history)
 
     summary = {
         "phase": 2,
@@ -258,7 +243,7 @@ with file_logging(log_filename=TRAINING_LOG_FILENAME):
         "weight_decay": WEIGHT_DECAY,
     }
 
-    summary_path = MODEL_SAVE_DIR / "training_summary_phase2.json"
+    summary_path = worker_path(MODEL_SAVE_DIR / "training_summary_phase2.json")
     with open(summary_path, 'w') as f:
         json.dump(summary, f, indent=2)
 
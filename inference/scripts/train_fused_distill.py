@@ -0,0 +1,304 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import layers, optimizers
+
+from api.config import AI_GENERATED_THRESHOLD, CLASSIFIER_CKPT, LOCALIZATION_CKPT, FUSED_CKPT, MASK_THRESHOLD
+from api.models import load_classifier_model, load_localization_model, build_fused_model
+from utils.logger import file_logging
+from utils.manifests import DATASET_MANIFEST, TAMPER_MANIFEST, read_dataset_manifest, read_tamper_manifest
+
+TIMESTAMP = datetime.now().strftime('%Y%m%d')
+TRAINING_LOG_FILENAME = f"training_log_fused_{TIMESTAMP}.txt"
+
+IMAGE_SIZE = (224, 224)
+BATCH_SIZE = 8
+EPOCHS_DECODER = 4
+EPOCHS_JOINT = 10
+LR_DECODER = 1e-4
+LR_JOINT = 1e-5
+WEIGHT_DECAY = 1e-5
+TEMPERATURE = 2.0
+MASK_DISTILL_WEIGHT = 3.0
+VAL_SPLIT = 0.1
+EARLYSTOP_PATIENCE = 3
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+
+MODEL_SAVE_DIR = FUSED_CKPT.parent
+REPORT_PATH = MODEL_SAVE_DIR / "fused_distill_report.json"
+
+def list_images():
+    # Classification images plus both sides of every tamper triple, straight
+    # from the manifests rather than walking the image directories.
+    paths = [str(INFERENCE_ROOT / r["path"]) for r in read_dataset_manifest()]
+    for triple in read_tamper_manifest():
+        paths.append(str(INFERENCE_ROOT / triple["edited"]))
+        paths.append(str(INFERENCE_ROOT / triple["original"]))
+    paths = sorted(set(paths))
+    if len(paths) == 0:
+        raise ValueError(f"No images listed in {DATASET_MANIFEST} or {TAMPER_MANIFEST}")
+
+    random.seed(42)
+    random.shuffle(paths)
+    return paths
+
+
+def load_image_tf(path):
+    img_bytes = tf.io.read_file(path)
+    img = tf.image.decode_image(img_bytes, channels=3, expand_animations=False)
+    img = tf.image.convert_image_dtype(img, tf.float32)
+    img = tf.image.resize(img, IMAGE_SIZE)
+    img.set_shape((*IMAGE_SIZE, 3))
+    return tf.keras.applications.efficientnet.preprocess_input(img * 255.0)
+
+
+def create_dataset(paths, training):
+    ds = tf.data.Dataset.from_tensor_slices(paths)
+    if training:
+        ds = ds.shuffle(len(paths), seed=42, reshuffle_each_iteration=True)
+    ds = ds.map(load_image_tf, num_parallel_calls=tf.data.AUTOTUNE)
+    if training:
+        ds = ds.map(tf.image.random_flip_left_right, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+
+
+def init_from_teachers(student, classifier, localization):
+    """Copy encoder + classifier head from the classifier and the decoder from
+    the localization model, matching layers by name."""
+    clf_layers = {l.name: l for l in classifier.layers}
+    loc_layers = {l.name: l for l in localization.layers}
+    copied = 0
+    for layer in student.layers:
+        if not layer.weights:
+            continue
+        if layer.name.startswith("dec_") or layer.name == "mask_logit":
+            source = loc_layers.get(layer.name)
+        else:
+            source = clf_layers.get(layer.name)
+        if source is not None:
+            layer.set_weights(source.get_weights())
+            copied += 1
+    print(f"Initialised {copied} student layers from teacher weights")
+
+
+def set_encoder_trainable(model, trainable):
+    for layer in model.layers:
+        if layer.name.startswith("dec_") or layer.name == "mask_logit":
+            layer.trainable = True
+        elif isinstance(layer, layers.BatchNormalization):
+            # Keep encoder BN statistics identical to the teachers'.
+            layer.trainable = False
+        else:
+            layer.trainable = trainable
+
+
+def soft_bce_from_logits(teacher_logits, student_logits, temperature):
+    targets = tf.sigmoid(teacher_logits / temperature)
+    loss = tf.nn.sigmoid_cross_entropy_with_logits(labels=targets, logits=student_logits / temperature)
+    return tf.reduce_mean(loss) * (temperature ** 2)
+
+
+class DistillTrainer:
+    def __init__(self, student, classifier, localization, lr=LR_DECODER):
+        self.student = student
+        self.classifier = classifier
+        self.localization = localization
+        self.opt = optimizers.AdamW(learning_rate=lr, weight_decay=WEIGHT_DECAY)
+        self._clip_norm = 1.0
+
+    def compute_loss(self, imgs, training):
+        t_class = self.classifier(imgs, training=False)
+        t_mask = self.localization(imgs, training=False)
+        s_class, s_mask = self.student(imgs, training=training)
+        class_loss = soft_bce_from_logits(t_class, s_class, TEMPERATURE)
+        mask_loss = soft_bce_from_logits(t_mask, s_mask, 1.0)
+        total = class_loss + MASK_DISTILL_WEIGHT * mask_loss
+        return total, class_loss, mask_loss
+
+    @tf.function
+    def train_step(self, imgs):
+        with tf.GradientTape() as tape:
+            total, class_loss, mask_loss = self.compute_loss(imgs, training=True)
+        grads = tape.gradient(total, self.student.trainable_variables)
+        grads, _ = tf.clip_by_global_norm(grads, self._clip_norm)
+        self.opt.apply_gradients(zip(grads, self.student.trainable_variables))
+        return total, class_loss, mask_loss
+
+    @tf.function
+    def val_step(self, imgs):
+        return self.compute_loss(imgs, training=False)
+
+
+def run_epochs(trainer, train_ds, val_ds, epochs, phase_name, state):
+    for epoch in range(epochs):
+        train_losses = []
+        for imgs in train_ds:
+            total, _, _ = trainer.train_step(imgs)
+            train_losses.append(float(total.numpy()))
+
+        val_total, val_class, val_mask = [], [], []
+        for imgs in val_ds:
+            total, class_loss, mask_loss = trainer.val_step(imgs)
+            val_total.append(float(total.numpy()))
+            val_class.append(float(class_loss.numpy()))
+            val_mask.append(float(mask_loss.numpy()))
+
+        val_loss = float(np.mean(val_total))
+        print(f"{phase_name} Epoch {epoch+1}/{epochs} | train_loss={np.mean(train_losses):.4f} | "
+              f"val_loss={val_loss:.4f} | val_class={np.mean(val_class):.4f} | val_mask={np.mean(val_mask):.4f}")
+
+        if val_loss < state['best'] - 1e-6:
+            state['best'] = val_loss
+            state['wait'] = 0
+            trainer.student.save_weights(str(FUSED_CKPT))
+            print(f"[Checkpoint] val_loss improved to {val_loss:.4f} — saved to {FUSED_CKPT}")
+        else:
+            state['wait'] += 1
+            if state['wait'] >= EARLYSTOP_PATIENCE:
+                print(f"[EarlyStopping] No improvement for {EARLYSTOP_PATIENCE} epochs.")
+                return
+
+
+def agreement_report(student, classifier, localization, dataset):
+    conf_deltas = []
+    decisions_agree = []
+    dices = []
+    for imgs in dataset:
+        t_conf = tf.sigmoid(classifier(imgs, training=False)).numpy().reshape(-1)
+        t_mask = tf.sigmoid(localization(imgs, training=False)).numpy() > MASK_THRESHOLD
+        s_class, s_mask = student(imgs, training=False)
+        s_conf = tf.sigmoid(s_class).numpy().reshape(-1)
+        s_mask = tf.sigmoid(s_mask).numpy() > MASK_THRESHOLD
+
+        conf_deltas.append(np.abs(t_conf - s_conf))
+        decisions_agree.append((t_conf > AI_GENERATED_THRESHOLD) == (s_conf > AI_GENERATED_THRESHOLD))
+
+        a = t_mask.reshape(len(t_mask), -1).astype(np.float32)
+        b = s_mask.reshape(len(s_mask), -1).astype(np.float32)
+        union = a.sum(axis=1) + b.sum(axis=1)
+        dices.append(np.where(union > 0, 2.0 * (a * b).sum(axis=1) / np.maximum(union, 1.0), 1.0))
+
+    conf_deltas = np.concatenate(conf_deltas)
+    dices = np.concatenate(dices)
+    return {
+        "num_images": int(len(conf_deltas)),
+        "confidence_mean_abs_delta": float(conf_deltas.mean()),
+        "confidence_max_abs_delta": float(conf_deltas.max()),
+        "decision_agreement": float(np.concatenate(decisions_agree).mean()),
+        "mask_dice_mean": float(dices.mean()),
+        "mask_dice_min": float(dices.min()),
+    }
+
+
+def measure_latency(fn, batch_size, iterations=30):
+    batch = tf.zeros((batch_size, *IMAGE_SIZE, 3), dtype=tf.float32)
+    fn(batch)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        tf.nest.map_structure(lambda t: t.numpy(), fn(batch))
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000.0
+    return {"p50_ms": float(np.percentile(timings, 50)), "p95_ms": float(np.percentile(timings, 95))}
+
+
+def latency_report(student, classifier, localization, batch_sizes=(1, 8)):
+    two_models = tf.function(lambda x: (classifier(x, training=False), localization(x, training=False)))
+    fused = tf.function(lambda x: student(x, training=False))
+    report = {}
+    for batch_size in batch_sizes:
+        separate = measure_latency(two_models, batch_size)
+        shared = measure_latency(fused, batch_size)
+        report[str(batch_size)] = {
+            "separate": separate,
+            "fused": shared,
+            "p50_speedup": separate["p50_ms"] / shared["p50_ms"],
+        }
+        print(f"batch={batch_size:2d} | separate p50 {separate['p50_ms']:.1f} ms | "
+              f"fused p50 {shared['p50_ms']:.1f} ms | x{report[str(batch_size)]['p50_speedup']:.2f}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill the classifier and localization models into one shared-backbone model")
+    parser.add_argument("--report-only", action="store_true", help="Skip training and report on the saved fused checkpoint")
+    args = parser.parse_args()
+
+    MODEL_SAVE_DIR.mkdir(parents=True, exist_ok=True)
+
+    classifier = load_classifier_model(CLASSIFIER_CKPT, IMAGE_SIZE, strict=True)
+    localization = load_localization_model(LOCALIZATION_CKPT, IMAGE_SIZE, strict=True)
+    classifier.trainable = False
+    localization.trainable = False
+
+    paths = list_images()
+    n_val = max(1, int(len(paths) * VAL_SPLIT))
+    train_ds = create_dataset(paths[n_val:], training=True)
+    val_ds = create_dataset(paths[:n_val], training=False)
+    print(f"Train/Val images: {len(paths) - n_val}/{n_val}")
+
+    student = build_fused_model(IMAGE_SIZE)
+    if args.report_only:
+        student.load_weights(str(FUSED_CKPT))
+    else:
+        init_from_teachers(student, classifier, localization)
+        state = {'best': np.inf, 'wait': 0}
+
+        print("Phase A: decoder adapts to the shared encoder (encoder + classifier head frozen)")
+        set_encoder_trainable(student, False)
+        trainer = DistillTrainer(student, classifier, localization, lr=LR_DECODER)
+        run_epochs(trainer, train_ds, val_ds, EPOCHS_DECODER, "PhaseA", state)
+
+        # A fresh trainer so the optimizer and compiled step pick up the new trainable set.
+        print("Phase B: joint distillation (encoder unfrozen, BN frozen)")
+        set_encoder_trainable(student, True)
+        trainer = DistillTrainer(student, classifier, localization, lr=LR_JOINT)
+        state['wait'] = 0
+        run_epochs(trainer, train_ds, val_ds, EPOCHS_JOINT, "PhaseB", state)
+
+        student.load_weights(str(FUSED_CKPT))
+
+    print("\n" + "=" * 60)
+    print("Agreement with the two-model outputs (validation images)")
+    print("=" * 60)
+    agreement = agreement_report(student, classifier, localization, val_ds)
+    for key, value in agreement.items():
+        print(f"{key}: {value}")
+
+    print("\n" + "=" * 60)
+    print("Latency: two models vs fused")
+    print("=" * 60)
+    latency = latency_report(student, classifier, localization)
+
+    report = {
+        "checkpoint": str(FUSED_CKPT),
+        "teachers": {"classifier": str(CLASSIFIER_CKPT), "localization": str(LOCALIZATION_CKPT)},
+        "agreement": agreement,
+        "latency": latency,
+        "params": {
+            "fused": int(student.count_params()),
+            "separate": int(classifier.count_params() + localization.count_params()),
+        },
+    }
+    with open(REPORT_PATH, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to: {REPORT_PATH}")
+
+
+if __name__ == "__main__":
+    with file_logging(log_dir=MODEL_SAVE_DIR, log_filename=TRAINING_LOG_FILENAME):
+        main()
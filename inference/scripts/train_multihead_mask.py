@@ -6,7 +6,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from pathlib import Path
 import argparse
+import json
 import random
+import time
 from datetime import datetime
 from contextlib import contextmanager
 
@@ -14,6 +16,12 @@ import numpy as np
 import tensorflow as tf
 from tensorflow.keras import layers, Model, losses, optimizers
 
+from utils.manifests import read_tamper_manifest
+from utils.datasets import tamper_entries, tamper_dataset
+from utils.shard_store import open_store
+from utils.augment import augment_batch
+from utils.distributed import get_strategy, is_chief, shard_by_data, worker_path
+
 try:
     import tensorflow_addons as tfa
 except ImportError:
@@ -56,14 +64,13 @@ except Exception:
     MIXED_PRECISION = False
 
 try:
-    from utils.plot_handler import plot_multihead_history
-    from utils.logger import file_logging
+    from utils.logger import file_logging, log_event
 except ImportError:
-    def plot_multihead_history(history, phase_name="phase"):
+    def log_event(event, **fields):
         return
     
     @contextmanager
-    def file_logging(log_dir=None, log_filename=None, subdirectory="logs"):
+    def file_logging(log_dir=None, log_filename=None, subdirectory="logs", live_report=False):
         yield None
 
 TIMESTAMP = datetime.now().strftime('%Y%m%d')
@@ -71,6 +78,9 @@ TRAINING_LOG_FILENAME = f"training_log_mask_{TIMESTAMP}.txt"
 
 IMAGE_SIZE = (224, 224)
 BATCH_SIZE = 4
+# Micro-batches of BATCH_SIZE accumulated per optimizer step (effective batch
+# BATCH_SIZE * ACCUM_STEPS per replica); activation memory stays at BATCH_SIZE.
+ACCUM_STEPS = 1
 FREEZE_EPOCHS = 12
 UNFREEZE_FROM_LAST_N = 20
 EPOCHS_UNFREEZE = 18
@@ -80,28 +90,49 @@ TRAIN_SPLIT = 0.7
 VAL_SPLIT = 0.15
 TEST_SPLIT = 0.15
 POS_WEIGHT = 8.0
+FOCAL_GAMMA = 0.5
 MASK_LOSS_WEIGHT = 3.0
 EARLYSTOP_PATIENCE = 5
+# Constants that --set NAME=VALUE may override (used by scripts/sweep.py).
+TUNABLE = (
+    "LR_FREEZE", "LR_UNFREEZE", "BATCH_SIZE", "POS_WEIGHT", "FOCAL_GAMMA",
+    "MASK_LOSS_WEIGHT", "FREEZE_EPOCHS", "EPOCHS_UNFREEZE", "EARLYSTOP_PATIENCE",
+)
+# Training steps per compiled call; Python reads metrics back once per call.
+STEPS_PER_EXECUTION = 50
+LOG_EVERY_STEPS = 200
+# Train order and augmentation are derived from this seed, epoch and step.
+SHUFFLE_SEED = 42
+# Full-state checkpoints for --resume, on top of the one written every epoch.
+CHECKPOINT_EVERY_STEPS = 500
+CHECKPOINTS_TO_KEEP = 2
+# --progressive: (fraction of the phase's epochs, train resolution). Sizes must
+# be multiples of 32 for the decoder's skip connections; validation always
+# runs at IMAGE_SIZE.
+PROGRESSIVE_SCHEDULE = ((0.0, 128), (0.25, 160), (0.5, 192), (0.75, 224))
 
 SCRIPT_DIR = Path(__file__).parent.resolve()
 INFERENCE_ROOT = SCRIPT_DIR.parent
 PROJECT_ROOT = SCRIPT_DIR.parent.parent
 
 MODEL_SAVE_DIR = INFERENCE_ROOT / "core/models/tamper_localization"
-MODEL_SAVE_DIR.mkdir(parents=True, exist_ok=True)
-CACHE_DIR = MODEL_SAVE_DIR / "cache"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
 LOG_DIR = INFERENCE_ROOT / "core/models/tamper_localization/logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 
-DATASET_DIR = INFERENCE_ROOT / "dataset/images/tamper_localization"
+TAMPER_MANIFEST = INFERENCE_ROOT / "dataset/manifests/tamper_manifest.csv"
+# None trains on every source in the manifest; otherwise e.g. ["IMD2020", "coco"]
+TAMPER_SOURCES = None
 CLASSIFIER_CKPT = INFERENCE_ROOT / "core/models/ai_detection/best_model_finetuned.weights.h5"
 
 CHECKPOINT_DIR = MODEL_SAVE_DIR
 BEST_PHASE1 = CHECKPOINT_DIR / "best_phase1_dice.h5"
 BEST_PHASE2 = CHECKPOINT_DIR / "best_phase2_dice.h5"
+RESUME_DIR = CHECKPOINT_DIR / "resume"
+# Weights phase 2 starts from (--init-from). Not moved by --output-dir, so
+# phase 2 sweep trials still start from the trained phase 1.
+PHASE1_INIT = BEST_PHASE1
+
 
-with file_logging(log_dir=LOG_DIR, log_filename=TRAINING_LOG_FILENAME):
+def print_device_info():
     print("="*60)
     print("GPU Detection and Configuration")
     print("="*60)
@@ -115,634 +146,918 @@ with file_logging(log_dir=LOG_DIR, log_filename=TRAINING_LOG_FILENAME):
     print(f"All available devices: {[d.name for d in all_devices]}")
     print(f"Mixed precision enabled: {MIXED_PRECISION}")
     print("="*60)
-    print()
-
-    def dice_coef_from_logits(y_true, y_pred_logits, eps=1e-6):
-        y_pred = tf.sigmoid(y_pred_logits)
-        y_true_f = tf.reshape(y_true, [tf.shape(y_true)[0], -1])
-        y_pred_f = tf.reshape(y_pred, [tf.shape(y_pred)[0], -1])
-        inter = 2.0 * tf.reduce_sum(y_true_f * y_pred_f, axis=1)
-        union = tf.reduce_sum(y_true_f, axis=1) + tf.reduce_sum(y_pred_f, axis=1) + eps
-        return tf.reduce_mean(inter / union)
-
-    def dice_loss_from_logits(y_true, y_pred_logits, eps=1e-6):
-        return 1.0 - dice_coef_from_logits(y_true, y_pred_logits, eps)
 
-    def iou_from_logits(y_true, y_pred_logits, eps=1e-6, threshold=0.5):
-        y_pred = tf.sigmoid(y_pred_logits)
-        y_pred_bin = tf.cast(y_pred > threshold, tf.float32)
-        y_true_f = tf.reshape(y_true, [tf.shape(y_true)[0], -1])
-        y_pred_f = tf.reshape(y_pred_bin, [tf.shape(y_pred_bin)[0], -1])
-        inter = tf.reduce_sum(y_true_f * y_pred_f, axis=1)
-        union = tf.reduce_sum(y_true_f + y_pred_f, axis=1) - inter
-        iou = tf.where(union > 0, (inter + eps) / (union + eps), tf.ones_like(inter))
-        return tf.reduce_mean(iou)
-
-    def classifier_accuracy_from_logits(y_true, y_pred_logits, threshold=0.5):
-        y_pred_prob = tf.sigmoid(y_pred_logits)
-        y_pred_bin = tf.cast(y_pred_prob > threshold, tf.float32)
-        y_true = tf.reshape(y_true, tf.shape(y_pred_bin))
-        correct = tf.cast(tf.equal(y_true, y_pred_bin), tf.float32)
-        return tf.reduce_mean(correct)
-
-    def conv_block(x, filters, name_prefix=None):
-        x = layers.Conv2D(filters, 3, padding="same", use_bias=False, name=(None if not name_prefix else f"{name_prefix}_conv1"))(x)
-        x = layers.BatchNormalization(name=(None if not name_prefix else f"{name_prefix}_bn1"))(x)
-        x = layers.Activation("relu", name=(None if not name_prefix else f"{name_prefix}_act1"))(x)
-        x = layers.Conv2D(filters, 3, padding="same", use_bias=False, name=(None if not name_prefix else f"{name_prefix}_conv2"))(x)
-        x = layers.BatchNormalization(name=(None if not name_prefix else f"{name_prefix}_bn2"))(x)
-        x = layers.Activation("relu", name=(None if not name_prefix else f"{name_prefix}_act2"))(x)
-        return x
-
-    def build_multihead(load_classifier_ckpt=True):
-        base = tf.keras.applications.EfficientNetB0(weights="imagenet", include_top=False, input_shape=(*IMAGE_SIZE, 3))
-        inputs = base.input
-
-        skip_names = [
-            "block2a_expand_activation",
-            "block3a_expand_activation",
-            "block4a_expand_activation",
-            "block6a_expand_activation",
-        ]
-        skips = []
-        for name in skip_names:
-            try:
-                skips.append(base.get_layer(name).output)
-            except Exception:
-                pass
-        
-        if len(skips) < 4:
-            all_layers = base.layers
-            candidates = [l.output for l in all_layers if isinstance(l.output, tf.Tensor)]
-            skips = candidates[-8:-4] if len(candidates) >= 8 else candidates[:4]
-
-        bottleneck = base.output
-
-        x = layers.GlobalAveragePooling2D(name="global_pool")(bottleneck)
-        x = layers.Dropout(0.3, name="clf_dropout1")(x)
-        x = layers.Dense(256, activation="relu", name="clf_dense1")(x)
-        x = layers.Dropout(0.2, name="clf_dropout2")(x)
-        class_logit = layers.Dense(1, activation=None, dtype="float32", name="class_logit")(x)
-
-        d = layers.Conv2D(256, 1, padding="same", name="dec_conv_in")(bottleneck)
-        d = layers.UpSampling2D(name="dec_up1")(d)
-        if len(skips) >= 1:
-            d = layers.Concatenate(name="dec_cat1")([d, skips[-1]])
-        d = conv_block(d, 256, name_prefix="dec_block1")
-
-        d = layers.UpSampling2D(name="dec_up2")(d)
-        if len(skips) >= 2:
-            d = layers.Concatenate(name="dec_cat2")([d, skips[-2]])
-        d = conv_block(d, 128, name_prefix="dec_block2")
-
-        d = layers.UpSampling2D(name="dec_up3")(d)
-        if len(skips) >= 3:
-            d = layers.Concatenate(name="dec_cat3")([d, skips[-3]])
-        d = conv_block(d, 64, name_prefix="dec_block3")
-
-        d = layers.UpSampling2D(name="dec_up4")(d)
-        if len(skips) >= 4:
-            d = layers.Concatenate(name="dec_cat4")([d, skips[-4]])
-        d = conv_block(d, 32, name_prefix="dec_block4")
-
-        d = layers.UpSampling2D(size=(2,2), name="dec_up_final")(d)
-        mask_logit = layers.Conv2D(1, 1, padding="same", dtype="float32", name="mask_logit")(d)
-
-        model = Model(inputs, [class_logit, mask_logit], name="multihead_model")
-
-        if load_classifier_ckpt and CLASSIFIER_CKPT.exists():
-            print(f"Loading classifier weights from: {CLASSIFIER_CKPT}")
-            try:
-                model.load_weights(str(CLASSIFIER_CKPT), by_name=True, skip_mismatch=True)
-                print("Classifier weights loaded successfully.")
-            except Exception as e:
-                print(f"Warning: Failed to load classifier checkpoint: {e}")
-        else:
-            print("Warning: Classifier checkpoint not found; starting from ImageNet initialization.")
-
-        return model
-
-    def safe_listdir(path: Path):
-        if not path.exists():
-            return []
+def dice_coef_from_logits(y_true, y_pred_logits, eps=1e-6):
+    y_pred = tf.sigmoid(y_pred_logits)
+    y_true_f = tf.reshape(y_true, [tf.shape(y_true)[0], -1])
+    y_pred_f = tf.reshape(y_pred, [tf.shape(y_pred)[0], -1])
+    inter = 2.0 * tf.reduce_sum(y_true_f * y_pred_f, axis=1)
+    union = tf.reduce_sum(y_true_f, axis=1) + tf.reduce_sum(y_pred_f, axis=1) + eps
+    return tf.reduce_mean(inter / union)
+
+def dice_loss_from_logits(y_true, y_pred_logits, eps=1e-6):
+    return 1.0 - dice_coef_from_logits(y_true, y_pred_logits, eps)
+
+def iou_from_logits(y_true, y_pred_logits, eps=1e-6, threshold=0.5):
+    y_pred = tf.sigmoid(y_pred_logits)
+    y_pred_bin = tf.cast(y_pred > threshold, tf.float32)
+    y_true_f = tf.reshape(y_true, [tf.shape(y_true)[0], -1])
+    y_pred_f = tf.reshape(y_pred_bin, [tf.shape(y_pred_bin)[0], -1])
+    inter = tf.reduce_sum(y_true_f * y_pred_f, axis=1)
+    union = tf.reduce_sum(y_true_f + y_pred_f, axis=1) - inter
+    iou = tf.where(union > 0, (inter + eps) / (union + eps), tf.ones_like(inter))
+    return tf.reduce_mean(iou)
+
+def classifier_accuracy_from_logits(y_true, y_pred_logits, threshold=0.5):
+    y_pred_prob = tf.sigmoid(y_pred_logits)
+    y_pred_bin = tf.cast(y_pred_prob > threshold, tf.float32)
+    y_true = tf.reshape(y_true, tf.shape(y_pred_bin))
+    correct = tf.cast(tf.equal(y_true, y_pred_bin), tf.float32)
+    return tf.reduce_mean(correct)
+
+def conv_block(x, filters, name_prefix=None):
+    x = layers.Conv2D(filters, 3, padding="same", use_bias=False, name=(None if not name_prefix else f"{name_prefix}_conv1"))(x)
+    x = layers.BatchNormalization(name=(None if not name_prefix else f"{name_prefix}_bn1"))(x)
+    x = layers.Activation("relu", name=(None if not name_prefix else f"{name_prefix}_act1"))(x)
+    x = layers.Conv2D(filters, 3, padding="same", use_bias=False, name=(None if not name_prefix else f"{name_prefix}_conv2"))(x)
+    x = layers.BatchNormalization(name=(None if not name_prefix else f"{name_prefix}_bn2"))(x)
+    x = layers.Activation("relu", name=(None if not name_prefix else f"{name_prefix}_act2"))(x)
+    return x
+
+def build_multihead(load_classifier_ckpt=True, input_shape=(*IMAGE_SIZE, 3)):
+    base = tf.keras.applications.EfficientNetB0(weights="imagenet", include_top=False, input_shape=input_shape)
+    inputs = base.input
+
+    skip_names = [
+        "block2a_expand_activation",
+        "block3a_expand_activation",
+        "block4a_expand_activation",
+        "block6a_expand_activation",
+    ]
+    skips = []
+    for name in skip_names:
         try:
-            return [p for p in path.iterdir() if p.exists()]
+            skips.append(base.get_layer(name).output)
         except Exception:
-            return []
-
-    def load_datasets():
-        edited_dir = DATASET_DIR / "edited"
-        masks_dir = DATASET_DIR / "masks"
-        originals_dir = DATASET_DIR / "originals"
-
-        if not DATASET_DIR.exists():
-            raise ValueError(f"Dataset directory not found: {DATASET_DIR}")
-
-        triples = []
-        for subdir in safe_listdir(edited_dir):
-            if not subdir.is_dir():
-                continue
-            name = subdir.name
-            orig_sub = originals_dir / name
-            edit_sub = edited_dir / name
-            mask_sub = masks_dir / name
-            if not (orig_sub.exists() and edit_sub.exists() and mask_sub.exists()):
-                continue
-            
-            edit_files = [p for p in edit_sub.iterdir() if p.suffix.lower() in ['.jpg', '.jpeg', '.png']]
-            for efile in edit_files:
-                fname = efile.name
-                o_file = orig_sub / fname
-                m_file = mask_sub / fname
-                if o_file.exists() and m_file.exists():
-                    triples.append((str(o_file), str(efile), str(m_file), name, fname))
-
-        if len(triples) == 0:
-            raise ValueError(
-                f"No paired triples found. Expected structure:\n"
-                f"  {DATASET_DIR}/\n"
-                f"    edited/<subdir>/<image>.jpg\n"
-                f"    masks/<subdir>/<image>.jpg\n"
-                f"    originals/<subdir>/<image>.jpg"
-            )
-
-        print(f"Found {len(triples)} paired image triples.")
-
-        random.seed(42)
-        random.shuffle(triples)
-
-        entries = []
-        for orig_path, edit_path, mask_path, sub, fname in triples:
-            entries.append((orig_path, None, 0.0))
-            entries.append((edit_path, mask_path, 1.0))
+            pass
+    
+    if len(skips) < 4:
+        all_layers = base.layers
+        candidates = [l.output for l in all_layers if isinstance(l.output, tf.Tensor)]
+        skips = candidates[-8:-4] if len(candidates) >= 8 else candidates[:4]
+
+    bottleneck = base.output
+
+    x = layers.GlobalAveragePooling2D(name="global_pool")(bottleneck)
+    x = layers.Dropout(0.3, name="clf_dropout1")(x)
+    x = layers.Dense(256, activation="relu", name="clf_dense1")(x)
+    x = layers.Dropout(0.2, name="clf_dropout2")(x)
+    class_logit = layers.Dense(1, activation=None, dtype="float32", name="class_logit")(x)
+
+    d = layers.Conv2D(256, 1, padding="same", name="dec_conv_in")(bottleneck)
+    d = layers.UpSampling2D(name="dec_up1")(d)
+    if len(skips) >= 1:
+        d = layers.Concatenate(name="dec_cat1")([d, skips[-1]])
+    d = conv_block(d, 256, name_prefix="dec_block1")
+
+    d = layers.UpSampling2D(name="dec_up2")(d)
+    if len(skips) >= 2:
+        d = layers.Concatenate(name="dec_cat2")([d, skips[-2]])
+    d = conv_block(d, 128, name_prefix="dec_block2")
+
+    d = layers.UpSampling2D(name="dec_up3")(d)
+    if len(skips) >= 3:
+        d = layers.Concatenate(name="dec_cat3")([d, skips[-3]])
+    d = conv_block(d, 64, name_prefix="dec_block3")
+
+    d = layers.UpSampling2D(name="dec_up4")(d)
+    if len(skips) >= 4:
+        d = layers.Concatenate(name="dec_cat4")([d, skips[-4]])
+    d = conv_block(d, 32, name_prefix="dec_block4")
+
+    d = layers.UpSampling2D(size=(2,2), name="dec_up_final")(d)
+    mask_logit = layers.Conv2D(1, 1, padding="same", dtype="float32", name="mask_logit")(d)
+
+    model = Model(inputs, [class_logit, mask_logit], name="multihead_model")
+
+    if load_classifier_ckpt and CLASSIFIER_CKPT.exists():
+        print(f"Loading classifier weights from: {CLASSIFIER_CKPT}")
+        try:
+            model.load_weights(str(CLASSIFIER_CKPT), by_name=True, skip_mismatch=True)
+            print("Classifier weights loaded successfully.")
+        except Exception as e:
+            print(f"Warning: Failed to load classifier checkpoint: {e}")
+    else:
+        print("Warning: Classifier checkpoint not found; starting from ImageNet initialization.")
 
-        n_total = len(entries)
-        n_train = int(n_total * TRAIN_SPLIT)
-        n_val = int(n_total * VAL_SPLIT)
+    return model
 
-        train_pairs = entries[:n_train]
-        val_pairs = entries[n_train:n_train + n_val]
-        test_pairs = entries[n_train + n_val:]
+def load_datasets(sources=TAMPER_SOURCES, batch_size=BATCH_SIZE, train_batch_size=None):
+    if not TAMPER_MANIFEST.exists():
+        raise ValueError(f"Tamper manifest not found: {TAMPER_MANIFEST}")
 
-        def load_image_tf(path):
-            img_bytes = tf.io.read_file(path)
-            img = tf.image.decode_image(img_bytes, channels=3, expand_animations=False)
-            img = tf.image.convert_image_dtype(img, tf.float32)
-            img = tf.image.resize(img, IMAGE_SIZE)
-            return img
-        
-        def load_mask_tf(path):
-            is_empty = tf.equal(tf.strings.length(path), 0)
-            def _zero_mask():
-                return tf.zeros((*IMAGE_SIZE, 1), dtype=tf.float32)
-            def _read_mask():
-                mask_bytes = tf.io.read_file(path)
-                mask = tf.image.decode_image(mask_bytes, channels=1, expand_animations=False)
-                mask = tf.image.convert_image_dtype(mask, tf.float32)
-                mask = tf.image.resize(mask, IMAGE_SIZE, method='nearest')
-                mask = tf.cast(mask > 0.5, tf.float32)
-                mask_exp = tf.expand_dims(mask, axis=0)
-                mask_exp = tf.nn.max_pool2d(mask_exp, ksize=3, strides=1, padding="SAME")
-                mask = tf.squeeze(mask_exp, axis=0)
-                return mask
-            return tf.cond(is_empty, _zero_mask, _read_mask)
-
-        def create_dataset(pairs):
-            image_paths = [p[0] for p in pairs]
-            mask_paths = [p[1] if p[1] is not None else '' for p in pairs]
-            class_labels = [p[2] for p in pairs]
-
-            ds = tf.data.Dataset.from_tensor_slices((image_paths, mask_paths, class_labels))
-
-            def _process_tf(img_path, mask_path, cls):
-                img = load_image_tf(img_path)
-                mask = load_mask_tf(mask_path)
-                img.set_shape((*IMAGE_SIZE, 3))
-                mask.set_shape((*IMAGE_SIZE, 1))
-                cls = tf.cast(tf.reshape(cls, (1,)), tf.float32)
-                return img, (cls, mask)
-
-            ds = ds.map(_process_tf, num_parallel_calls=tf.data.AUTOTUNE)
-            return ds
-
-        train_ds_raw = create_dataset(train_pairs)
-        val_ds_raw = create_dataset(val_pairs)
-        test_ds_raw = create_dataset(test_pairs)
-
-        def augment_image_and_mask(image, mask):
-            combined = tf.concat([image, mask], axis=-1)
-            combined = tf.image.random_flip_left_right(combined)
-            k = tf.random.uniform([], minval=0, maxval=4, dtype=tf.int32)
-            combined = tf.image.rot90(combined, k)
-            img_aug = combined[..., :3]
-            mask_aug = combined[..., 3:]
-            img_aug = tf.image.random_contrast(img_aug, lower=0.9, upper=1.1)
-            img_aug = tf.clip_by_value(img_aug, 0.0, 1.0)
-            return img_aug, mask_aug
-
-        def preprocess_train(image, labels):
-            class_label, mask = labels
-            image, mask = augment_image_and_mask(image, mask)
-            image = tf.keras.applications.efficientnet.preprocess_input(image * 255.0)
-            return image, (class_label, mask)
-
-        def preprocess_val(image, labels):
-            class_label, mask = labels
-            image = tf.keras.applications.efficientnet.preprocess_input(image * 255.0)
-            return image, (class_label, mask)
-
-        if CACHE_DIR.exists():
-            for lockfile in CACHE_DIR.glob("*.lockfile"):
-                try:
-                    lockfile.unlink()
-                except Exception:
-                    pass
-        
-        print("Caching training data (this may take a while on first run)...")
-        train_ds = (
-            train_ds_raw
-            .cache(str(CACHE_DIR / "train_cache_raw"))
-            .shuffle(10000)
-            .map(preprocess_train, num_parallel_calls=tf.data.AUTOTUNE)
-            .batch(BATCH_SIZE)
-            .prefetch(tf.data.AUTOTUNE)
-        )
-        print("Training data cache ready.")
+    triples = read_tamper_manifest(TAMPER_MANIFEST, sources=sources)
 
-        val_ds = (
-            val_ds_raw
-            .map(preprocess_val, num_parallel_calls=tf.data.AUTOTUNE)
-            .cache(str(CACHE_DIR / "val_cache"))
-            .batch(BATCH_SIZE)
-            .prefetch(tf.data.AUTOTUNE)
+    if len(triples) == 0:
+        raise ValueError(
+            f"No paired triples found in {TAMPER_MANIFEST}"
+            + (f" for sources {sources}" if sources else "")
         )
 
-        test_ds = (
-            test_ds_raw
-            .map(preprocess_val, num_parallel_calls=tf.data.AUTOTUNE)
-            .cache(str(CACHE_DIR / "test_cache"))
-            .batch(BATCH_SIZE)
+    print(f"Found {len(triples)} paired image triples.")
+
+    random.seed(42)
+    random.shuffle(triples)
+
+    entries = tamper_entries(triples)
+
+    n_total = len(entries)
+    n_train = int(n_total * TRAIN_SPLIT)
+    n_val = int(n_total * VAL_SPLIT)
+
+    train_pairs = entries[:n_train]
+    val_pairs = entries[n_train:n_train + n_val]
+    test_pairs = entries[n_train + n_val:]
+
+    store = open_store("tamper", TAMPER_MANIFEST, IMAGE_SIZE)
+
+    def create_dataset(pairs):
+        return tamper_dataset(pairs, IMAGE_SIZE, store=store)
+
+    val_ds_raw = create_dataset(val_pairs)
+    test_ds_raw = create_dataset(test_pairs)
+
+    # Runs on whole batches: see utils/augment.augment_batch.
+    def preprocess_train(image, labels, seed=None, size=None):
+        class_label, mask = labels
+        if size is not None:
+            # Downscaled from the stored IMAGE_SIZE tensors, never re-decoded.
+            image = tf.image.resize(image, size, antialias=True)
+            mask = tf.image.resize(mask, size, method='nearest')
+        image, mask = augment_batch(image, mask, seed=seed)
+        image = tf.keras.applications.efficientnet.preprocess_input(image * 255.0)
+        return image, (class_label, mask)
+
+    def preprocess_val(image, labels):
+        class_label, mask = labels
+        image = tf.keras.applications.efficientnet.preprocess_input(image * 255.0)
+        return image, (class_label, mask)
+
+    def make_train_ds(epoch=0, skip_steps=0, size=None):
+        # Each epoch reads a fixed permutation of the train pairs and seeds
+        # augmentation by (epoch, step), so any position in the run can be
+        # rebuilt exactly; skipped steps are dropped before decoding.
+        train_batch = train_batch_size or batch_size
+        order = np.random.default_rng(SHUFFLE_SEED + epoch).permutation(len(train_pairs))
+        remaining_steps = max(len(order) // train_batch - skip_steps, 0)
+        # tf.data cannot build from an empty list; take() drops the placeholder.
+        pairs = [train_pairs[i] for i in order[skip_steps * train_batch:]] or train_pairs[:1]
+        epoch_seed = tf.constant(SHUFFLE_SEED + epoch, dtype=tf.int64)
+        return (
+            create_dataset(pairs)
+            .batch(train_batch, drop_remainder=True)
+            .take(remaining_steps)
+            .enumerate(start=skip_steps)
+            .map(lambda step, batch: preprocess_train(*batch, seed=tf.stack([epoch_seed, step]), size=size),
+                 num_parallel_calls=tf.data.AUTOTUNE)
             .prefetch(tf.data.AUTOTUNE)
         )
 
-        print(f"Train/Val/Test sizes: {len(train_pairs)}/{len(val_pairs)}/{len(test_pairs)}")
-        return train_ds, val_ds, test_ds
+    val_ds = (
+        val_ds_raw
+        .map(preprocess_val, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+    test_ds = (
+        test_ds_raw
+        .map(preprocess_val, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(batch_size)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+
+    print(f"Train/Val/Test sizes: {len(train_pairs)}/{len(val_pairs)}/{len(test_pairs)}")
+    return make_train_ds, val_ds, test_ds
+
+class MultiHeadTrainer:
+    def __init__(self, model, lr=LR_FREEZE, strategy=None, accum_steps=ACCUM_STEPS):
+        self.model = model
+        self.strategy = strategy or tf.distribute.get_strategy()
+        self.accum_steps = accum_steps
+        self.lr = lr
+
+        with self.strategy.scope():
+            self.opt = self._build_optimizer()
+            self.metrics = {name: tf.keras.metrics.Mean(name=f"train_{name}") for name in self.METRIC_NAMES}
+        self._clip_norm = 1.0
+        self.evaluator = Evaluator(model, self.compute_loss)
+
+    METRIC_NAMES = ("total_loss", "class_loss", "bce_mask_loss", "dice_loss", "dice_coef", "iou", "acc")
+
+    def reset_metrics(self):
+        for metric in self.metrics.values():
+            metric.reset_state()
+
+    def metric_results(self):
+        return {name: float(metric.result()) for name, metric in self.metrics.items()}
+
+    def _build_optimizer(self):
+        base_opt = None
+        try:
+            if hasattr(optimizers, "AdamW"):
+                base_opt = optimizers.AdamW(learning_rate=self.lr, weight_decay=1e-5)
+                print("Using tf.keras.optimizers.AdamW")
+            elif tfa is not None and hasattr(tfa.optimizers, "AdamW"):
+                base_opt = tfa.optimizers.AdamW(weight_decay=1e-5, learning_rate=self.lr)
+                print("Using tfa.optimizers.AdamW")
+            else:
+                raise AttributeError
+        except Exception:
+            print("Warning: AdamW not available, using Adam instead")
+            base_opt = optimizers.Adam(learning_rate=self.lr)
+        return base_opt
 
-    class MultiHeadTrainer:
-        def __init__(self, model, lr=LR_FREEZE):
-            self.model = model
-            self.ce = losses.BinaryCrossentropy(from_logits=True)
+    def set_lr(self, lr):
+        try:
+            if hasattr(self.opt, "learning_rate"):
+                self.opt.learning_rate = lr
+            elif hasattr(self.opt, "_optimizer"):
+                self.opt._optimizer.learning_rate = lr
             self.lr = lr
+        except Exception:
+            pass
 
-            base_opt = None
-            try:
-                if hasattr(optimizers, "AdamW"):
-                    base_opt = optimizers.AdamW(learning_rate=self.lr, weight_decay=1e-5)
-                    print("Using tf.keras.optimizers.AdamW")
-                elif tfa is not None and hasattr(tfa.optimizers, "AdamW"):
-                    base_opt = tfa.optimizers.AdamW(weight_decay=1e-5, learning_rate=self.lr)
-                    print("Using tfa.optimizers.AdamW")
-                else:
-                    raise AttributeError
-            except Exception:
-                print("Warning: AdamW not available, using Adam instead")
-                base_opt = optimizers.Adam(learning_rate=self.lr)
+    def weighted_bce_from_logits(self, y_true, y_pred_logits, pos_weight=POS_WEIGHT):
+        loss = tf.nn.weighted_cross_entropy_with_logits(
+            labels=y_true, logits=y_pred_logits, pos_weight=pos_weight
+        )
+        return tf.reduce_mean(loss)
 
-            self.opt = base_opt
-            self._clip_norm = 1.0
+    def focal_dice_loss(self, y_true, y_pred_logits, gamma=FOCAL_GAMMA, eps=1e-6):
+        y_pred = tf.sigmoid(y_pred_logits)
+        inter = tf.reduce_sum(y_true * y_pred)
+        union = tf.reduce_sum(y_true) + tf.reduce_sum(y_pred)
+        dice = (2 * inter + eps) / (union + eps)
+        return tf.pow(1 - dice, gamma)
+
+    def compute_loss(self, y_true_class, y_pred_class, y_true_mask, y_pred_mask):
+        # Per-replica means; the cross-replica average is taken on the gradients.
+        # Written out rather than as a Keras loss, whose default reduction
+        # refuses to run inside strategy.run under a multi-worker strategy.
+        class_loss = tf.reduce_mean(tf.nn.sigmoid_cross_entropy_with_logits(
+            labels=tf.cast(y_true_class, y_pred_class.dtype), logits=y_pred_class
+        ))
+        bce_mask = self.weighted_bce_from_logits(y_true_mask, y_pred_mask, pos_weight=POS_WEIGHT)
+        d_loss = self.focal_dice_loss(y_true_mask, y_pred_mask, gamma=FOCAL_GAMMA)
+        mask_loss = bce_mask + d_loss
+        total = class_loss + MASK_LOSS_WEIGHT * mask_loss
+        return total, class_loss, bce_mask, d_loss
+
+    def _replica_step(self, imgs, y_class, y_mask):
+        # The batch holds accum_steps micro-batches; gradients and metrics
+        # are averaged over them in a graph loop before a single update.
+        micro = self.accum_steps
+        variables = self.model.trainable_variables
+        imgs = tf.reshape(imgs, [micro, -1, *imgs.shape[1:]])
+        y_class = tf.reshape(y_class, [micro, -1, *y_class.shape[1:]])
+        y_mask = tf.reshape(y_mask, [micro, -1, *y_mask.shape[1:]])
+
+        grads = [tf.zeros_like(v) for v in variables]
+        stats = tf.zeros([7])
+        for i in tf.range(micro):
+            with tf.GradientTape() as tape:
+                class_logit, mask_logit = self.model(imgs[i], training=True)
+                total_loss, l_class, l_bce_mask, l_dice = self.compute_loss(y_class[i], class_logit, y_mask[i], mask_logit)
+            micro_grads = tape.gradient(total_loss, variables)
+            grads = [g + mg if mg is not None else g for g, mg in zip(grads, micro_grads)]
+            stats += tf.stack([
+                total_loss, l_class, l_bce_mask, l_dice,
+                dice_coef_from_logits(y_mask[i], mask_logit),
+                iou_from_logits(y_mask[i], mask_logit),
+                classifier_accuracy_from_logits(y_class[i], class_logit),
+            ])
+        grads = [g / micro for g in grads]
+
+        grads, _ = tf.clip_by_global_norm(grads, self._clip_norm)
+        # apply_gradients sums gradients across replicas; dividing first
+        # makes that the average while clipping keeps its single-device scale.
+        replicas = self.strategy.num_replicas_in_sync
+        if replicas > 1:
+            grads = [g / replicas for g in grads]
+        self.opt.apply_gradients(zip(grads, variables))
+
+        stats = tf.unstack(stats / micro)
+        for name, value in zip(self.METRIC_NAMES, stats):
+            self.metrics[name].update_state(value)
+        return tuple(stats)
+
+    @tf.function
+    def train_step(self, imgs, y_class, y_mask):
+        """Returns total, class, bce_mask and dice losses plus dice coef,
+        IoU and accuracy, each averaged over replicas."""
+        per_replica = self.strategy.run(self._replica_step, args=(imgs, y_class, y_mask))
+        return tuple(
+            self.strategy.reduce(tf.distribute.ReduceOp.MEAN, value, axis=None)
+            for value in per_replica
+        )
 
-        def set_lr(self, lr):
+    @tf.function
+    def train_steps(self, iterator, steps):
+        """Run up to `steps` steps in one call, stopping early when the
+        iterator is exhausted. Results accumulate in self.metrics; only
+        the number of steps run and the seconds spent waiting for input
+        come back to Python."""
+        ran = tf.constant(0)
+        input_wait = tf.constant(0.0, dtype=tf.float64)
+        for _ in tf.range(steps):
+            # Stateful ops keep program order, so the timestamps bracket the fetch.
+            fetch_start = tf.timestamp()
+            batch = iterator.get_next_as_optional()
+            has_value = batch.has_value()
+            with tf.control_dependencies([has_value]):
+                input_wait += tf.timestamp() - fetch_start
+            if not has_value:
+                break
+            imgs, (y_class, y_mask) = batch.get_value()
+            self.strategy.run(self._replica_step, args=(imgs, y_class, y_mask))
+            ran += 1
+        return ran, input_wait
+
+def run_train_epoch(trainer, train_ds, label, start_step=0, on_chunk=None):
+    """One pass over train_ds in STEPS_PER_EXECUTION chunks. Returns the
+    epoch-mean metrics plus the average step time in milliseconds, split
+    into input wait and compute. Each chunk is logged as a train_steps event.
+    When resuming mid-epoch, train_ds starts at start_step and the metrics
+    restored from the checkpoint are kept. on_chunk(steps) runs after every
+    chunk."""
+    if start_step == 0:
+        trainer.reset_metrics()
+    iterator = iter(train_ds)
+    steps_per_call = tf.constant(STEPS_PER_EXECUTION)
+    steps = start_step
+    next_log = (steps // LOG_EVERY_STEPS + 1) * LOG_EVERY_STEPS
+    total_wait = 0.0
+    start = time.perf_counter()
+    while True:
+        chunk_start = time.perf_counter()
+        ran, input_wait = trainer.train_steps(iterator, steps_per_call)
+        ran, input_wait = int(ran), float(input_wait)
+        chunk_s = time.perf_counter() - chunk_start
+        steps += ran
+        total_wait += input_wait
+        if ran:
+            log_event("train_steps", label=label, step=steps, steps=ran,
+                      step_ms=1000.0 * chunk_s / ran,
+                      input_wait_ms=1000.0 * input_wait / ran,
+                      compute_ms=1000.0 * (chunk_s - input_wait) / ran)
+        if steps >= next_log:
+            running = trainer.metric_results()
+            print(f"{label} step {steps} | loss={running['total_loss']:.4f} | dice_coef={running['dice_coef']:.4f}")
+            next_log += LOG_EVERY_STEPS
+        if ran < STEPS_PER_EXECUTION:
+            break
+        if on_chunk is not None:
+            on_chunk(steps)
+    elapsed = time.perf_counter() - start
+    results = trainer.metric_results()
+    results['steps'] = steps
+    ran_total = max(steps - start_step, 1)
+    results['step_ms'] = 1000.0 * elapsed / ran_total
+    results['input_wait_ms'] = 1000.0 * total_wait / ran_total
+    results['compute_ms'] = results['step_ms'] - results['input_wait_ms']
+    return results
+
+def freeze_classifier_head(model):
+    for layer in model.layers:
+        if layer.name.startswith("clf_") or layer.name == "class_logit" or layer.name == "global_pool":
             try:
-                if hasattr(self.opt, "learning_rate"):
-                    self.opt.learning_rate = lr
-                elif hasattr(self.opt, "_optimizer"):
-                    self.opt._optimizer.learning_rate = lr
-                self.lr = lr
+                layer.trainable = False
             except Exception:
                 pass
+    print("Classifier head frozen")
 
-        def weighted_bce_from_logits(self, y_true, y_pred_logits, pos_weight=8.0):
-            loss = tf.nn.weighted_cross_entropy_with_logits(
-                labels=y_true, logits=y_pred_logits, pos_weight=pos_weight
-            )
-            return tf.reduce_mean(loss)
-
-        def focal_dice_loss(self, y_true, y_pred_logits, gamma=0.5, eps=1e-6):
-            y_pred = tf.sigmoid(y_pred_logits)
-            inter = tf.reduce_sum(y_true * y_pred)
-            union = tf.reduce_sum(y_true) + tf.reduce_sum(y_pred)
-            dice = (2 * inter + eps) / (union + eps)
-            return tf.pow(1 - dice, gamma)
-
-        def compute_loss(self, y_true_class, y_pred_class, y_true_mask, y_pred_mask):
-            class_loss = self.ce(y_true_class, y_pred_class)
-            bce_mask = self.weighted_bce_from_logits(y_true_mask, y_pred_mask)
-            d_loss = self.focal_dice_loss(y_true_mask, y_pred_mask)
-            mask_loss = bce_mask + d_loss
-            total = class_loss + MASK_LOSS_WEIGHT * mask_loss
-            return total, class_loss, bce_mask, d_loss
-
-        @tf.function
-        def train_step(self, imgs, y_class, y_mask):
-            with tf.GradientTape() as tape:
-                class_logit, mask_logit = self.model(imgs, training=True)
-                total_loss, l_class, l_bce_mask, l_dice = self.compute_loss(y_class, class_logit, y_mask, mask_logit)
-            grads = tape.gradient(total_loss, self.model.trainable_variables)
-            grads, _ = tf.clip_by_global_norm(grads, self._clip_norm)
-            self.opt.apply_gradients(zip(grads, self.model.trainable_variables))
-            return total_loss, l_class, l_bce_mask, l_dice, class_logit, mask_logit
-
-    def freeze_classifier_head(model):
-        for layer in model.layers:
-            if layer.name.startswith("clf_") or layer.name == "class_logit" or layer.name == "global_pool":
-                try:
-                    layer.trainable = False
-                except Exception:
-                    pass
-        print("Classifier head frozen")
-
-    def unfreeze_classifier_head(model):
-        for layer in model.layers:
-            if layer.name.startswith("clf_") or layer.name == "class_logit" or layer.name == "global_pool":
-                try:
-                    layer.trainable = True
-                except Exception:
-                    pass
-        print("Classifier head unfrozen")
-
-    def unfreeze_encoder(model, last_n=UNFREEZE_FROM_LAST_N):
-        eff_layers = [layer for layer in model.layers if layer.name.startswith("block") or layer.name.startswith("stem")]
-        if len(eff_layers) == 0:
-            cand = None
-            for layer in model.layers:
-                if hasattr(layer, "layers") and len(layer.layers) > 0:
-                    if cand is None or len(layer.layers) > len(cand.layers):
-                        cand = layer
-            if cand is not None:
-                eff_layers = list(cand.layers)
-        if len(eff_layers) == 0:
-            print("Warning: EfficientNet layers not found for unfreeze")
-            return
-        total = len(eff_layers)
-        start_idx = max(0, total - last_n)
-        for i, layer in enumerate(eff_layers):
-            layer.trainable = (i >= start_idx)
-        print(f"Unfroze {max(0, total - start_idx)} EfficientNet layers out of {total} (from idx {start_idx} to {total})")
-
-    def unfreeze_for_phase2(model, last_n_backbone=40):
-        for layer in model.layers:
-            if layer.name.startswith("dec_") or layer.name in ["mask_logit"]:
+def unfreeze_classifier_head(model):
+    for layer in model.layers:
+        if layer.name.startswith("clf_") or layer.name == "class_logit" or layer.name == "global_pool":
+            try:
                 layer.trainable = True
+            except Exception:
+                pass
+    print("Classifier head unfrozen")
 
+def unfreeze_encoder(model, last_n=UNFREEZE_FROM_LAST_N):
+    eff_layers = [layer for layer in model.layers if layer.name.startswith("block") or layer.name.startswith("stem")]
+    if len(eff_layers) == 0:
+        cand = None
         for layer in model.layers:
-            if layer.name.startswith("clf_") or layer.name == "class_logit":
-                layer.trainable = True
-
-        backbone_layers = [l for l in model.layers if l.name.startswith("block") or l.name.startswith("stem")]
-        total = len(backbone_layers)
-        start_idx = max(0, total - last_n_backbone)
-        for i, layer in enumerate(backbone_layers):
-            layer.trainable = (i >= start_idx)
-
-        print(f"Unfroze decoder + classifier + last {last_n_backbone} backbone layers")
-
-    def evaluate_model(model, dataset, trainer=None):
-        total_losses = []
-        class_losses = []
-        bce_mask_losses = []
-        dice_losses = []
-        dice_coefs = []
-        ious = []
-        accs = []
-
-        for batch in dataset:
-            imgs, (y_class, y_mask) = batch
-            class_logit, mask_logit = model(imgs, training=False)
-            if trainer is not None:
-                total_loss, l_class, l_bce_mask, l_dice = trainer.compute_loss(y_class, class_logit, y_mask, mask_logit)
-            else:
-                l_class = losses.BinaryCrossentropy(from_logits=True)(y_class, class_logit)
-                l_bce_mask = losses.BinaryCrossentropy(from_logits=True)(y_mask, mask_logit)
-                l_dice = dice_loss_from_logits(y_mask, mask_logit)
-                total_loss = l_class + l_bce_mask + l_dice
-
-            total_losses.append(float(total_loss.numpy()))
-            class_losses.append(float(l_class.numpy()))
-            bce_mask_losses.append(float(l_bce_mask.numpy()))
-            dice_losses.append(float(l_dice.numpy()))
-            dice_coefs.append(float(dice_coef_from_logits(y_mask, mask_logit).numpy()))
-            ious.append(float(iou_from_logits(y_mask, mask_logit).numpy()))
-            accs.append(float(classifier_accuracy_from_logits(y_class, class_logit).numpy()))
-
-        return {
-            'total_loss': float(np.mean(total_losses)),
-            'class_loss': float(np.mean(class_losses)),
-            'bce_mask_loss': float(np.mean(bce_mask_losses)),
-            'dice_loss': float(np.mean(dice_losses)),
-            'dice_coef': float(np.mean(dice_coefs)),
-            'iou': float(np.mean(ious)),
-            'acc': float(np.mean(accs))
-        }
-
-    class DiceCheckpointEarlyStop:
-        def __init__(self, filepath: Path, patience=EARLYSTOP_PATIENCE, verbose=True):
-            self.filepath = Path(filepath)
-            self.patience = patience
-            self.verbose = verbose
-            self.best = -np.inf
+            if hasattr(layer, "layers") and len(layer.layers) > 0:
+                if cand is None or len(layer.layers) > len(cand.layers):
+                    cand = layer
+        if cand is not None:
+            eff_layers = list(cand.layers)
+    if len(eff_layers) == 0:
+        print("Warning: EfficientNet layers not found for unfreeze")
+        return
+    total = len(eff_layers)
+    start_idx = max(0, total - last_n)
+    for i, layer in enumerate(eff_layers):
+        layer.trainable = (i >= start_idx)
+    print(f"Unfroze {max(0, total - start_idx)} EfficientNet layers out of {total} (from idx {start_idx} to {total})")
+
+def unfreeze_for_phase2(model, last_n_backbone=40):
+    for layer in model.layers:
+        if layer.name.startswith("dec_") or layer.name in ["mask_logit"]:
+            layer.trainable = True
+
+    for layer in model.layers:
+        if layer.name.startswith("clf_") or layer.name == "class_logit":
+            layer.trainable = True
+
+    backbone_layers = [l for l in model.layers if l.name.startswith("block") or l.name.startswith("stem")]
+    total = len(backbone_layers)
+    start_idx = max(0, total - last_n_backbone)
+    for i, layer in enumerate(backbone_layers):
+        layer.trainable = (i >= start_idx)
+
+    print(f"Unfroze decoder + classifier + last {last_n_backbone} backbone layers")
+
+EVAL_STATS = ("count", "total_loss", "class_loss", "bce_mask_loss", "dice_loss",
+              "correct", "dice_coef", "iou")
+
+def default_eval_loss(y_class, class_logit, y_mask, mask_logit):
+    l_class = losses.BinaryCrossentropy(from_logits=True)(y_class, class_logit)
+    l_bce_mask = losses.BinaryCrossentropy(from_logits=True)(y_mask, mask_logit)
+    l_dice = dice_loss_from_logits(y_mask, mask_logit)
+    return l_class + l_bce_mask + l_dice, l_class, l_bce_mask, l_dice
+
+class Evaluator:
+    """
+    Compiled evaluation. Each batch is reduced in-graph to the sums in
+    EVAL_STATS, so dice and IoU are the mean over images of the per-image
+    values training reports, not an average of per-batch means. Several
+    datasets can be evaluated in one pass: they are tagged and chained, and
+    each batch is added to its dataset's row.
+    """
+    def __init__(self, model, loss_fn=None):
+        self.model = model
+        self.loss_fn = loss_fn or default_eval_loss
+
+    def _batch_stats(self, imgs, y_class, y_mask):
+        class_logit, mask_logit = self.model(imgs, training=False)
+        n = tf.cast(tf.shape(imgs)[0], tf.float32)
+        total_loss, l_class, l_bce_mask, l_dice = self.loss_fn(y_class, class_logit, y_mask, mask_logit)
+
+        class_pred = tf.cast(tf.sigmoid(class_logit) > 0.5, tf.float32)
+        correct = tf.reduce_sum(tf.cast(tf.equal(tf.reshape(y_class, tf.shape(class_pred)), class_pred), tf.float32))
+
+        # Losses, dice and IoU are batch means, so weighting by batch size
+        # makes their sums exact for the pixel/example/image-wise terms even
+        # when the last batch is short.
+        return tf.stack([
+            n, total_loss * n, l_class * n, l_bce_mask * n, l_dice * n,
+            correct,
+            dice_coef_from_logits(y_mask, mask_logit) * n,
+            iou_from_logits(y_mask, mask_logit) * n,
+        ])
+
+    @staticmethod
+    def _tag(dataset, tag):
+        return dataset.map(lambda imgs, labels: (imgs, labels, tf.constant(tag)))
+
+    @tf.function
+    def _accumulate(self, dataset, num_datasets):
+        totals = tf.zeros([num_datasets, len(EVAL_STATS)])
+        for imgs, (y_class, y_mask), tag in dataset:
+            totals = tf.tensor_scatter_nd_add(
+                totals, [[tag]], [self._batch_stats(imgs, y_class, y_mask)]
+            )
+        return totals
+
+    def evaluate(self, datasets):
+        """datasets: name -> batched dataset. Returns name -> metrics."""
+        names = list(datasets)
+        chained = None
+        for tag, name in enumerate(names):
+            tagged = self._tag(datasets[name], tag)
+            chained = tagged if chained is None else chained.concatenate(tagged)
+        totals = self._accumulate(chained.prefetch(tf.data.AUTOTUNE), len(names)).numpy()
+
+        results = {}
+        for name, row in zip(names, totals):
+            s = dict(zip(EVAL_STATS, row.tolist()))
+            count = max(s['count'], 1.0)
+            results[name] = {
+                'total_loss': s['total_loss'] / count,
+                'class_loss': s['class_loss'] / count,
+                'bce_mask_loss': s['bce_mask_loss'] / count,
+                'dice_loss': s['dice_loss'] / count,
+                'dice_coef': s['dice_coef'] / count,
+                'iou': s['iou'] / count,
+                'acc': s['correct'] / count,
+            }
+        return results
+
+def evaluate_datasets(model, datasets, trainer=None):
+    evaluator = trainer.evaluator if trainer is not None else Evaluator(model)
+    return evaluator.evaluate(datasets)
+
+def evaluate_model(model, dataset, trainer=None):
+    return evaluate_datasets(model, {'eval': dataset}, trainer)['eval']
+
+class DiceCheckpointEarlyStop:
+    def __init__(self, filepath: Path, patience=EARLYSTOP_PATIENCE, verbose=True):
+        self.filepath = Path(filepath)
+        self.patience = patience
+        self.verbose = verbose
+        self.best = -np.inf
+        self.wait = 0
+
+    def on_epoch_end(self, epoch, val_dice, model):
+        if val_dice > self.best + 1e-6:
+            self.best = val_dice
             self.wait = 0
-
-        def on_epoch_end(self, epoch, val_dice, model):
-            if val_dice > self.best + 1e-6:
-                self.best = val_dice
-                self.wait = 0
-                model.save_weights(self.filepath)
-                if self.verbose:
-                    print(f"[Checkpoint] Epoch {epoch+1}: val_dice improved to {val_dice:.4f} — saved to {self.filepath}")
-                return False
-            else:
-                self.wait += 1
+            model.save_weights(worker_path(self.filepath))
+            if self.verbose:
+                print(f"[Checkpoint] Epoch {epoch+1}: val_dice improved to {val_dice:.4f} — saved to {self.filepath}")
+            return False
+        else:
+            self.wait += 1
+            if self.verbose:
+                print(f"[Checkpoint] Epoch {epoch+1}: val_dice {val_dice:.4f} (best {self.best:.4f}), wait={self.wait}/{self.patience}")
+            if self.wait >= self.patience:
                 if self.verbose:
-                    print(f"[Checkpoint] Epoch {epoch+1}: val_dice {val_dice:.4f} (best {self.best:.4f}), wait={self.wait}/{self.patience}")
-                if self.wait >= self.patience:
-                    if self.verbose:
-                        print(f"[EarlyStopping] No improvement for {self.patience} epochs. Stopping.")
-                    return True
-                return False
-
-    def train_phase1(trainer, train_ds, val_ds, test_ds):
-        print("Starting Phase 1: segmentation warmup (encoder + decoder trainable, classifier frozen)")
-        freeze_classifier_head(trainer.model)
-        
-        for layer in trainer.model.layers:
-            if layer.name.startswith("block") or layer.name.startswith("stem"):
-                try:
-                    layer.trainable = True
-                except Exception:
-                    pass
-
-        trainer.set_lr(LR_FREEZE)
-        ckpt = DiceCheckpointEarlyStop(BEST_PHASE1, patience=EARLYSTOP_PATIENCE)
-
-        history = {
-            'train_total_loss': [], 'train_class_loss': [], 'train_bce_mask_loss': [], 'train_dice_loss': [],
-            'train_dice_coef': [], 'val_total_loss': [], 'val_class_loss': [], 'val_bce_mask_loss': [], 
-            'val_dice_loss': [], 'val_dice_coef': [], 'val_iou': [], 'val_acc': []
-        }
-
-        for epoch in range(FREEZE_EPOCHS):
-            epoch_train_losses = []
-            epoch_train_class = []
-            epoch_train_bce = []
-            epoch_train_dice = []
-            epoch_train_dicecoef = []
-            epoch_train_iou = []
-            epoch_train_acc = []
-
-            for imgs, (y_class, y_mask) in train_ds:
-                loss, lc, lb, ld, class_logit, mask_logit = trainer.train_step(imgs, y_class, y_mask)
-                epoch_train_losses.append(float(loss.numpy()))
-                epoch_train_class.append(float(lc.numpy()))
-                epoch_train_bce.append(float(lb.numpy()))
-                epoch_train_dice.append(float(ld.numpy()))
-                epoch_train_dicecoef.append(float(dice_coef_from_logits(y_mask, mask_logit).numpy()))
-                epoch_train_iou.append(float(iou_from_logits(y_mask, mask_logit).numpy()))
-                epoch_train_acc.append(float(classifier_accuracy_from_logits(y_class, class_logit).numpy()))
-
-            avg_train_loss = float(np.mean(epoch_train_losses))
-            avg_train_class = float(np.mean(epoch_train_class))
-            avg_train_bce = float(np.mean(epoch_train_bce))
-            avg_train_dice = float(np.mean(epoch_train_dice))
-            avg_train_dicecoef = float(np.mean(epoch_train_dicecoef))
-            avg_train_iou = float(np.mean(epoch_train_iou))
-            avg_train_acc = float(np.mean(epoch_train_acc))
-
-            val_results = evaluate_model(trainer.model, val_ds, trainer)
-
-            history['train_total_loss'].append(avg_train_loss)
-            history['train_class_loss'].append(avg_train_class)
-            history['train_bce_mask_loss'].append(avg_train_bce)
-            history['train_dice_loss'].append(avg_train_dice)
-            history['train_dice_coef'].append(avg_train_dicecoef)
-            history['val_total_loss'].append(val_results['total_loss'])
-            history['val_class_loss'].append(val_results['class_loss'])
-            history['val_bce_mask_loss'].append(val_results['bce_mask_loss'])
-            history['val_dice_loss'].append(val_results['dice_loss'])
-            history['val_dice_coef'].append(val_results['dice_coef'])
-            history['val_iou'].append(val_results['iou'])
-            history['val_acc'].append(val_results['acc'])
-
-            print(f"Phase1 Epoch {epoch+1}/{FREEZE_EPOCHS} | train_loss={avg_train_loss:.4f} | train_dice_coef={avg_train_dicecoef:.4f} | val_dice={val_results['dice_coef']:.4f} | val_iou={val_results['iou']:.4f} | val_acc={val_results['acc']:.4f}")
-
-            stop = ckpt.on_epoch_end(epoch, val_results['dice_coef'], trainer.model)
-            if stop:
-                print("Early stopping triggered in Phase 1")
-                break
-
-        trainer.model.save_weights(MODEL_SAVE_DIR / "multihead_phase1_frozen_last.h5")
-        test_results = evaluate_model(trainer.model, test_ds, trainer)
-        print(f"\nPhase 1 Test Results:")
-        print(f"Test Loss: {test_results['total_loss']:.4f} | Class Loss: {test_results['class_loss']:.4f} | "
-            f"BCE Mask Loss: {test_results['bce_mask_loss']:.4f} | Dice Loss: {test_results['dice_loss']:.4f} | "
-            f"Dice Coef: {test_results['dice_coef']:.4f} | IoU: {test_results['iou']:.4f} | Acc: {test_results['acc']:.4f}")
-
-        plot_multihead_history(history, phase_name="phase1")
-        return history
-
-    def train_phase2(trainer, train_ds, val_ds, test_ds):
-        print("Starting Phase 2: fine-tune full model (unfreeze encoder + classifier head)")
-        unfreeze_classifier_head(trainer.model)
-        unfreeze_for_phase2(trainer.model, last_n_backbone=40)
-
-        trainer.set_lr(LR_UNFREEZE)
-        ckpt = DiceCheckpointEarlyStop(BEST_PHASE2, patience=EARLYSTOP_PATIENCE)
-
-        history = {
-            'train_total_loss': [], 'train_class_loss': [], 'train_bce_mask_loss': [], 'train_dice_loss': [],
-            'train_dice_coef': [], 'val_total_loss': [], 'val_class_loss': [], 'val_bce_mask_loss': [], 
-            'val_dice_loss': [], 'val_dice_coef': [], 'val_iou': [], 'val_acc': []
-        }
-
-        for epoch in range(EPOCHS_UNFREEZE):
-            epoch_train_losses = []
-            epoch_train_class = []
-            epoch_train_bce = []
-            epoch_train_dice = []
-            epoch_train_dicecoef = []
-            epoch_train_iou = []
-            epoch_train_acc = []
-
-            for imgs, (y_class, y_mask) in train_ds:
-                loss, lc, lb, ld, class_logit, mask_logit = trainer.train_step(imgs, y_class, y_mask)
-                epoch_train_losses.append(float(loss.numpy()))
-                epoch_train_class.append(float(lc.numpy()))
-                epoch_train_bce.append(float(lb.numpy()))
-                epoch_train_dice.append(float(ld.numpy()))
-                epoch_train_dicecoef.append(float(dice_coef_from_logits(y_mask, mask_logit).numpy()))
-                epoch_train_iou.append(float(iou_from_logits(y_mask, mask_logit).numpy()))
-                epoch_train_acc.append(float(classifier_accuracy_from_logits(y_class, class_logit).numpy()))
-
-            avg_train_loss = float(np.mean(epoch_train_losses))
-            avg_train_class = float(np.mean(epoch_train_class))
-            avg_train_bce = float(np.mean(epoch_train_bce))
-            avg_train_dice = float(np.mean(epoch_train_dice))
-            avg_train_dicecoef = float(np.mean(epoch_train_dicecoef))
-
-            val_results = evaluate_model(trainer.model, val_ds, trainer)
-
-            history['train_total_loss'].append(avg_train_loss)
-            history['train_class_loss'].append(avg_train_class)
-            history['train_bce_mask_loss'].append(avg_train_bce)
-            history['train_dice_loss'].append(avg_train_dice)
-            history['train_dice_coef'].append(avg_train_dicecoef)
-            history['val_total_loss'].append(val_results['total_loss'])
-            history['val_class_loss'].append(val_results['class_loss'])
-            history['val_bce_mask_loss'].append(val_results['bce_mask_loss'])
-            history['val_dice_loss'].append(val_results['dice_loss'])
-            history['val_dice_coef'].append(val_results['dice_coef'])
-            history['val_iou'].append(val_results['iou'])
-            history['val_acc'].append(val_results['acc'])
-
-            print(f"Phase2 Epoch {epoch+1}/{EPOCHS_UNFREEZE} | train_loss={avg_train_loss:.4f} | train_dice_coef={avg_train_dicecoef:.4f} | val_dice={val_results['dice_coef']:.4f} | val_iou={val_results['iou']:.4f}")
-
-            stop = ckpt.on_epoch_end(epoch, val_results['dice_coef'], trainer.model)
-            if stop:
-                print("Early stopping triggered in Phase 2")
-                break
-
-        trainer.model.save_weights(MODEL_SAVE_DIR / "multihead_phase2_finetuned_last.h5")
-        test_results = evaluate_model(trainer.model, test_ds, trainer)
-        print(f"\nPhase 2 Test Results:")
-        print(f"Test Loss: {test_results['total_loss']:.4f} | Class Loss: {test_results['class_loss']:.4f} | "
-            f"BCE Mask Loss: {test_results['bce_mask_loss']:.4f} | Dice Loss: {test_results['dice_loss']:.4f} | "
-            f"Dice Coef: {test_results['dice_coef']:.4f} | IoU: {test_results['iou']:.4f} | Acc: {test_results['acc']:.4f}")
-
-        plot_multihead_history(history, phase_name="phase2")
-        return history
-
-    def main():
-        parser = argparse.ArgumentParser(description="Train multi-head tamper localization model")
-        parser.add_argument("phase", choices=["1", "2"], help="Training phase: 1 (segmentation warmup) or 2 (full fine-tune)")
-        args = parser.parse_args()
+                    print(f"[EarlyStopping] No improvement for {self.patience} epochs. Stopping.")
+                return True
+            return False
+
+class TrainingState:
+    """
+    Everything needed to continue a phase after preemption: model,
+    optimizer slots, the running train metrics, epoch and step within it,
+    and the early-stop counters. The data order and augmentation are pure
+    functions of (SHUFFLE_SEED, epoch, step), so the position is enough to
+    rebuild the input pipeline. History goes to a JSON file next to the
+    checkpoints.
+
+    directory is the chief's resume directory. Every worker restores from
+    it, so all of them continue from the same epoch and step; non-chief
+    workers only save to their worker_path() copy.
+
+    Checkpoints are written asynchronously where TensorFlow supports it:
+    variables are copied and training continues while they are written.
+    """
+    def __init__(self, trainer, early_stop, directory: Path):
+        self.early_stop = early_stop
+        self.directory = Path(directory)
+        self.save_directory = worker_path(self.directory)
+        self.epoch = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.step = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.best = tf.Variable(-np.inf, dtype=tf.float64, trainable=False)
+        self.wait = tf.Variable(0, dtype=tf.int64, trainable=False)
+        self.checkpoint = tf.train.Checkpoint(
+            model=trainer.model, optimizer=trainer.opt,
+            epoch=self.epoch, step=self.step, best=self.best, wait=self.wait,
+            **{f"train_{name}": metric for name, metric in trainer.metrics.items()},
+        )
+        self.manager = tf.train.CheckpointManager(
+            self.checkpoint, str(self.save_directory), max_to_keep=CHECKPOINTS_TO_KEEP
+        )
+        try:
+            self.options = tf.train.CheckpointOptions(experimental_enable_async_checkpoint=True)
+        except TypeError:
+            self.options = tf.train.CheckpointOptions()
+        self.last_saved_step = 0
+
+    @property
+    def history_path(self):
+        return self.directory / "history.json"
+
+    @property
+    def save_history_path(self):
+        return self.save_directory / "history.json"
+
+    def save(self, epoch, step, history):
+        self.epoch.assign(epoch)
+        self.step.assign(step)
+        self.best.assign(self.early_stop.best)
+        self.wait.assign(self.early_stop.wait)
+        self.save_directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.save_history_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(history, f)
+        os.replace(tmp, self.save_history_path)
+        path = self.manager.save(options=self.options)
+        self.last_saved_step = step
+        print(f"[Resume] Saved epoch {epoch + 1} step {step} to {path}")
+
+    def maybe_save(self, epoch, step, history):
+        if step - self.last_saved_step >= CHECKPOINT_EVERY_STEPS:
+            self.save(epoch, step, history)
+
+    def restore(self, history):
+        """Load the latest checkpoint. Returns (epoch, step, history), or
+        the starting values if there is nothing to resume."""
+        latest = tf.train.latest_checkpoint(str(self.directory))
+        if latest is None:
+            print(f"[Resume] No checkpoint in {self.directory}; starting from scratch")
+            return 0, 0, history
+        self.checkpoint.restore(latest)
+        epoch, step = int(self.epoch.numpy()), int(self.step.numpy())
+        self.early_stop.best = float(self.best.numpy())
+        self.early_stop.wait = int(self.wait.numpy())
+        self.last_saved_step = step
+        if self.history_path.exists():
+            with open(self.history_path) as f:
+                saved = json.load(f)
+            # The JSON is written before the checkpoint finishes, so it may
+            # hold one more epoch than the checkpoint.
+            history = {key: values[:epoch] for key, values in saved.items()}
+        print(f"[Resume] Restored {latest}: epoch {epoch + 1}, step {step}, "
+              f"best val_dice {self.early_stop.best:.4f}, wait {self.early_stop.wait}")
+        return epoch, step, history
+
+    def sync(self):
+        if hasattr(self.checkpoint, "sync"):
+            self.checkpoint.sync()
+
+def resolution_for_epoch(epoch, total_epochs):
+    size = PROGRESSIVE_SCHEDULE[0][1]
+    for start_fraction, stage_size in PROGRESSIVE_SCHEDULE:
+        if epoch >= start_fraction * total_epochs:
+            size = stage_size
+    return (size, size)
+
+def report_time_to_best(history, phase_name):
+    if not history['val_dice_coef']:
+        return
+    best_epoch = int(np.argmax(history['val_dice_coef']))
+    print(f"{phase_name}: best val_dice {history['val_dice_coef'][best_epoch]:.4f} at epoch {best_epoch+1}, "
+          f"{history['elapsed_s'][best_epoch] / 60:.1f} min of training")
+    history_path = worker_path(LOG_DIR / f"history_{phase_name.lower().replace(' ', '')}_{TIMESTAMP}.json")
+    with open(history_path, "w") as f:
+        json.dump(history, f, indent=2)
+    print(f"History saved to: {history_path} (compare runs with scripts/compare_time_to_dice.py)")
+
+def train_phase1(trainer, train_data, val_ds, test_ds, resume=False, progressive=False):
+    print("Starting Phase 1: segmentation warmup (encoder + decoder trainable, classifier frozen)")
+    freeze_classifier_head(trainer.model)
+    
+    for layer in trainer.model.layers:
+        if layer.name.startswith("block") or layer.name.startswith("stem"):
+            try:
+                layer.trainable = True
+            except Exception:
+                pass
 
-        train_ds, val_ds, test_ds = load_datasets()
-        model = build_multihead()
+    trainer.set_lr(LR_FREEZE)
+    ckpt = DiceCheckpointEarlyStop(BEST_PHASE1, patience=EARLYSTOP_PATIENCE)
+    state = TrainingState(trainer, ckpt, RESUME_DIR / "phase1")
+
+    history = {
+        'train_total_loss': [], 'train_class_loss': [], 'train_bce_mask_loss': [], 'train_dice_loss': [],
+        'train_dice_coef': [], 'val_total_loss': [], 'val_class_loss': [], 'val_bce_mask_loss': [], 
+        'val_dice_loss': [], 'val_dice_coef': [], 'val_iou': [], 'val_acc': [],
+        'train_resolution': [], 'elapsed_s': []
+    }
+    start_epoch, start_step, history = state.restore(history) if resume else (0, 0, history)
+    # Wall-clock training time, carried over when resuming.
+    phase_start = time.perf_counter() - (history['elapsed_s'][-1] if history['elapsed_s'] else 0.0)
+
+    for epoch in range(start_epoch, FREEZE_EPOCHS):
+        if ckpt.wait >= ckpt.patience:
+            print("Early stopping already triggered before the checkpoint")
+            break
+        skip = start_step if epoch == start_epoch else 0
+        size = resolution_for_epoch(epoch, FREEZE_EPOCHS) if progressive else IMAGE_SIZE
+        if progressive:
+            print(f"Phase1 Epoch {epoch+1}: training at {size[0]}x{size[1]}")
+        train_results = run_train_epoch(
+            trainer, train_data(epoch, skip, size), f"Phase1 Epoch {epoch+1}", start_step=skip,
+            on_chunk=lambda steps: state.maybe_save(epoch, steps, history),
+        )
+        avg_train_loss = train_results['total_loss']
+        avg_train_class = train_results['class_loss']
+        avg_train_bce = train_results['bce_mask_loss']
+        avg_train_dice = train_results['dice_loss']
+        avg_train_dicecoef = train_results['dice_coef']
+
+        val_results = evaluate_model(trainer.model, val_ds, trainer)
+
+        history['train_total_loss'].append(avg_train_loss)
+        history['train_class_loss'].append(avg_train_class)
+        history['train_bce_mask_loss'].append(avg_train_bce)
+        history['train_dice_loss'].append(avg_train_dice)
+        history['train_dice_coef'].append(avg_train_dicecoef)
+        history['val_total_loss'].append(val_results['total_loss'])
+        history['val_class_loss'].append(val_results['class_loss'])
+        history['val_bce_mask_loss'].append(val_results['bce_mask_loss'])
+        history['val_dice_loss'].append(val_results['dice_loss'])
+        history['val_dice_coef'].append(val_results['dice_coef'])
+        history['val_iou'].append(val_results['iou'])
+        history['val_acc'].append(val_results['acc'])
+        history['train_resolution'].append(size[0])
+        history['elapsed_s'].append(time.perf_counter() - phase_start)
+        log_event("epoch", phase=1, epoch=epoch + 1, lr=trainer.lr, resolution=size[0],
+                  elapsed_s=history['elapsed_s'][-1], train=train_results, val=val_results)
+
+        print(f"Phase1 Epoch {epoch+1}/{FREEZE_EPOCHS} | train_loss={avg_train_loss:.4f} | train_dice_coef={avg_train_dicecoef:.4f} | val_dice={val_results['dice_coef']:.4f} | val_iou={val_results['iou']:.4f} | val_acc={val_results['acc']:.4f} | step={train_results['step_ms']:.1f}ms (input wait {train_results['input_wait_ms']:.1f}ms)")
+
+        stop = ckpt.on_epoch_end(epoch, val_results['dice_coef'], trainer.model)
+        state.save(epoch + 1, 0, history)
+        if stop:
+            print("Early stopping triggered in Phase 1")
+            break
+
+    state.sync()
+    report_time_to_best(history, "Phase 1")
+
+    trainer.model.save_weights(worker_path(MODEL_SAVE_DIR / "multihead_phase1_frozen_last.h5"))
+    final = evaluate_datasets(trainer.model, {'val': val_ds, 'test': test_ds}, trainer)
+    test_results = final['test']
+    print(f"\nPhase 1 final val: Dice Coef: {final['val']['dice_coef']:.4f} | IoU: {final['val']['iou']:.4f} | Acc: {final['val']['acc']:.4f}")
+    print(f"\nPhase 1 Test Results:")
+    print(f"Test Loss: {test_results['total_loss']:.4f} | Class Loss: {test_results['class_loss']:.4f} | "
+        f"BCE Mask Loss: {test_results['bce_mask_loss']:.4f} | Dice Loss: {test_results['dice_loss']:.4f} | "
+        f"Dice Coef: {test_results['dice_coef']:.4f} | IoU: {test_results['iou']:.4f} | Acc: {test_results['acc']:.4f}")
+    return history
+
+def train_phase2(trainer, train_data, val_ds, test_ds, resume=False, progressive=False):
+    print("Starting Phase 2: fine-tune full model (unfreeze encoder + classifier head)")
+    unfreeze_classifier_head(trainer.model)
+    unfreeze_for_phase2(trainer.model, last_n_backbone=40)
+
+    trainer.set_lr(LR_UNFREEZE)
+    ckpt = DiceCheckpointEarlyStop(BEST_PHASE2, patience=EARLYSTOP_PATIENCE)
+    state = TrainingState(trainer, ckpt, RESUME_DIR / "phase2")
+
+    history = {
+        'train_total_loss': [], 'train_class_loss': [], 'train_bce_mask_loss': [], 'train_dice_loss': [],
+        'train_dice_coef': [], 'val_total_loss': [], 'val_class_loss': [], 'val_bce_mask_loss': [], 
+        'val_dice_loss': [], 'val_dice_coef': [], 'val_iou': [], 'val_acc': [],
+        'train_resolution': [], 'elapsed_s': []
+    }
+    start_epoch, start_step, history = state.restore(history) if resume else (0, 0, history)
+    # Wall-clock training time, carried over when resuming.
+    phase_start = time.perf_counter() - (history['elapsed_s'][-1] if history['elapsed_s'] else 0.0)
+
+    for epoch in range(start_epoch, EPOCHS_UNFREEZE):
+        if ckpt.wait >= ckpt.patience:
+            print("Early stopping already triggered before the checkpoint")
+            break
+        skip = start_step if epoch == start_epoch else 0
+        size = resolution_for_epoch(epoch, EPOCHS_UNFREEZE) if progressive else IMAGE_SIZE
+        if progressive:
+            print(f"Phase2 Epoch {epoch+1}: training at {size[0]}x{size[1]}")
+        train_results = run_train_epoch(
+            trainer, train_data(epoch, skip, size), f"Phase2 Epoch {epoch+1}", start_step=skip,
+            on_chunk=lambda steps: state.maybe_save(epoch, steps, history),
+        )
+        avg_train_loss = train_results['total_loss']
+        avg_train_class = train_results['class_loss']
+        avg_train_bce = train_results['bce_mask_loss']
+        avg_train_dice = train_results['dice_loss']
+        avg_train_dicecoef = train_results['dice_coef']
+
+        val_results = evaluate_model(trainer.model, val_ds, trainer)
+
+        history['train_total_loss'].append(avg_train_loss)
+        history['train_class_loss'].append(avg_train_class)
+        history['train_bce_mask_loss'].append(avg_train_bce)
+        history['train_dice_loss'].append(avg_train_dice)
+        history['train_dice_coef'].append(avg_train_dicecoef)
+        history['val_total_loss'].append(val_results['total_loss'])
+        history['val_class_loss'].append(val_results['class_loss'])
+        history['val_bce_mask_loss'].append(val_results['bce_mask_loss'])
+        history['val_dice_loss'].append(val_results['dice_loss'])
+        history['val_dice_coef'].append(val_results['dice_coef'])
+        history['val_iou'].append(val_results['iou'])
+        history['val_acc'].append(val_results['acc'])
+        history['train_resolution'].append(size[0])
+        history['elapsed_s'].append(time.perf_counter() - phase_start)
+        log_event("epoch", phase=2, epoch=epoch + 1, lr=trainer.lr, resolution=size[0],
+                  elapsed_s=history['elapsed_s'][-1], train=train_results, val=val_results)
+
+        print(f"Phase2 Epoch {epoch+1}/{EPOCHS_UNFREEZE} | train_loss={avg_train_loss:.4f} | train_dice_coef={avg_train_dicecoef:.4f} | val_dice={val_results['dice_coef']:.4f} | val_iou={val_results['iou']:.4f} | step={train_results['step_ms']:.1f}ms (input wait {train_results['input_wait_ms']:.1f}ms)")
+
+        stop = ckpt.on_epoch_end(epoch, val_results['dice_coef'], trainer.model)
+        state.save(epoch + 1, 0, history)
+        if stop:
+            print("Early stopping triggered in Phase 2")
+            break
+
+    state.sync()
+    report_time_to_best(history, "Phase 2")
+
+    trainer.model.save_weights(worker_path(MODEL_SAVE_DIR / "multihead_phase2_finetuned_last.h5"))
+    final = evaluate_datasets(trainer.model, {'val': val_ds, 'test': test_ds}, trainer)
+    test_results = final['test']
+    print(f"\nPhase 2 final val: Dice Coef: {final['val']['dice_coef']:.4f} | IoU: {final['val']['iou']:.4f} | Acc: {final['val']['acc']:.4f}")
+    print(f"\nPhase 2 Test Results:")
+    print(f"Test Loss: {test_results['total_loss']:.4f} | Class Loss: {test_results['class_loss']:.4f} | "
+        f"BCE Mask Loss: {test_results['bce_mask_loss']:.4f} | Dice Loss: {test_results['dice_loss']:.4f} | "
+        f"Dice Coef: {test_results['dice_coef']:.4f} | IoU: {test_results['iou']:.4f} | Acc: {test_results['acc']:.4f}")
+    return history
+
+def apply_overrides(pairs):
+    """NAME=VALUE strings; each value takes the type of the constant it replaces."""
+    overrides = {}
+    for pair in pairs:
+        name, _, value = pair.partition("=")
+        if name not in TUNABLE:
+            raise ValueError(f"{name} cannot be overridden; choose from {TUNABLE}")
+        current = globals()[name]
+        overrides[name] = int(float(value)) if isinstance(current, int) else type(current)(value)
+    globals().update(overrides)
+    for name, value in overrides.items():
+        print(f"Override: {name} = {value}")
+    return overrides
+
+def set_output_dir(output_dir):
+    """Keep checkpoints, resume state, histories and the log of this run under output_dir."""
+    global MODEL_SAVE_DIR, CHECKPOINT_DIR, BEST_PHASE1, BEST_PHASE2, RESUME_DIR, LOG_DIR
+    MODEL_SAVE_DIR = CHECKPOINT_DIR = Path(output_dir)
+    BEST_PHASE1 = CHECKPOINT_DIR / "best_phase1_dice.h5"
+    BEST_PHASE2 = CHECKPOINT_DIR / "best_phase2_dice.h5"
+    RESUME_DIR = CHECKPOINT_DIR / "resume"
+    LOG_DIR = CHECKPOINT_DIR / "logs"
+
+def train(args, strategy):
+    overrides = apply_overrides(args.set)
+    MODEL_SAVE_DIR.mkdir(parents=True, exist_ok=True)
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+    # BATCH_SIZE stays per replica; each worker takes its share of the global batch.
+    global_batch = BATCH_SIZE * strategy.num_replicas_in_sync
+    print(f"Effective batch size: {global_batch * args.accum_steps} "
+          f"({BATCH_SIZE} x {args.accum_steps} micro-batches x {strategy.num_replicas_in_sync} replicas)")
+    make_train_ds, val_ds, test_ds = load_datasets(
+        args.sources, batch_size=global_batch, train_batch_size=global_batch * args.accum_steps
+    )
+
+    def train_data(epoch, skip_steps=0, size=IMAGE_SIZE):
+        size = None if tuple(size) == IMAGE_SIZE else size
+        return strategy.experimental_distribute_dataset(shard_by_data(make_train_ds(epoch, skip_steps, size)))
+
+    with strategy.scope():
+        # Progressive runs feed several resolutions to one model.
+        model = build_multihead(input_shape=(None, None, 3) if args.progressive else (*IMAGE_SIZE, 3))
 
         if args.phase == "2":
-            if BEST_PHASE1.exists():
-                print(f"Loading Phase 1 checkpoint: {BEST_PHASE1}")
-                model.load_weights(str(BEST_PHASE1), by_name=True, skip_mismatch=True)
+            if args.init_from.exists():
+                print(f"Loading Phase 1 checkpoint: {args.init_from}")
+                model.load_weights(str(args.init_from), by_name=True, skip_mismatch=True)
             else:
-                print("Warning: Phase 1 checkpoint not found. Starting from scratch.")
-
-        trainer = MultiHeadTrainer(model, lr=LR_FREEZE)
+                print(f"Warning: Phase 1 checkpoint not found ({args.init_from}). Starting from scratch.")
 
-        if args.phase == "1":
-            train_phase1(trainer, train_ds, val_ds, test_ds)
-        else:
-            train_phase2(trainer, train_ds, val_ds, test_ds)
+    trainer = MultiHeadTrainer(model, lr=LR_FREEZE, strategy=strategy, accum_steps=args.accum_steps)
 
-        print("Training completed.")
+    if args.phase == "1":
+        history = train_phase1(trainer, train_data, val_ds, test_ds, resume=args.resume, progressive=args.progressive)
+    else:
+        history = train_phase2(trainer, train_data, val_ds, test_ds, resume=args.resume, progressive=args.progressive)
+
+    if args.result is not None and is_chief():
+        with open(args.result, "w") as f:
+            json.dump({
+                "phase": args.phase,
+                "overrides": overrides,
+                "epochs": len(history['val_dice_coef']),
+                "best_val_dice": max(history['val_dice_coef'], default=None),
+                "elapsed_s": history['elapsed_s'][-1] if history['elapsed_s'] else 0.0,
+                "history": history,
+            }, f, indent=2)
+
+    print("Training completed.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Train multi-head tamper localization model")
+    parser.add_argument("phase", choices=["1", "2"], help="Training phase: 1 (segmentation warmup) or 2 (full fine-tune)")
+    parser.add_argument("--sources", nargs="+", default=TAMPER_SOURCES, help="Only train on these manifest sources (e.g. IMD2020 coco)")
+    parser.add_argument("--accum-steps", type=int, default=ACCUM_STEPS, help="Micro-batches of BATCH_SIZE accumulated per optimizer step")
+    parser.add_argument("--resume", action="store_true", help="Continue the phase from its latest checkpoint in RESUME_DIR")
+    parser.add_argument("--progressive", action="store_true", help="Ramp the train resolution up through PROGRESSIVE_SCHEDULE")
+    parser.add_argument("--set", nargs="+", default=[], metavar="NAME=VALUE", help=f"Override constants: {', '.join(TUNABLE)}")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Write checkpoints, histories and the log here instead of MODEL_SAVE_DIR")
+    parser.add_argument("--init-from", type=Path, default=PHASE1_INIT, help="Phase 1 weights that phase 2 starts from")
+    parser.add_argument("--result", type=Path, default=None, help="Write the phase's history and best val dice to this JSON file")
+    parser.add_argument("--no-live-report", action="store_true", help="Do not render the HTML training report while training")
+    args = parser.parse_args()
+
+    # With TF_CONFIG set this joins the worker cluster, which has to happen
+    # before any other TF op; otherwise it is the default single-device strategy.
+    strategy = get_strategy()
+    if args.output_dir is not None:
+        set_output_dir(args.output_dir)
+
+    # Logging starts here rather than at import, so scripts that load this
+    # module for its builders do not write into the training log. Every
+    # worker runs this; only the chief writes to the shared log.
+    log_path = worker_path(LOG_DIR / "logs" / TRAINING_LOG_FILENAME)
+    live_report = is_chief() and not args.no_live_report
+    with file_logging(log_dir=log_path.parent, log_filename=log_path.name, subdirectory="", live_report=live_report):
+        print_device_info()
+        train(args, strategy)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,292 @@
+import sys
+import os
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pathlib import Path
+import argparse
+import json
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras import optimizers
+from tensorflow.keras.applications.efficientnet import preprocess_input
+
+from api.config import CLASSIFIER_CKPT, LOCALIZATION_CKPT
+from api.models import (
+    STUDENT_BACKBONES,
+    build_classifier_model,
+    build_localization_model,
+    load_classifier_model,
+    load_localization_model,
+)
+from utils.datasets import classification_dataset, tamper_dataset, tamper_entries
+from utils.logger import file_logging
+from utils.manifests import DATASET_MANIFEST, TAMPER_MANIFEST, read_dataset_manifest, read_tamper_manifest
+from utils.shard_store import open_store
+from utils.splits import CLASSIFICATION_SPLIT, split_records
+
+TIMESTAMP = datetime.now().strftime('%Y%m%d')
+
+IMAGE_SIZE = (224, 224)
+BATCH_SIZE = 16
+EPOCHS = 30
+LR = 1e-4
+WEIGHT_DECAY = 1e-5
+TEMPERATURE = 2.0
+# Share of the loss taken by the teacher's soft targets; the rest is the usual
+# supervised loss against labels / ground-truth masks.
+DISTILL_ALPHA = 0.7
+POS_WEIGHT = 8.0
+EARLYSTOP_PATIENCE = 5
+TRAIN_SPLIT = 0.7
+VAL_SPLIT = 0.15
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+INFERENCE_ROOT = SCRIPT_DIR.parent
+
+OUTPUT_DIRS = {
+    "classifier": INFERENCE_ROOT / "core/models/ai_detection",
+    "localization": INFERENCE_ROOT / "core/models/tamper_localization",
+}
+
+
+def classification_datasets():
+    # Same split as train_classification_phase2.py so the test set is shared.
+    records = read_dataset_manifest()
+    train_records, val_records, test_records = split_records(CLASSIFICATION_SPLIT, records, 0.8, 0.1)
+    store = open_store("classification", DATASET_MANIFEST, IMAGE_SIZE)
+    train_ds = classification_dataset(train_records, IMAGE_SIZE, store=store)
+    val_ds = classification_dataset(val_records, IMAGE_SIZE, store=store)
+    test_ds = classification_dataset(test_records, IMAGE_SIZE, store=store)
+
+    def preprocess(image, label):
+        return preprocess_input(image), label
+
+    def augment(image, label):
+        return tf.image.random_flip_left_right(image), label
+
+    train_ds = (
+        train_ds.shuffle(10000)
+        .map(augment, num_parallel_calls=tf.data.AUTOTUNE)
+        .map(preprocess, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(BATCH_SIZE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    val_ds = val_ds.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+    test_ds = test_ds.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+    return train_ds, val_ds, test_ds
+
+
+def localization_datasets():
+    # Same pairing and split as train_multihead_mask.load_datasets.
+    triples = read_tamper_manifest()
+    if len(triples) == 0:
+        raise ValueError(f"No triples found in {TAMPER_MANIFEST}")
+
+    random.seed(42)
+    random.shuffle(triples)
+    entries = tamper_entries(triples)
+    n_train = int(len(entries) * TRAIN_SPLIT)
+    n_val = int(len(entries) * VAL_SPLIT)
+    splits = [entries[:n_train], entries[n_train:n_train + n_val], entries[n_train + n_val:]]
+
+    def preprocess(img, labels):
+        _, mask = labels
+        return preprocess_input(img * 255.0), mask
+
+    store = open_store("tamper", TAMPER_MANIFEST, IMAGE_SIZE)
+
+    def create(split_entries, training):
+        ds = tamper_dataset(split_entries, IMAGE_SIZE, store=store)
+        if training:
+            ds = ds.shuffle(len(split_entries), seed=42)
+        ds = ds.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE)
+        return ds.batch(BATCH_SIZE).prefetch(tf.data.AUTOTUNE)
+
+    return create(splits[0], True), create(splits[1], False), create(splits[2], False)
+
+
+def soft_bce_from_logits(teacher_logits, student_logits, temperature):
+    targets = tf.sigmoid(teacher_logits / temperature)
+    loss = tf.nn.sigmoid_cross_entropy_with_logits(labels=targets, logits=student_logits / temperature)
+    return tf.reduce_mean(loss) * (temperature ** 2)
+
+
+def focal_dice_loss(y_true, y_pred_logits, gamma=0.5, eps=1e-6):
+    y_pred = tf.sigmoid(y_pred_logits)
+    inter = tf.reduce_sum(y_true * y_pred)
+    union = tf.reduce_sum(y_true) + tf.reduce_sum(y_pred)
+    dice = (2 * inter + eps) / (union + eps)
+    return tf.pow(1 - dice, gamma)
+
+
+class StudentTrainer:
+    def __init__(self, task, student, teacher, lr=LR):
+        self.task = task
+        self.student = student
+        self.teacher = teacher
+        self.opt = optimizers.AdamW(learning_rate=lr, weight_decay=WEIGHT_DECAY)
+        self._clip_norm = 1.0
+
+    def compute_loss(self, imgs, y_true, training):
+        t_logits = self.teacher(imgs, training=False)
+        s_logits = self.student(imgs, training=training)
+        if self.task == "classifier":
+            soft = soft_bce_from_logits(t_logits, s_logits, TEMPERATURE)
+            hard = tf.reduce_mean(tf.nn.sigmoid_cross_entropy_with_logits(labels=y_true, logits=s_logits))
+        else:
+            soft = soft_bce_from_logits(t_logits, s_logits, 1.0)
+            hard = tf.reduce_mean(tf.nn.weighted_cross_entropy_with_logits(
+                labels=y_true, logits=s_logits, pos_weight=POS_WEIGHT
+            )) + focal_dice_loss(y_true, s_logits)
+        total = DISTILL_ALPHA * soft + (1.0 - DISTILL_ALPHA) * hard
+        return total, soft, hard
+
+    @tf.function
+    def train_step(self, imgs, y_true):
+        with tf.GradientTape() as tape:
+            total, soft, hard = self.compute_loss(imgs, y_true, training=True)
+        grads = tape.gradient(total, self.student.trainable_variables)
+        grads, _ = tf.clip_by_global_norm(grads, self._clip_norm)
+        self.opt.apply_gradients(zip(grads, self.student.trainable_variables))
+        return total, soft, hard
+
+    @tf.function
+    def val_step(self, imgs, y_true):
+        return self.compute_loss(imgs, y_true, training=False)
+
+
+def evaluate_classifier(model, dataset):
+    auc = tf.keras.metrics.AUC(curve='ROC')
+    acc = tf.keras.metrics.BinaryAccuracy(threshold=0.5)
+    for imgs, labels in dataset:
+        probs = tf.sigmoid(model(imgs, training=False))
+        auc.update_state(labels, probs)
+        acc.update_state(labels, probs)
+    return {"auc": float(auc.result().numpy()), "accuracy": float(acc.result().numpy())}
+
+
+def evaluate_localization(model, dataset, threshold=0.5):
+    inter, pred_sum, true_sum = 0.0, 0.0, 0.0
+    for imgs, masks in dataset:
+        pred = tf.cast(tf.sigmoid(model(imgs, training=False)) > threshold, tf.float32)
+        inter += float(tf.reduce_sum(pred * masks).numpy())
+        pred_sum += float(tf.reduce_sum(pred).numpy())
+        true_sum += float(tf.reduce_sum(masks).numpy())
+    union = pred_sum + true_sum - inter
+    return {
+        "dice": 2.0 * inter / max(pred_sum + true_sum, 1e-6),
+        "iou": inter / max(union, 1e-6),
+    }
+
+
+def measure_latency(model, batch_size=1, iterations=50):
+    infer = tf.function(lambda x: model(x, training=False))
+    batch = tf.zeros((batch_size, *IMAGE_SIZE, 3), dtype=tf.float32)
+    infer(batch).numpy()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        infer(batch).numpy()
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000.0
+    return {"p50_ms": float(np.percentile(timings, 50)), "p95_ms": float(np.percentile(timings, 95))}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distill a lightweight student from a production model")
+    parser.add_argument("task", choices=["classifier", "localization"])
+    parser.add_argument("--backbone", choices=STUDENT_BACKBONES, default="mobilenetv2_050")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--report-only", action="store_true", help="Skip training and report on the saved student")
+    args = parser.parse_args()
+
+    output_dir = OUTPUT_DIRS[args.task]
+    output_dir.mkdir(parents=True, exist_ok=True)
+    student_ckpt = output_dir / f"student_{args.task}_{args.backbone}.weights.h5"
+    report_path = output_dir / f"student_{args.task}_{args.backbone}_report.json"
+
+    if args.task == "classifier":
+        teacher = load_classifier_model(CLASSIFIER_CKPT, IMAGE_SIZE, strict=True)
+        student = build_classifier_model(IMAGE_SIZE, backbone=args.backbone)
+        train_ds, val_ds, test_ds = classification_datasets()
+        evaluate = evaluate_classifier
+        score_key = "auc"
+    else:
+        teacher = load_localization_model(LOCALIZATION_CKPT, IMAGE_SIZE, strict=True)
+        student = build_localization_model(IMAGE_SIZE, backbone=args.backbone)
+        train_ds, val_ds, test_ds = localization_datasets()
+        evaluate = evaluate_localization
+        score_key = "dice"
+    teacher.trainable = False
+
+    print(f"Teacher parameters: {teacher.count_params():,}")
+    print(f"Student ({args.backbone}) parameters: {student.count_params():,}")
+
+    if args.report_only:
+        student.load_weights(str(student_ckpt))
+    else:
+        trainer = StudentTrainer(args.task, student, teacher)
+        best = -np.inf
+        wait = 0
+        for epoch in range(args.epochs):
+            train_losses = []
+            for imgs, y_true in train_ds:
+                total, _, _ = trainer.train_step(imgs, y_true)
+                train_losses.append(float(total.numpy()))
+
+            val_soft = []
+            for imgs, y_true in val_ds:
+                _, soft, _ = trainer.val_step(imgs, y_true)
+                val_soft.append(float(soft.numpy()))
+            val_metrics = evaluate(student, val_ds)
+
+            print(f"Epoch {epoch+1}/{args.epochs} | train_loss={np.mean(train_losses):.4f} | "
+                  f"val_distill={np.mean(val_soft):.4f} | val_{score_key}={val_metrics[score_key]:.4f}")
+
+            if val_metrics[score_key] > best + 1e-6:
+                best = val_metrics[score_key]
+                wait = 0
+                student.save_weights(str(student_ckpt))
+                print(f"[Checkpoint] val_{score_key} improved to {best:.4f} — saved to {student_ckpt}")
+            else:
+                wait += 1
+                if wait >= EARLYSTOP_PATIENCE:
+                    print(f"[EarlyStopping] No improvement for {EARLYSTOP_PATIENCE} epochs.")
+                    break
+
+        student.load_weights(str(student_ckpt))
+
+    print("\n" + "=" * 60)
+    print("Test set: teacher vs student")
+    print("=" * 60)
+    teacher_metrics = evaluate(teacher, test_ds)
+    student_metrics = evaluate(student, test_ds)
+    teacher_latency = measure_latency(teacher)
+    student_latency = measure_latency(student)
+
+    print(f"{'':10s} {score_key:>8s} {'p50 ms':>8s} {'params':>12s}")
+    print(f"{'teacher':10s} {teacher_metrics[score_key]:8.4f} {teacher_latency['p50_ms']:8.1f} {teacher.count_params():12,}")
+    print(f"{'student':10s} {student_metrics[score_key]:8.4f} {student_latency['p50_ms']:8.1f} {student.count_params():12,}")
+
+    report = {
+        "task": args.task,
+        "backbone": args.backbone,
+        "checkpoint": str(student_ckpt),
+        "teacher": {"metrics": teacher_metrics, "latency_batch1": teacher_latency, "params": int(teacher.count_params())},
+        "student": {"metrics": student_metrics, "latency_batch1": student_latency, "params": int(student.count_params())},
+        "p50_speedup": teacher_latency["p50_ms"] / student_latency["p50_ms"],
+    }
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport saved to: {report_path}")
+
+
+if __name__ == "__main__":
+    with file_logging(log_dir=INFERENCE_ROOT / "core/models", log_filename=f"training_log_student_{TIMESTAMP}.txt"):
+        main()
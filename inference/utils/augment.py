@@ -0,0 +1,63 @@
+"""
+Paired image/mask augmentation for tamper-localization training.
+
+augment_image_and_mask works on one example and is kept as the reference.
+augment_batch applies the same distribution to a whole batch in a handful of
+vectorized ops, with each sample still drawing its own flip, rotation and
+contrast factor. Given a seed it draws with stateless ops, so a batch gets
+the same augmentation whenever it is regenerated (e.g. after resuming).
+"""
+import tensorflow as tf
+
+CONTRAST_RANGE = (0.9, 1.1)
+
+
+def augment_image_and_mask(image, mask):
+    """Per-example: random horizontal flip, rot90 by a random k, random contrast."""
+    combined = tf.concat([image, mask], axis=-1)
+    combined = tf.image.random_flip_left_right(combined)
+    k = tf.random.uniform([], minval=0, maxval=4, dtype=tf.int32)
+    combined = tf.image.rot90(combined, k)
+    img_aug = combined[..., :3]
+    mask_aug = combined[..., 3:]
+    img_aug = tf.image.random_contrast(img_aug, lower=CONTRAST_RANGE[0], upper=CONTRAST_RANGE[1])
+    img_aug = tf.clip_by_value(img_aug, 0.0, 1.0)
+    return img_aug, mask_aug
+
+
+def _where_per_sample(cond, a, b):
+    return tf.where(cond[:, tf.newaxis, tf.newaxis, tf.newaxis], a, b)
+
+
+def augment_batch(images, masks, seed=None):
+    """
+    Batched equivalent of augment_image_and_mask for square images.
+
+    A flip followed by a rotation by k * 90 degrees picks uniformly from the
+    eight symmetries of the square. Independent coin flips for a transpose, an
+    up-down flip and a left-right flip pick uniformly from the same eight, and
+    each one is a single op over the batch plus a per-sample select.
+
+    seed: optional shape [2] integer tensor for stateless random ops.
+    """
+    batch = tf.shape(images)[0]
+    combined = tf.concat([images, masks], axis=-1)
+
+    if seed is None:
+        coins = tf.random.uniform([3, batch]) < 0.5
+        factor = tf.random.uniform([batch, 1, 1, 1], CONTRAST_RANGE[0], CONTRAST_RANGE[1])
+    else:
+        coin_seed, factor_seed = tf.unstack(tf.random.experimental.stateless_split(seed, 2))
+        coins = tf.random.stateless_uniform([3, batch], coin_seed) < 0.5
+        factor = tf.random.stateless_uniform([batch, 1, 1, 1], factor_seed, CONTRAST_RANGE[0], CONTRAST_RANGE[1])
+
+    combined = _where_per_sample(coins[0], tf.transpose(combined, [0, 2, 1, 3]), combined)
+    combined = _where_per_sample(coins[1], tf.reverse(combined, axis=[1]), combined)
+    combined = _where_per_sample(coins[2], tf.reverse(combined, axis=[2]), combined)
+
+    img_aug = combined[..., :3]
+    mask_aug = combined[..., 3:]
+
+    mean = tf.reduce_mean(img_aug, axis=[1, 2], keepdims=True)
+    img_aug = tf.clip_by_value((img_aug - mean) * factor + mean, 0.0, 1.0)
+    return img_aug, mask_aug
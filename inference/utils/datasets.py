@@ -0,0 +1,116 @@
+"""
+tf.data pipelines built from manifest records (see utils/manifests.py).
+
+Shared by the classification and tamper-localization training scripts so that
+they decode, resize and label images the same way.
+"""
+from pathlib import Path
+
+import tensorflow as tf
+
+from utils.manifests import INFERENCE_ROOT
+
+
+def load_image_tf(path, image_size):
+    """Decode and bilinearly resize an image to float32 in [0, 1]."""
+    img_bytes = tf.io.read_file(path)
+    img = tf.image.decode_image(img_bytes, channels=3, expand_animations=False)
+    img = tf.image.convert_image_dtype(img, tf.float32)
+    img = tf.image.resize(img, image_size)
+    img.set_shape((*image_size, 3))
+    return img
+
+
+def load_mask_tf(path, image_size):
+    """Binary mask dilated by a 3x3 max-pool; an empty path gives an all-zero mask."""
+    is_empty = tf.equal(tf.strings.length(path), 0)
+    def _zero_mask():
+        return tf.zeros((*image_size, 1), dtype=tf.float32)
+    def _read_mask():
+        mask_bytes = tf.io.read_file(path)
+        mask = tf.image.decode_image(mask_bytes, channels=1, expand_animations=False)
+        mask = tf.image.convert_image_dtype(mask, tf.float32)
+        mask = tf.image.resize(mask, image_size, method='nearest')
+        mask = tf.cast(mask > 0.5, tf.float32)
+        mask_exp = tf.expand_dims(mask, axis=0)
+        mask_exp = tf.nn.max_pool2d(mask_exp, ksize=3, strides=1, padding="SAME")
+        mask = tf.squeeze(mask_exp, axis=0)
+        return mask
+    mask = tf.cond(is_empty, _zero_mask, _read_mask)
+    mask.set_shape((*image_size, 1))
+    return mask
+
+
+def classification_dataset(records, image_size, root: Path = INFERENCE_ROOT, store=None):
+    """
+    Unbatched (image, label) pairs matching image_dataset_from_directory with
+    label_mode="binary": images are float32 in [0, 255], labels have shape (1,).
+    Reads from a ShardStore (utils/shard_store.py) when one is given.
+    """
+    paths = [str(root / r["path"]) for r in records]
+    labels = tf.reshape(tf.constant([float(r["label"]) for r in records], tf.float32), (-1, 1))
+    labels = tf.data.Dataset.from_tensor_slices(labels)
+
+    if store is not None:
+        images = store.dataset(paths).map(
+            lambda img, _mask: tf.cast(img, tf.float32),
+            num_parallel_calls=tf.data.AUTOTUNE,
+        )
+        return tf.data.Dataset.zip((images, labels))
+
+    def _load(path):
+        return load_image_tf(path, image_size) * 255.0
+
+    images = tf.data.Dataset.from_tensor_slices(paths).map(_load, num_parallel_calls=tf.data.AUTOTUNE)
+    return tf.data.Dataset.zip((images, labels))
+
+
+def tamper_entries(triples, root: Path = INFERENCE_ROOT):
+    """Expand triples into (image_path, mask_path, class_label) entries: each
+    original is a negative with no mask, each edited image a positive."""
+    entries = []
+    for triple in triples:
+        entries.append((str(root / triple["original"]), None, 0.0))
+        entries.append((str(root / triple["edited"]), str(root / triple["mask"]), 1.0))
+    return entries
+
+
+def tamper_store_items(triples):
+    """(image, mask) keys for building the tamper store: each image once, with
+    originals unmasked. See utils/shard_store.build_store."""
+    items = {}
+    for triple in triples:
+        items.setdefault(triple["original"], '')
+        items[triple["edited"]] = triple["mask"]
+    return list(items.items())
+
+
+def tamper_dataset(entries, image_size, store=None):
+    """Unbatched img, (class_label, mask) with images float32 in [0, 1].
+    Reads from a ShardStore (utils/shard_store.py) when one is given."""
+    image_paths = [e[0] for e in entries]
+    mask_paths = [e[1] if e[1] is not None else '' for e in entries]
+    class_labels = [e[2] for e in entries]
+
+    if store is not None:
+        labels = tf.data.Dataset.from_tensor_slices(class_labels)
+
+        def _from_store(stored, cls):
+            img, mask = stored
+            img = tf.cast(img, tf.float32) / 255.0
+            cls = tf.cast(tf.reshape(cls, (1,)), tf.float32)
+            return img, (cls, tf.cast(mask, tf.float32))
+
+        return tf.data.Dataset.zip((store.dataset(image_paths), labels)).map(
+            _from_store, num_parallel_calls=tf.data.AUTOTUNE
+        )
+
+    ds = tf.data.Dataset.from_tensor_slices((image_paths, mask_paths, class_labels))
+
+    def _process_tf(img_path, mask_path, cls):
+        img = load_image_tf(img_path, image_size)
+        mask = load_mask_tf(mask_path, image_size)
+        cls = tf.cast(tf.reshape(cls, (1,)), tf.float32)
+        return img, (cls, mask)
+
+    return ds.map(_process_tf, num_parallel_calls=tf.data.AUTOTUNE)
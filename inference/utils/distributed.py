@@ -0,0 +1,137 @@
+"""
+Data-parallel training across worker processes.
+
+Workers find each other through the standard TF_CONFIG environment variable.
+With more than one worker, get_strategy() returns a MultiWorkerMirroredStrategy
+(ring all-reduce, which runs on CPU-only hosts). Without TF_CONFIG it returns
+the default single-device strategy, so the training scripts behave exactly as
+before when started directly.
+
+launch_local_workers() starts several CPU worker processes on this machine
+with a generated TF_CONFIG, for trying multi-worker runs without a cluster.
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import tensorflow as tf
+
+
+def _tf_config():
+    raw = os.environ.get("TF_CONFIG")
+    return json.loads(raw) if raw else {}
+
+
+def num_workers():
+    return len(_tf_config().get("cluster", {}).get("worker", [])) or 1
+
+
+def worker_index():
+    task = _tf_config().get("task", {})
+    return int(task.get("index", 0)) if task.get("type", "worker") == "worker" else 0
+
+
+def is_chief():
+    return worker_index() == 0
+
+
+_strategy = None
+
+
+def get_strategy():
+    """Create the strategy once per process. Must run before any other TF op
+    when several workers are configured."""
+    global _strategy
+    if _strategy is None:
+        if num_workers() > 1:
+            options = tf.distribute.experimental.CommunicationOptions(
+                implementation=tf.distribute.experimental.CommunicationImplementation.RING
+            )
+            _strategy = tf.distribute.MultiWorkerMirroredStrategy(communication_options=options)
+            print(f"Worker {worker_index()}/{num_workers()}: "
+                  f"{_strategy.num_replicas_in_sync} replicas in sync")
+        else:
+            _strategy = tf.distribute.get_strategy()
+    return _strategy
+
+
+def shard_by_data(ds):
+    """Shard a batched dataset across workers by element. The datasets come
+    from in-memory path lists or the shard store, so file-based sharding does
+    not apply."""
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = tf.data.experimental.AutoShardPolicy.DATA
+    return ds.with_options(options)
+
+
+def worker_path(path):
+    """Every worker has to take part in saving, but only the chief should
+    write to the real path; the others write to a throwaway directory. The
+    full path is kept under it, so different runs and output directories do
+    not share files. Anything that is read back, such as resume state, must
+    come from the real path."""
+    path = Path(path)
+    if is_chief():
+        return path
+    absolute = path.resolve()
+    local = Path(tempfile.gettempdir()) / f"worker_{worker_index()}" / absolute.relative_to(absolute.anchor)
+    local.parent.mkdir(parents=True, exist_ok=True)
+    return local
+
+
+def _free_ports(count):
+    sockets = []
+    try:
+        for _ in range(count):
+            s = socket.socket()
+            s.bind(("localhost", 0))
+            sockets.append(s)
+        return [s.getsockname()[1] for s in sockets]
+    finally:
+        for s in sockets:
+            s.close()
+
+
+def launch_local_workers(argv, workers, env=None):
+    """
+    Run argv (a python command line) as `workers` CPU worker processes on this
+    host and wait for them. CPU threads are split evenly between workers so
+    they do not oversubscribe the machine. If a worker fails, the others are
+    stopped and RuntimeError is raised.
+    """
+    addresses = [f"localhost:{port}" for port in _free_ports(workers)]
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    processes = []
+    for index in range(workers):
+        worker_env = dict(os.environ if env is None else env)
+        worker_env.update({
+            "TF_CONFIG": json.dumps({
+                "cluster": {"worker": addresses},
+                "task": {"type": "worker", "index": index},
+            }),
+            "CUDA_VISIBLE_DEVICES": "",
+            "TF_NUM_INTRAOP_THREADS": str(threads),
+            "TF_NUM_INTEROP_THREADS": "2",
+        })
+        processes.append(subprocess.Popen([sys.executable, *argv], env=worker_env))
+
+    codes = [None] * workers
+    try:
+        while any(code is None for code in codes):
+            for index, process in enumerate(processes):
+                if codes[index] is None:
+                    try:
+                        codes[index] = process.wait(timeout=1)
+                    except subprocess.TimeoutExpired:
+                        continue
+                    if codes[index] != 0:
+                        raise RuntimeError(f"Worker {index} exited with code {codes[index]}")
+    finally:
+        for index, process in enumerate(processes):
+            if process.poll() is None:
+                process.terminate()
+                process.wait()
@@ -0,0 +1,148 @@
+"""
+Cached backbone features for training a classifier head on a frozen backbone.
+
+While the backbone is frozen and run in inference mode, its pooled output for
+a given input never changes, so the head can be trained from features that
+were computed once. The train split is stored in a fixed number of variants:
+variant 0 is the plain image and the others are augmented copies. Each epoch
+draws one variant per image. Other splits are stored unaugmented. Features are
+float16 .npy files read back through memory maps.
+
+A cache lives under dataset/store/features/<version>. The version hashes the
+backbone, image size, number of variants and the records in every split, so a
+different manifest or split builds a new cache instead of reusing a stale one.
+"""
+import hashlib
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from utils.shard_store import STORE_DIR
+
+FEATURE_DIR = STORE_DIR / "features"
+FEATURE_FORMAT = 1
+
+
+def feature_cache_version(splits, backbone, image_size, variants):
+    """splits: name -> manifest records, in the order they will be stored."""
+    digest = hashlib.sha256()
+    params = {
+        "format": FEATURE_FORMAT,
+        "backbone": backbone,
+        "image_size": list(image_size),
+        "variants": variants,
+    }
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for name in sorted(splits):
+        digest.update(f"[{name}]\n".encode())
+        for r in splits[name]:
+            digest.update(f"{r['path']}\t{r['label']}\t{r.get('sha256', '')}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+class FeatureCache:
+    """Read-only view over a built feature cache."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path / "index.json", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.feature_dim = self.index["feature_dim"]
+
+    def arrays(self, split):
+        """(features, labels): features is a (variants, N, feature_dim)
+        float16 memory map, labels an (N, 1) float32 array."""
+        features = np.load(self.path / f"{split}.features.npy", mmap_mode="r")
+        labels = np.load(self.path / f"{split}.labels.npy")
+        return features, labels
+
+    def dataset(self, split, batch_size, training=False, seed=None):
+        """Batched (features float32, label) pairs. In training mode rows are
+        shuffled every epoch and each row uses a randomly chosen variant;
+        otherwise rows come in order, using variant 0."""
+        features, labels = self.arrays(split)
+        variants, n = features.shape[:2]
+
+        def _gather(variant_ids, rows):
+            return features[variant_ids, rows].astype(np.float32), labels[rows]
+
+        def _read(variant_ids, rows):
+            feats, labs = tf.numpy_function(_gather, [variant_ids, rows], [tf.float32, tf.float32])
+            feats.set_shape((None, self.feature_dim))
+            labs.set_shape((None, 1))
+            return feats, labs
+
+        rows = tf.data.Dataset.range(n)
+        if training:
+            rows = rows.shuffle(n, seed=seed, reshuffle_each_iteration=True)
+            rows = rows.map(lambda row: (tf.random.uniform([], 0, variants, dtype=tf.int64), row))
+        else:
+            rows = rows.map(lambda row: (tf.constant(0, tf.int64), row))
+        return (
+            rows.batch(batch_size)
+            .map(_read, num_parallel_calls=tf.data.AUTOTUNE)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+
+
+def open_feature_cache(version, feature_dir: Path = FEATURE_DIR):
+    path = Path(feature_dir) / version
+    if not (path / "index.json").exists():
+        return None
+    cache = FeatureCache(path)
+    print(f"Using feature cache {path.name}")
+    return cache
+
+
+def build_feature_cache(version, extractor, splits, make_dataset, feature_dir: Path = FEATURE_DIR):
+    """
+    Run extractor over every split and write the cache.
+
+    splits: name -> (num_records, num_variants).
+    make_dataset(name, variant): batched (images, labels) in record order, with
+    variant 0 unaugmented.
+    """
+    path = Path(feature_dir) / version
+    partial = path.with_name(path.name + ".partial")
+    if partial.exists():
+        shutil.rmtree(partial)
+    partial.mkdir(parents=True)
+
+    @tf.function
+    def _extract(images):
+        return extractor(images, training=False)
+
+    feature_dim = int(extractor.output_shape[-1])
+    for name, (size, variants) in splits.items():
+        features = np.lib.format.open_memmap(
+            partial / f"{name}.features.npy", mode="w+", dtype=np.float16,
+            shape=(variants, size, feature_dim),
+        )
+        labels = np.zeros((size, 1), dtype=np.float32)
+        for variant in range(variants):
+            offset = 0
+            for images, batch_labels in make_dataset(name, variant):
+                feats = _extract(images).numpy()
+                features[variant, offset:offset + len(feats)] = feats.astype(np.float16)
+                labels[offset:offset + len(feats)] = batch_labels.numpy()
+                offset += len(feats)
+            if offset != size:
+                raise ValueError(f"{name} variant {variant}: expected {size} rows, got {offset}")
+            print(f"Cached {name} variant {variant + 1}/{variants} ({size} images)")
+        features.flush()
+        del features
+        np.save(partial / f"{name}.labels.npy", labels)
+
+    with open(partial / "index.json", "w", encoding="utf-8") as f:
+        json.dump({
+            "format": FEATURE_FORMAT,
+            "feature_dim": feature_dim,
+            "splits": {name: {"size": size, "variants": variants} for name, (size, variants) in splits.items()},
+        }, f, indent=2)
+    if path.exists():
+        shutil.rmtree(path)
+    partial.rename(path)
+    return FeatureCache(path)
@@ -1,14 +1,77 @@
 """
 Centralized logging utility for training scripts.
 Captures all stdout/stderr output to both console and log file.
+
+File writes happen on a background thread and are flushed at most once per
+FLUSH_INTERVAL seconds, so progress bars do not cost a flush per write.
+log_event() adds structured JSONL records next to the text log. With
+live_report, a separate process (scripts/render_training_report.py) keeps an
+HTML report of those records up to date while training runs; the training
+entry points turn it on for the chief worker only.
 """
+import os
 import sys
 import atexit
+import json
+import queue
+import subprocess
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from contextlib import contextmanager
 from typing import Optional
 
+FLUSH_INTERVAL = 1.0
+REPORT_SCRIPT = Path(__file__).resolve().parent.parent / "scripts" / "render_training_report.py"
+
+
+class BackgroundWriter:
+    """File-like object that hands writes to a daemon thread. The thread
+    batches queued text into one write and flushes periodically."""
+
+    _STOP = object()
+
+    def __init__(self, file, flush_interval: float = FLUSH_INTERVAL):
+        self.file = file
+        self.flush_interval = flush_interval
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, text):
+        self.queue.put(text)
+
+    def flush(self):
+        # Flushing is the writer thread's job.
+        pass
+
+    def _run(self):
+        last_flush = time.monotonic()
+        stopping = False
+        while not stopping:
+            chunks = []
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+                while True:
+                    if item is self._STOP:
+                        stopping = True
+                        break
+                    chunks.append(item)
+                    item = self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            if chunks:
+                self.file.write("".join(chunks))
+            if stopping or time.monotonic() - last_flush >= self.flush_interval:
+                self.file.flush()
+                last_flush = time.monotonic()
+
+    def close(self):
+        """Write everything queued so far and stop the thread."""
+        self.queue.put(self._STOP)
+        self.thread.join()
+
 
 class TeeOutput:
     """Class to write output to both console and file"""
@@ -18,20 +81,47 @@ class TeeOutput:
     def write(self, obj):
         for f in self.files:
             f.write(obj)
-            f.flush()
     
     def flush(self):
         for f in self.files:
             f.flush()
 
 
+_active_logger = None
+
+
+def log_event(event: str, **fields):
+    """Append a JSON record to the active logger's events file; a no-op when
+    no file logging is running."""
+    if _active_logger is not None:
+        _active_logger.log_event(event, **fields)
+
+
+def epoch_event_callback(model, event: str = "epoch"):
+    """Keras callback that logs each epoch's metrics and learning rate."""
+    import tensorflow as tf
+
+    def _on_epoch_end(epoch, logs=None):
+        lr = model.optimizer.learning_rate
+        lr = float(lr(model.optimizer.iterations) if callable(lr) else tf.keras.backend.get_value(lr))
+        # ReduceLROnPlateau puts its own "lr" into logs; the value read here wins.
+        log_event(event, **{**(logs or {}), "epoch": epoch + 1, "lr": lr})
+
+    return tf.keras.callbacks.LambdaCallback(on_epoch_end=_on_epoch_end)
+
+
 class FileLogger:
     """Manages file logging with automatic cleanup"""
     
-    def __init__(self, log_dir: Path, log_filename: str):
+    def __init__(self, log_dir: Path, log_filename: str, live_report: bool = False):
         self.log_dir = log_dir
         self.log_filename = log_filename
+        self.live_report = live_report
+        self.report_process = None
         self.log_file = None
+        self.writer = None
+        self.events_file = None
+        self.events_writer = None
         self.original_stdout = None
         self.original_stderr = None
         self.log_path = None
@@ -55,10 +145,23 @@ class FileLogger:
         self.original_stdout = sys.stdout
         self.original_stderr = sys.stderr
         
-        sys.stdout = TeeOutput(sys.stdout, self.log_file)
-        sys.stderr = TeeOutput(sys.stderr, self.log_file)
+        # One writer for both streams keeps their order in the file.
+        self.writer = BackgroundWriter(self.log_file)
+        sys.stdout = TeeOutput(sys.stdout, self.writer)
+        sys.stderr = TeeOutput(sys.stderr, self.writer)
+
+        self.events_path = self.log_path.with_suffix(".events.jsonl")
+        self.events_file = open(self.events_path, 'a', encoding='utf-8')
+        self.events_writer = BackgroundWriter(self.events_file)
+        global _active_logger
+        _active_logger = self
+        started = time.time()
+        self.log_event("run_start", argv=sys.argv)
         
         print(f"Logging all output to: {self.log_path}")
+        print(f"Structured events: {self.events_path}")
+        if self.live_report:
+            self._start_report(started)
         if file_exists:
             print(f"(Appending to existing log file for today)")
         print("=" * 60)
@@ -71,10 +174,37 @@ class FileLogger:
             print("\n" + "=" * 60)
             print(f"Logging completed. All logs saved to: {self.log_path}")
             print("=" * 60)
-            self.log_file.flush()
+            global _active_logger
+            if _active_logger is self:
+                _active_logger = None
+            self.log_event("run_end")
             sys.stdout = self.original_stdout
             sys.stderr = self.original_stderr
+            self.writer.close()
+            self.events_writer.close()
             self.log_file.close()
+            self.events_file.close()
+
+    def _start_report(self, started: float):
+        """Render the events as HTML in a separate process, so matplotlib never
+        loads in the training process. It keeps going after this process
+        exits until the final render is written."""
+        report_path = self.log_path.with_suffix(".report.html")
+        try:
+            self.report_process = subprocess.Popen(
+                [sys.executable, str(REPORT_SCRIPT), str(self.events_path), "--output", str(report_path),
+                 "--watch", "--parent-pid", str(os.getpid()), "--since", f"{started - 0.01:.3f}"],
+                stdout=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            print(f"Live report: {report_path}")
+        except OSError as e:
+            print(f"Warning: could not start the report renderer: {e}")
+
+    def log_event(self, event: str, **fields):
+        record = {"time": round(time.time(), 3), "event": event, **fields}
+        # default=float covers numpy scalars and 0-d tensors
+        self.events_writer.write(json.dumps(record, default=float) + "\n")
     
     def __enter__(self):
         """Context manager entry"""
@@ -90,7 +220,8 @@ class FileLogger:
 def setup_file_logging(
     log_dir: Optional[Path] = None,
     log_filename: Optional[str] = None,
-    subdirectory: str = "logs"
+    subdirectory: str = "logs",
+    live_report: bool = False
 ) -> FileLogger:
     """
     Set up file logging that captures all stdout/stderr to both console and file.
@@ -99,6 +230,7 @@ def setup_file_logging(
         log_dir: Base directory for logs. If None, uses "core/models/ai_detection/logs"
         log_filename: Name of log file. If None, generates timestamped filename
         subdirectory: Subdirectory name under log_dir (default: "logs")
+        live_report: Also render the events to HTML in a background process
     
     Returns:
         FileLogger instance that should be used as a context manager or call start()/stop()
@@ -124,7 +256,7 @@ def setup_file_logging(
         date_str = datetime.now().strftime('%Y%m%d')
         log_filename = f"training_log_{date_str}.txt"
     
-    logger = FileLogger(log_dir, log_filename)
+    logger = FileLogger(log_dir, log_filename, live_report)
     
     # Register cleanup on exit
     atexit.register(logger.stop)
@@ -136,7 +268,8 @@ def setup_file_logging(
 def file_logging(
     log_dir: Optional[Path] = None,
     log_filename: Optional[str] = None,
-    subdirectory: str = "logs"
+    subdirectory: str = "logs",
+    live_report: bool = False
 ):
     """
     Context manager for file logging (convenience wrapper).
@@ -145,12 +278,13 @@ def file_logging(
         log_dir: Base directory for logs. If None, uses "core/models/ai_detection/logs"
         log_filename: Name of log file. If None, generates timestamped filename
         subdirectory: Subdirectory name under log_dir (default: "logs")
+        live_report: Also render the events to HTML in a background process
     
     Example:
         with file_logging():
             print("This will be logged to file")
     """
-    logger = setup_file_logging(log_dir, log_filename, subdirectory)
+    logger = setup_file_logging(log_dir, log_filename, subdirectory, live_report)
     try:
         logger.start()
         yield logger
@@ -0,0 +1,174 @@
+"""
+Readers for the dataset manifests under dataset/manifests.
+
+The manifests were written on Windows and by more than one tool, so rows may
+use backslashes, absolute paths from the machine that built them, or the
+shorter six-column layout in parts of tamper_manifest.csv. Everything here
+normalizes rows to paths relative to the inference root, so training can
+start from a CSV parse instead of a filesystem crawl.
+"""
+import csv
+import re
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+INFERENCE_ROOT = Path(__file__).resolve().parent.parent
+MANIFEST_DIR = INFERENCE_ROOT / "dataset/manifests"
+DATASET_MANIFEST = MANIFEST_DIR / "dataset_manifest.csv"
+TAMPER_MANIFEST = MANIFEST_DIR / "tamper_manifest.csv"
+
+CLASS_NAMES = ['ai_generated', 'real']
+
+# dataset_manifest.csv records images under dataset/images/<label>/...; the
+# classification scripts read the same tree from dataset/images/classification.
+CLASSIFICATION_ROOT = "dataset/images/classification"
+
+TAMPER_ROOT = "dataset/images/tamper_localization"
+
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Columns of the short tamper_manifest.csv rows, which have no header of their
+# own and carry the edit prompt where the full layout has edit_type.
+SHORT_TAMPER_COLUMNS = ("original_path", "edited_path", "mask_path", "prompt", "caption", "sha256")
+
+
+def normalize_manifest_path(raw: str) -> str:
+    """Return a manifest path as a forward-slash path relative to the inference root."""
+    path = raw.strip().replace("\\", "/")
+    parts = path.split("/")
+    if "dataset" in parts:
+        parts = parts[parts.index("dataset"):]
+    return "/".join(p for p in parts if p)
+
+
+def _filter_sources(records, sources: Optional[Iterable[str]]):
+    if sources is None:
+        return records
+    wanted = {s.lower() for s in sources}
+    return [r for r in records if r["source"].lower() in wanted]
+
+
+def _dedupe(records):
+    seen = set()
+    unique = []
+    for record in records:
+        sha = record["sha256"]
+        if sha:
+            if sha in seen:
+                continue
+            seen.add(sha)
+        unique.append(record)
+    return unique
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def classification_rerooted(records, root: Path = INFERENCE_ROOT):
+    """Pick where the classification images live with a single stat instead of
+    checking every file: as recorded (False), or re-rooted under
+    CLASSIFICATION_ROOT (True)."""
+    if not records:
+        return False
+    first = records[0]["path"]
+    if (root / first).exists():
+        return False
+    return (root / reroot_classification(first)).exists()
+
+
+def reroot_classification(path: str) -> str:
+    prefix = "dataset/images/"
+    if path.startswith(prefix) and not path.startswith(CLASSIFICATION_ROOT + "/"):
+        return f"{CLASSIFICATION_ROOT}/{path[len(prefix):]}"
+    return path
+
+
+def read_dataset_manifest(
+    path: Path = DATASET_MANIFEST,
+    sources: Optional[Iterable[str]] = None,
+    dedupe: bool = True,
+    root: Path = INFERENCE_ROOT,
+) -> List[dict]:
+    """
+    Parse dataset_manifest.csv into classification records.
+
+    Each record has: path (relative to root), label (index into CLASS_NAMES),
+    label_name, source, sha256, width, height.
+    """
+    records = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            label_name = (row.get("label") or "").strip()
+            if label_name not in CLASS_NAMES:
+                continue
+            records.append({
+                "path": normalize_manifest_path(row["file_path"]),
+                "label": CLASS_NAMES.index(label_name),
+                "label_name": label_name,
+                "source": (row.get("source") or "").strip(),
+                "sha256": (row.get("sha256") or "").strip().lower(),
+                "width": _to_int(row.get("width")),
+                "height": _to_int(row.get("height")),
+            })
+
+    if classification_rerooted(records, root):
+        for record in records:
+            record["path"] = reroot_classification(record["path"])
+
+    records = _filter_sources(records, sources)
+    if dedupe:
+        records = _dedupe(records)
+    return records
+
+
+def tamper_row_paths(row):
+    """Normalized (original, edited, mask) paths of a raw tamper_manifest.csv row."""
+    original, edited, mask = (normalize_manifest_path(p) for p in row[:3])
+    if not original.startswith(TAMPER_ROOT + "/originals/"):
+        # Some rows point at the raw download; training pairs each
+        # edited image with its copy under originals/ instead.
+        original = edited.replace("/edited/", "/originals/", 1)
+    return original, edited, mask
+
+
+def read_tamper_manifest(
+    path: Path = TAMPER_MANIFEST,
+    sources: Optional[Iterable[str]] = None,
+    dedupe: bool = True,
+) -> List[dict]:
+    """
+    Parse tamper_manifest.csv into original/edited/mask triples.
+
+    Each record has: original, edited, mask (relative paths), edit_type,
+    source (the subdirectory the triple lives in, e.g. IMD2020 or coco) and
+    sha256. Columns are matched by the header; rows in the short six-column
+    layout are matched against SHORT_TAMPER_COLUMNS and have no edit_type.
+    """
+    records = []
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = [name.strip() for name in next(reader, [])]
+        for row in reader:
+            if len(row) < 3:
+                continue
+            columns = SHORT_TAMPER_COLUMNS if len(row) == len(SHORT_TAMPER_COLUMNS) else header
+            fields = dict(zip(columns, (v.strip() for v in row)))
+            original, edited, mask = tamper_row_paths(row)
+            sha = fields.get("sha256", "").lower()
+            records.append({
+                "original": original,
+                "edited": edited,
+                "mask": mask,
+                "edit_type": fields.get("edit_type", ""),
+                "source": edited.rsplit("/", 2)[-2] if edited.count("/") >= 1 else "",
+                "sha256": sha if _SHA256_RE.match(sha) else "",
+            })
+
+    records = _filter_sources(records, sources)
+    if dedupe:
+        records = _dedupe(records)
+    return records
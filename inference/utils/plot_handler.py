@@ -1,11 +1,35 @@
-import matplotlib.pyplot as plt
+"""
+Training plots.
+
+matplotlib is imported on first use, so importing this module costs nothing
+on a training script's startup path. render_report() turns a structured
+events file (utils/logger.log_event) into one self-contained HTML page;
+scripts/render_training_report.py runs it in a separate process while
+training is in progress.
+"""
+import base64
+import html
+import io
+import json
 from pathlib import Path
 from datetime import datetime
 
 OUTPUT_DIR = Path("core/plots")
-OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+REPORT_COLUMNS = 3
+# Higher is better for these metrics; for everything else (losses) lower is.
+HIGHER_IS_BETTER = ("auc", "acc", "dice_coef", "iou", "precision", "recall")
+
+
+def _pyplot():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
 
 def plot_history(history):
+    plt = _pyplot()
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
     timestamp = datetime.now().strftime("%m%d%Y-%H%M%S")
     # loss plot
@@ -62,6 +86,8 @@ def plot_history(history):
 
 
 def plot_multihead_history(history_dict, phase_name="multihead"):
+    plt = _pyplot()
+    OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
     timestamp = datetime.now().strftime("%m%d%Y-%H%M%S")
     
     plt.figure(figsize=(12, 6))
@@ -170,3 +196,168 @@ def plot_multihead_history(history_dict, phase_name="multihead"):
     print(f"  - total_loss_{phase_name}_{timestamp}.png")
     print(f"  - loss_components_{phase_name}_{timestamp}.png")
     print(f"  - overview_{phase_name}_{timestamp}.png")
+
+
+def read_events(path):
+    """Events grouped into runs; each run starts at a run_start record. A
+    partially written last line is skipped."""
+    runs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("event") == "run_start" or not runs:
+                runs.append([])
+            runs[-1].append(record)
+    return runs
+
+
+def _flatten(record, prefix=""):
+    """Numeric fields only; nested dicts become prefix_key (train_total_loss)."""
+    values = {}
+    for key, value in record.items():
+        if key in ("time", "event"):
+            continue
+        if isinstance(value, dict):
+            values.update(_flatten(value, f"{prefix}{key}_"))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[prefix + key] = float(value)
+    return values
+
+
+def _epoch_series(records):
+    """phase -> {metric: [values per epoch]} from epoch events."""
+    groups = {}
+    for record in records:
+        if record.get("event") != "epoch":
+            continue
+        phase = record.get("phase")
+        series = groups.setdefault(phase, {})
+        values = _flatten(record)
+        values.pop("phase", None)
+        for key, value in values.items():
+            series.setdefault(key, []).append(value)
+    return groups
+
+
+def _metric_pairs(series):
+    """(title, train_key, val_key) for every val_ metric, then leftover keys."""
+    pairs, used = [], {"epoch"}
+    for key in series:
+        if key.startswith("val_"):
+            base = key[4:]
+            train_key = f"train_{base}" if f"train_{base}" in series else (base if base in series else None)
+            pairs.append((base, train_key, key))
+            used.update({key, train_key})
+    others = [key for key in series if key not in used]
+    return pairs, others
+
+
+def _figure_html(plt, fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    plt.close(fig)
+    encoded = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return f'<img src="data:image/png;base64,{encoded}">'
+
+
+def _grid(plt, panels):
+    """panels: [(title, [(label, xs, ys)])] -> one figure."""
+    rows = -(-len(panels) // REPORT_COLUMNS)
+    fig, axes = plt.subplots(rows, REPORT_COLUMNS, figsize=(5 * REPORT_COLUMNS, 3.2 * rows), squeeze=False)
+    for ax, (title, lines) in zip(axes.flat, panels):
+        for label, xs, ys in lines:
+            ax.plot(xs, ys, label=label, linewidth=1.8, marker="o" if len(xs) < 30 else None, markersize=3)
+        ax.set_title(title)
+        ax.grid(True, alpha=0.3)
+        if len(lines) > 1:
+            ax.legend()
+    for ax in list(axes.flat)[len(panels):]:
+        ax.axis("off")
+    fig.tight_layout()
+    return _figure_html(plt, fig)
+
+
+def _best(name, values):
+    if any(tag in name for tag in HIGHER_IS_BETTER):
+        return max(values)
+    return min(values)
+
+
+def _run_section(plt, records):
+    parts = []
+    start = records[0]
+    if start.get("event") == "run_start":
+        started = datetime.fromtimestamp(start["time"]).strftime("%Y-%m-%d %H:%M:%S")
+        parts.append(f"<p>Started {started}: <code>{html.escape(' '.join(start.get('argv', [])))}</code></p>")
+    finished = records[-1].get("event") == "run_end"
+    parts.append(f"<p>Status: {'finished' if finished else 'running'} ({len(records)} events)</p>")
+
+    for phase, series in _epoch_series(records).items():
+        epochs = series.get("epoch") or list(range(1, len(next(iter(series.values()))) + 1))
+        pairs, others = _metric_pairs(series)
+        heading = f"Phase {phase}" if phase is not None else "Epochs"
+        parts.append(f"<h3>{html.escape(heading)}: {len(epochs)} epochs</h3>")
+
+        rows = []
+        for base, _, val_key in pairs:
+            values = series[val_key]
+            rows.append(f"<tr><td>{html.escape(val_key)}</td><td>{values[-1]:.4f}</td><td>{_best(base, values):.4f}</td></tr>")
+        if rows:
+            parts.append("<table><tr><th>metric</th><th>last</th><th>best</th></tr>" + "".join(rows) + "</table>")
+
+        panels = []
+        for base, train_key, val_key in pairs:
+            lines = [("train", epochs, series[train_key])] if train_key else []
+            lines.append(("val", epochs, series[val_key]))
+            panels.append((base, lines))
+        panels += [(key, [(key, epochs, series[key])]) for key in others]
+        if panels:
+            parts.append(_grid(plt, panels))
+
+    steps = [r for r in records if r.get("event") == "train_steps"]
+    if steps:
+        xs = list(range(1, len(steps) + 1))
+        parts.append("<h3>Step time per chunk</h3>")
+        parts.append(_grid(plt, [
+            ("ms per step", [
+                (key, xs, [r[key] for r in steps]) for key in ("step_ms", "compute_ms", "input_wait_ms")
+            ]),
+        ]))
+    return "\n".join(parts)
+
+
+def render_report(events_path, report_path, live=False, all_runs=False):
+    """Write a single HTML file with every figure embedded. live adds an
+    auto-refresh so an open browser tab follows training."""
+    plt = _pyplot()
+    events_path, report_path = Path(events_path), Path(report_path)
+    runs = read_events(events_path) if events_path.exists() else []
+    runs = runs if all_runs else runs[-1:]
+
+    sections = []
+    for index, records in enumerate(reversed(runs)):
+        title = "Latest run" if index == 0 else f"Earlier run {len(runs) - index}"
+        sections.append(f"<section><h2>{title}</h2>{_run_section(plt, records)}</section>")
+
+    refresh = '<meta http-equiv="refresh" content="30">' if live else ""
+    page = f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8">{refresh}
+<title>{html.escape(events_path.stem)}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 1em; }}
+td, th {{ border: 1px solid #ccc; padding: 4px 10px; text-align: right; }}
+img {{ max-width: 100%; }}
+</style></head>
+<body><h1>{html.escape(events_path.stem)}</h1>
+<p>Rendered {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} from {html.escape(str(events_path))}</p>
+{''.join(sections) or '<p>No events yet.</p>'}
+</body></html>
+"""
+    tmp = report_path.with_suffix(".tmp")
+    tmp.write_text(page, encoding="utf-8")
+    tmp.replace(report_path)
+    return report_path
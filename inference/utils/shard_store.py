@@ -0,0 +1,208 @@
+"""
+Preprocessed, sharded dataset store.
+
+scripts/build_dataset_store.py decodes and resizes every image listed in a
+manifest once and writes the results as uint8 .npy shards. Masks are
+thresholded and dilated as well, then bit-packed. Training reads rows back
+through memory maps, so no tf.data .cache files are needed.
+
+A store lives under dataset/store/<kind>/<version>. The version hashes the
+manifest contents together with the preprocessing parameters, so editing the
+manifest or changing the image size selects a different store instead of
+silently reusing a stale one.
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import tensorflow as tf
+
+from utils.manifests import INFERENCE_ROOT
+
+STORE_DIR = INFERENCE_ROOT / "dataset/store"
+STORE_FORMAT = 1
+DEFAULT_SHARD_SIZE = 1024
+READ_BATCH = 64
+KINDS = ("classification", "tamper")
+
+
+def preprocessing_params(image_size):
+    return {
+        "format": STORE_FORMAT,
+        "image_size": list(image_size),
+        "image_resize": "bilinear",
+        "mask_resize": "nearest",
+        "mask_threshold": 0.5,
+        "mask_dilation": 3,
+    }
+
+
+def store_version(manifest_path, image_size):
+    digest = hashlib.sha256()
+    with open(manifest_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    digest.update(json.dumps(preprocessing_params(image_size), sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+def store_path(kind, manifest_path, image_size, store_dir: Path = STORE_DIR):
+    if kind not in KINDS:
+        raise ValueError(f"Unknown store kind: {kind}. Choose from {KINDS}")
+    return Path(store_dir) / kind / store_version(manifest_path, image_size)
+
+
+class ShardStore:
+    """Read-only view over a built store. Rows are looked up by image path
+    relative to the inference root (absolute paths under it work too)."""
+
+    def __init__(self, path: Path, root: Path = INFERENCE_ROOT):
+        self.path = Path(path)
+        self.root = Path(root)
+        with open(self.path / "index.json", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.image_size = tuple(self.index["params"]["image_size"])
+        self.has_masks = self.index["has_masks"]
+        self._rows = {}
+        for shard_id, shard in enumerate(self.index["shards"]):
+            for row, key in enumerate(shard["keys"]):
+                self._rows[key] = (shard_id, row)
+        self._arrays = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def key_for(self, path):
+        path = str(path).replace("\\", "/")
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.root).replace("\\", "/")
+        return path
+
+    def _array(self, shard_id, field):
+        key = (shard_id, field)
+        array = self._arrays.get(key)
+        if array is None:
+            name = self.index["shards"][shard_id]["name"]
+            array = np.load(self.path / f"{name}.{field}.npy", mmap_mode="r")
+            self._arrays[key] = array
+        return array
+
+    def locate(self, paths):
+        keys = [self.key_for(p) for p in paths]
+        missing = [k for k in keys if k not in self._rows]
+        if missing:
+            raise KeyError(
+                f"{len(missing)} images are not in the store at {self.path} "
+                f"(first: {missing[0]}); rebuild it with scripts/build_dataset_store.py"
+            )
+        return np.array([self._rows[k] for k in keys], dtype=np.int64).reshape(-1, 2)
+
+    def _gather(self, locations):
+        images = np.empty((len(locations), *self.image_size, 3), dtype=np.uint8)
+        masks = np.zeros((len(locations), *self.image_size, 1), dtype=np.uint8)
+        n_pixels = self.image_size[0] * self.image_size[1]
+        for i, (shard_id, row) in enumerate(locations):
+            images[i] = self._array(shard_id, "images")[row]
+            if self.has_masks:
+                bits = np.unpackbits(self._array(shard_id, "masks")[row], count=n_pixels)
+                masks[i] = bits.reshape(*self.image_size, 1)
+        return images, masks
+
+    def dataset(self, paths):
+        """Unbatched (image uint8, mask uint8) pairs in the order of paths."""
+        locations = self.locate(paths)
+
+        def _read(batch):
+            images, masks = tf.numpy_function(self._gather, [batch], [tf.uint8, tf.uint8])
+            images.set_shape((None, *self.image_size, 3))
+            masks.set_shape((None, *self.image_size, 1))
+            return images, masks
+
+        return (
+            tf.data.Dataset.from_tensor_slices(locations)
+            .batch(READ_BATCH)
+            .map(_read, num_parallel_calls=tf.data.AUTOTUNE)
+            .unbatch()
+        )
+
+
+def open_store(kind, manifest_path, image_size, store_dir: Path = STORE_DIR):
+    """Return the store matching this manifest and image size, or None if it
+    has not been built yet."""
+    path = store_path(kind, manifest_path, image_size, store_dir)
+    if not (path / "index.json").exists():
+        print(f"Warning: no {kind} store at {path}; decoding images from disk. "
+              f"Run scripts/build_dataset_store.py --kind {kind} to build it.")
+        return None
+    store = ShardStore(path)
+    print(f"Using {kind} store {path.name} ({len(store)} images)")
+    return store
+
+
+def build_store(kind, items, manifest_path, image_size, shard_size=DEFAULT_SHARD_SIZE,
+                store_dir: Path = STORE_DIR, root: Path = INFERENCE_ROOT, force=False):
+    """
+    Write a store for items, a list of (key, mask_key) pairs of paths relative
+    to root; mask_key is '' for images without a mask. Shards are written to a
+    temporary directory and renamed into place once index.json is complete.
+    """
+    from utils.datasets import load_image_tf, load_mask_tf
+
+    path = store_path(kind, manifest_path, image_size, store_dir)
+    if (path / "index.json").exists() and not force:
+        print(f"Store already built: {path}")
+        return path
+
+    partial = path.with_name(path.name + ".partial")
+    if partial.exists():
+        shutil.rmtree(partial)
+    partial.mkdir(parents=True)
+
+    has_masks = kind == "tamper"
+    keys = [key for key, _ in items]
+    image_paths = [str(root / key) for key in keys]
+    mask_paths = [str(root / mask) if mask else '' for _, mask in items]
+
+    def _load(image_path, mask_path):
+        img = load_image_tf(image_path, image_size)
+        img = tf.cast(tf.round(img * 255.0), tf.uint8)
+        mask = tf.cast(load_mask_tf(mask_path, image_size), tf.uint8)
+        return img, mask
+
+    ds = (
+        tf.data.Dataset.from_tensor_slices((image_paths, mask_paths))
+        .map(_load, num_parallel_calls=tf.data.AUTOTUNE)
+        .batch(shard_size)
+        .prefetch(2)
+    )
+
+    shards = []
+    for shard_id, (images, masks) in enumerate(ds.as_numpy_iterator()):
+        name = f"shard_{shard_id:05d}"
+        np.save(partial / f"{name}.images.npy", images)
+        if has_masks:
+            packed = np.packbits(masks.reshape(len(masks), -1), axis=1)
+            np.save(partial / f"{name}.masks.npy", packed)
+        start = shard_id * shard_size
+        shards.append({"name": name, "keys": keys[start:start + len(images)]})
+        print(f"  {name}: {start + len(images)}/{len(keys)} images")
+
+    index = {
+        "kind": kind,
+        "version": path.name,
+        "manifest": str(manifest_path),
+        "params": preprocessing_params(image_size),
+        "has_masks": has_masks,
+        "count": len(keys),
+        "shards": shards,
+    }
+    with open(partial / "index.json", "w", encoding="utf-8") as f:
+        json.dump(index, f)
+
+    if path.exists():
+        shutil.rmtree(path)
+    partial.rename(path)
+    return path
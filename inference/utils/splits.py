@@ -0,0 +1,95 @@
+"""
+Persistent train/val/test assignment shared by the training and test scripts.
+
+Each record is assigned to a split from a hash of its sha256 (its path when the
+manifest has no hash). The assignment does not depend on ordering, on other
+records or on which sources are selected, so adding images to a manifest
+never moves existing ones between splits. Assignments are written to
+dataset/manifests/splits/<name>.json the first time a record is seen. After
+that the stored entry wins, which keeps a record's split fixed even if the
+hashing or ratios are changed later.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from utils.manifests import MANIFEST_DIR
+
+SPLITS_DIR = MANIFEST_DIR / "splits"
+SPLIT_NAMES = ("train", "val", "test")
+SPLIT_SALT = "proofofart-split-v1"
+CLASSIFICATION_SPLIT = "classification"
+
+
+def record_key(record):
+    return record.get("sha256") or record["path"]
+
+
+def assign_split(key, train_split, val_split, salt=SPLIT_SALT):
+    digest = hashlib.sha256(f"{salt}:{key}".encode("utf-8")).hexdigest()
+    fraction = int(digest[:15], 16) / float(16 ** 15)
+    if fraction < train_split:
+        return "train"
+    if fraction < train_split + val_split:
+        return "val"
+    return "test"
+
+
+def _read_index(path: Path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_index(path: Path, index):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load_split_index(name, records, train_split=0.8, val_split=0.1, splits_dir: Path = SPLITS_DIR):
+    """
+    Return {key: split} covering every record, creating or extending the
+    stored index as needed. Raises ValueError if the index on disk was built
+    with different ratios, since silently reassigning would leak test data.
+    """
+    path = Path(splits_dir) / f"{name}.json"
+    if path.exists():
+        index = _read_index(path)
+        if (index["train_split"], index["val_split"]) != (train_split, val_split):
+            raise ValueError(
+                f"Split index {path} was built with train/val = "
+                f"{index['train_split']}/{index['val_split']}, not {train_split}/{val_split}. "
+                "Use the same ratios or a different index name."
+            )
+    else:
+        index = {
+            "train_split": train_split,
+            "val_split": val_split,
+            "salt": SPLIT_SALT,
+            "assignments": {},
+        }
+
+    assignments = index["assignments"]
+    added = 0
+    for record in records:
+        key = record_key(record)
+        if key not in assignments:
+            assignments[key] = assign_split(key, train_split, val_split, index["salt"])
+            added += 1
+
+    if added:
+        _write_index(path, index)
+        print(f"Split index {path}: assigned {added} new records ({len(assignments)} total)")
+    return assignments
+
+
+def split_records(name, records, train_split=0.8, val_split=0.1, splits_dir: Path = SPLITS_DIR):
+    """Partition records into train/val/test lists using the persistent index."""
+    assignments = load_split_index(name, records, train_split, val_split, splits_dir)
+    parts = {split: [] for split in SPLIT_NAMES}
+    for record in records:
+        parts[assignments[record_key(record)]].append(record)
+    return parts["train"], parts["val"], parts["test"]
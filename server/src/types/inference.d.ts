@@ -12,9 +12,15 @@ export type Tampering = {
     edited_pixels: number;  
 }
 
+export type ModelVersions = {
+    classifier: string | null;
+    localization: string | null;
+}
+
 export type InferenceResponse = {
     predictions: AIPrediction;
     tampering: Tampering;
+    model_versions?: ModelVersions;
 }
 
 export type InferenceJobData = {
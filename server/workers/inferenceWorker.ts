@@ -274,7 +274,7 @@ export class InferenceWorker {
         const inferBaseUrl = process.env.INFER_BASE_URL;
         if (inferBaseUrl) {
             try {
-                const healthCheckUrl = `${inferBaseUrl}/`;
+                const healthCheckUrl = `${inferBaseUrl}/readyz`;
                 const healthResponse = await fetch(healthCheckUrl, {
                     method: 'GET',
                     headers: { 'Accept': 'application/json' },